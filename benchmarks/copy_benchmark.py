@@ -0,0 +1,142 @@
+"""Compare the copy engines of `h3a.transfer` with `shutil.copy2`.
+
+Usage: python benchmarks/copy_benchmark.py [--dir DIR] [--large-size 4G] ...
+
+Files are created in a temporary directory under `--dir`, so pass a
+directory on the filesystem to be measured. Timings include the page
+cache, as real runs do.
+"""
+
+import json
+import os
+import shutil
+from collections.abc import Callable
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import click
+
+from h3a.config import DEFAULT_COPY_BLOCK_SIZE
+from h3a.transfer import COPY_ENGINES, copy_file
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper().removesuffix("B")
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ""
+    return int(float(text.removesuffix(unit)) * SIZE_UNITS[unit])
+
+
+def write_random_file(path: Path, size: int) -> None:
+    chunk = os.urandom(min(size, 16 * 1024 * 1024))
+    with path.open("wb") as file:
+        remaining = size
+        while remaining > 0:
+            file.write(chunk[:remaining])
+            remaining -= len(chunk)
+
+
+def get_copy_methods(block_size: int) -> dict[str, Callable[[Path, Path], object]]:
+    copy_methods: dict[str, Callable[[Path, Path], object]] = {
+        "shutil.copy2": shutil.copy2,
+        "h3a (auto)": lambda src, dest: copy_file(src, dest, block_size=block_size),
+    }
+    for engine in COPY_ENGINES:
+        copy_methods[f"h3a ({engine})"] = lambda src, dest, engine=engine: copy_file(
+            src, dest, block_size=block_size, engines=[engine]
+        )
+    return copy_methods
+
+
+@click.command()
+@click.option(
+    "--dir",
+    "base_dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory on the filesystem to benchmark.",
+)
+@click.option("--small-count", default=2000, show_default=True)
+@click.option("--small-size", default="4K", show_default=True)
+@click.option("--medium-count", default=16, show_default=True)
+@click.option("--medium-size", default="32M", show_default=True)
+@click.option("--large-count", default=1, show_default=True)
+@click.option("--large-size", default="2G", show_default=True)
+@click.option("--block-size", default=str(DEFAULT_COPY_BLOCK_SIZE), show_default=True)
+@click.option("--repeat", default=3, show_default=True)
+@click.option(
+    "--json-out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write results as JSON.",
+)
+def main(
+    base_dir: Path | None,
+    small_count: int,
+    small_size: str,
+    medium_count: int,
+    medium_size: str,
+    large_count: int,
+    large_size: str,
+    block_size: str,
+    repeat: int,
+    json_out: Path | None,
+) -> None:
+    file_sets = {
+        "small": (small_count, parse_size(small_size)),
+        "medium": (medium_count, parse_size(medium_size)),
+        "large": (large_count, parse_size(large_size)),
+    }
+    copy_methods = get_copy_methods(parse_size(block_size))
+    results: list[dict[str, object]] = []
+
+    with TemporaryDirectory(dir=base_dir, prefix="h3a-copy-benchmark-") as temp_dir:
+        work_dir = Path(temp_dir)
+
+        for set_name, (file_count, file_size) in file_sets.items():
+            if file_count <= 0:
+                continue
+            src_dir = work_dir / f"{set_name}-src"
+            src_dir.mkdir()
+            src_paths = [src_dir / f"{i:06d}.bin" for i in range(file_count)]
+            for src_path in src_paths:
+                write_random_file(src_path, file_size)
+            total_bytes = file_count * file_size
+
+            for method_name, copy_method in copy_methods.items():
+                durations: list[float] = []
+                for _ in range(repeat):
+                    dest_dir = work_dir / f"{set_name}-dest"
+                    dest_dir.mkdir()
+                    start_time = perf_counter()
+                    for src_path in src_paths:
+                        copy_method(src_path, dest_dir / src_path.name)
+                    durations.append(perf_counter() - start_time)
+                    shutil.rmtree(dest_dir)
+
+                best_duration = min(durations)
+                results.append(
+                    {
+                        "set": set_name,
+                        "method": method_name,
+                        "files": file_count,
+                        "bytes": total_bytes,
+                        "seconds": durations,
+                        "best_mib_per_second": (total_bytes / best_duration / 1024**2),
+                    }
+                )
+                click.echo(
+                    f"{set_name:>6} {method_name:<22}"
+                    f" {best_duration:9.3f}s"
+                    f" {total_bytes / best_duration / 1024**2:10.1f} MiB/s"
+                    f" {file_count / best_duration:10.1f} files/s"
+                )
+
+            shutil.rmtree(src_dir)
+
+    if json_out is not None:
+        json_out.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
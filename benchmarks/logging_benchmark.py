@@ -0,0 +1,88 @@
+"""Compare the run time of planning and executing with and without `--verbose`.
+
+Usage: python benchmarks/logging_benchmark.py [--files 20000] [--threads 16]
+
+A temporary tree of small files is archived with the log level at WARNING
+and at INFO, with records going through the queue-based log writer to
+`os.devnull`. Per-item logs are the only difference between the runs.
+"""
+
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from threading import RLock
+from time import perf_counter
+
+import click
+
+from h3a.config import load_config
+from h3a.context import Context
+from h3a.execute import execute_plan
+from h3a.log import start_log_writer
+from h3a.plan import generate_plan
+
+
+def run_archive(root_dir: Path, *, threads: int, level: int) -> float:
+    config = load_config("include:\n  - 'src/*.txt'\nout_dir: archive\n")
+    context = Context(log_lock=RLock(), verbose=True, debug=False, threads=threads)
+    with open(os.devnull, "w") as null_file:
+        log_listener = start_log_writer(level, stream=null_file)
+        start_time = perf_counter()
+        plan = generate_plan(config=config, root_dir=root_dir, context=context)
+        execute_plan(plan, context=context)
+        duration = perf_counter() - start_time
+        log_listener.stop()
+    return duration
+
+
+@click.command()
+@click.option("--files", "file_count", default=20_000, show_default=True)
+@click.option("--threads", default=16, show_default=True)
+@click.option("--repeat", default=3, show_default=True)
+@click.option(
+    "--json-out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write results as JSON.",
+)
+def main(file_count: int, threads: int, repeat: int, json_out: Path | None) -> None:
+    levels = {"warning": logging.WARNING, "info": logging.INFO}
+    results: list[dict[str, object]] = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root_dir = Path(temp_dir)
+        (root_dir / "src").mkdir()
+        for i in range(file_count):
+            (root_dir / f"src/file-{i:08d}.txt").write_bytes(b"x" * 100)
+
+        durations: dict[str, list[float]] = {name: [] for name in levels}
+        for _ in range(repeat):
+            for name, level in levels.items():
+                durations[name].append(
+                    run_archive(root_dir, threads=threads, level=level)
+                )
+                for archived_path in (root_dir / "archive/src").iterdir():
+                    archived_path.unlink()
+
+    for name in levels:
+        best_duration = min(durations[name])
+        results.append(
+            {
+                "level": name,
+                "files": file_count,
+                "seconds": durations[name],
+                "us_per_file": best_duration / file_count * 1e6,
+            }
+        )
+        click.echo(
+            f"{name:<8} {best_duration:8.3f}s"
+            f" {best_duration / file_count * 1e6:8.1f} us/file"
+        )
+
+    if json_out is not None:
+        json_out.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
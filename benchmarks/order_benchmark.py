@@ -0,0 +1,145 @@
+"""Compare the execution orders and batching of `h3a.execute` on a mixed tree.
+
+Usage: python benchmarks/order_benchmark.py [--dir DIR] [--threads 8] ...
+
+The tree holds many small files in several directories plus a few large
+files, which come last in plan order (the worst case for the makespan).
+Chunked copies are disabled so that the effect of the order is visible.
+"""
+
+import json
+import shutil
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import RLock
+from time import perf_counter
+
+import click
+from copy_benchmark import parse_size, write_random_file
+
+from h3a.config import ExecuteOrderType
+from h3a.context import Context
+from h3a.execute import execute_plan
+from h3a.plan import Plan, PlanItem
+
+ORDERS: tuple[ExecuteOrderType, ...] = ("plan", "largest-first", "locality", "packed")
+
+
+def create_tree(
+    src_dir: Path,
+    *,
+    dir_count: int,
+    small_count: int,
+    small_size: int,
+    large_count: int,
+    large_size: int,
+) -> Plan:
+    src_paths: list[Path] = []
+    for i in range(small_count):
+        src_path = src_dir / f"dir{i % dir_count:03d}/{i:06d}.bin"
+        src_path.parent.mkdir(parents=True, exist_ok=True)
+        write_random_file(src_path, small_size)
+        src_paths.append(src_path)
+    for i in range(large_count):
+        src_path = src_dir / f"large/{i:03d}.bin"
+        src_path.parent.mkdir(parents=True, exist_ok=True)
+        write_random_file(src_path, large_size)
+        src_paths.append(src_path)
+    return [
+        PlanItem(id=(i + 1), src=src_path, dest=Path(), overwrite_flag=False)
+        for i, src_path in enumerate(src_paths)
+    ]
+
+
+@click.command()
+@click.option(
+    "--dir",
+    "base_dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory on the filesystem to benchmark.",
+)
+@click.option("--threads", default=8, show_default=True)
+@click.option("--dir-count", default=20, show_default=True)
+@click.option("--small-count", default=5000, show_default=True)
+@click.option("--small-size", default="8K", show_default=True)
+@click.option("--large-count", default=4, show_default=True)
+@click.option("--large-size", default="256M", show_default=True)
+@click.option("--batch-size", default=16, show_default=True)
+@click.option("--repeat", default=3, show_default=True)
+@click.option(
+    "--json-out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write results as JSON.",
+)
+def main(
+    base_dir: Path | None,
+    threads: int,
+    dir_count: int,
+    small_count: int,
+    small_size: str,
+    large_count: int,
+    large_size: str,
+    batch_size: int,
+    repeat: int,
+    json_out: Path | None,
+) -> None:
+    results: list[dict[str, object]] = []
+
+    with TemporaryDirectory(dir=base_dir, prefix="h3a-order-benchmark-") as temp_dir:
+        work_dir = Path(temp_dir)
+        src_dir = work_dir / "src"
+        dest_dir = work_dir / "dest"
+        plan = create_tree(
+            src_dir,
+            dir_count=dir_count,
+            small_count=small_count,
+            small_size=parse_size(small_size),
+            large_count=large_count,
+            large_size=parse_size(large_size),
+        )
+        plan = [
+            plan_item._replace(dest=(dest_dir / plan_item.src.relative_to(src_dir)))
+            for plan_item in plan
+        ]
+
+        for order in ORDERS:
+            for batching in (False, True):
+                context = Context(
+                    log_lock=RLock(),
+                    verbose=True,
+                    debug=False,
+                    threads=threads,
+                    chunk_threshold=0,
+                    execute_order=order,
+                    batch_threshold=(parse_size(small_size) if batching else 0),
+                    batch_size=batch_size,
+                )
+                durations: list[float] = []
+                for _ in range(repeat):
+                    start_time = perf_counter()
+                    execute_plan(plan, context=context)
+                    durations.append(perf_counter() - start_time)
+                    shutil.rmtree(dest_dir)
+
+                best_duration = min(durations)
+                results.append(
+                    {
+                        "order": order,
+                        "batching": batching,
+                        "threads": threads,
+                        "files": len(plan),
+                        "seconds": durations,
+                    }
+                )
+                click.echo(
+                    f"{order:<14} {'batched' if batching else 'single':<8}"
+                    f" {best_duration:9.3f}s"
+                    f" {len(plan) / best_duration:10.1f} files/s"
+                )
+
+    if json_out is not None:
+        json_out.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compare the memory taken by a list plan and a `CompactPlan`.
+
+Usage: python benchmarks/plan_memory_benchmark.py [--items 1000000] ...
+
+Plan items are synthesized (no files are created) with paths spread over
+`--dirs` directories, `--depth` components deep, like a real archive.
+Memory is measured with `tracemalloc` after the plan is built, and the
+time to format every plan item is measured without tracing.
+"""
+
+import gc
+import json
+import tracemalloc
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from time import perf_counter
+
+import click
+
+from h3a.plan import CompactPlan, Plan, PlanItem, format_plan_item
+
+
+def iter_plan_items(
+    root_dir: Path, *, item_count: int, dir_count: int, depth: int
+) -> Iterator[PlanItem]:
+    dir_paths = [
+        Path(
+            *(f"level{level}-{i % (level + 2)}" for level in range(depth - 1)), f"d{i}"
+        )
+        for i in range(dir_count)
+    ]
+    for i in range(item_count):
+        relative_dir = dir_paths[i % dir_count]
+        yield PlanItem(
+            id=(i + 1),
+            src=(root_dir / relative_dir / f"file-{i:08d}.dat"),
+            dest=(root_dir / "archive" / relative_dir / f"file-{i:08d}_v20250101.dat"),
+            overwrite_flag=False,
+        )
+
+
+def measure(build: Callable[[], Plan]) -> tuple[Plan, int]:
+    gc.collect()
+    tracemalloc.start()
+    plan = build()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return plan, memory
+
+
+@click.command()
+@click.option("--items", "item_count", default=1_000_000, show_default=True)
+@click.option("--dirs", "dir_count", default=5000, show_default=True)
+@click.option("--depth", default=6, show_default=True)
+@click.option(
+    "--json-out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write results as JSON.",
+)
+def main(item_count: int, dir_count: int, depth: int, json_out: Path | None) -> None:
+    root_dir = Path("/srv/data")
+    builders: dict[str, Callable[[], Plan]] = {
+        "list": lambda: list(
+            iter_plan_items(
+                root_dir, item_count=item_count, dir_count=dir_count, depth=depth
+            )
+        ),
+        "compact": lambda: CompactPlan(
+            iter_plan_items(
+                root_dir, item_count=item_count, dir_count=dir_count, depth=depth
+            )
+        ),
+    }
+    results: list[dict[str, object]] = []
+
+    for name, build in builders.items():
+        plan, memory = measure(build)
+        start_time = perf_counter()
+        for plan_item in plan:
+            format_plan_item(plan_item)
+        iterate_seconds = perf_counter() - start_time
+        del plan
+
+        results.append(
+            {
+                "plan": name,
+                "items": item_count,
+                "bytes": memory,
+                "bytes_per_item": memory / item_count,
+                "iterate_seconds": iterate_seconds,
+            }
+        )
+        click.echo(
+            f"{name:<8} {memory / 1024**2:10.1f} MiB"
+            f" {memory / item_count:8.1f} B/item"
+            f" iterate {iterate_seconds:7.2f}s"
+        )
+
+    if json_out is not None:
+        json_out.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
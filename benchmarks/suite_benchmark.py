@@ -0,0 +1,190 @@
+"""Time scanning, planning and execution on a synthetic tree.
+
+Usage: python benchmarks/suite_benchmark.py [--tree-dir DIR] [--files 100000]
+       [--json-out results.json] [--compare baseline.json] ...
+
+A reproducible tree is generated by `synthetic_tree.py` (see its options),
+in a temporary directory unless `--tree-dir` is given, in which case it is
+kept and reused by later runs with the same options. Each phase is timed
+separately, `--repeat` times, on a warm page cache:
+
+- scan: collecting the source files;
+- plan: generating the plan (which includes scanning);
+- execute: executing the plan into an empty output directory.
+
+Results are written as JSON with the commit, version and host, and
+`--compare` prints the ratio of the best times to those of an earlier
+result file, so that regressions between commits stand out.
+"""
+
+import json
+import shutil
+import subprocess
+from collections.abc import Callable
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import RLock
+from time import perf_counter
+from typing import Final
+
+import click
+from synthetic_tree import (
+    OUT_DIR,
+    TreeSpec,
+    TreeSummary,
+    ensure_tree,
+    get_tree_spec,
+    tree_options,
+)
+
+from h3a.config import load_config
+from h3a.context import Context
+from h3a.execute import execute_plan
+from h3a.plan import generate_plan, iter_source_files
+from h3a.profile import get_h3a_version, get_host_report
+
+PHASES: Final = ("scan", "plan", "execute")
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_phases(root_dir: Path, *, threads: int, repeat: int) -> dict[str, list[float]]:
+    config = load_config((root_dir / "h3a.yaml").read_text())
+    context = Context(log_lock=RLock(), verbose=True, debug=False, threads=threads)
+    out_dir = root_dir / OUT_DIR
+    durations: dict[str, list[float]] = {phase: [] for phase in PHASES}
+
+    def measure(phase: str, run: Callable[[], object]) -> None:
+        start_time = perf_counter()
+        run()
+        durations[phase].append(perf_counter() - start_time)
+
+    for _ in range(repeat):
+        shutil.rmtree(out_dir, ignore_errors=True)
+        measure("scan", lambda: sum(1 for _ in iter_source_files(root_dir, config)))
+        plan = generate_plan(
+            config=config, root_dir=root_dir, context=context, compact=True
+        )
+        shutil.rmtree(out_dir, ignore_errors=True)
+        measure(
+            "plan",
+            lambda: generate_plan(
+                config=config, root_dir=root_dir, context=context, compact=True
+            ),
+        )
+        measure("execute", lambda: execute_plan(plan, context=context))
+    shutil.rmtree(out_dir, ignore_errors=True)
+    return durations
+
+
+def get_results(
+    spec: TreeSpec,
+    summary: TreeSummary,
+    durations: dict[str, list[float]],
+    *,
+    threads: int,
+) -> dict[str, object]:
+    phase_results: dict[str, object] = {}
+    for phase, seconds in durations.items():
+        best_seconds = min(seconds)
+        phase_results[phase] = {
+            "seconds": seconds,
+            "best_seconds": best_seconds,
+            "files_per_second": (
+                summary.included_count / best_seconds if best_seconds > 0 else None
+            ),
+        }
+    return {
+        "commit": get_commit(),
+        "h3a_version": get_h3a_version(),
+        "host": get_host_report(),
+        "threads": threads,
+        "spec": spec._asdict(),
+        "tree": summary._asdict(),
+        "phases": phase_results,
+    }
+
+
+def print_comparison(results: dict[str, object], baseline: dict[str, object]) -> None:
+    if baseline["spec"] != results["spec"]:
+        click.echo("Warning: the baseline was run on a different tree.", err=True)
+    click.echo(f"Compared to {baseline['commit']} (ratio of best times):")
+    phases = results["phases"]
+    baseline_phases = baseline["phases"]
+    assert isinstance(phases, dict) and isinstance(baseline_phases, dict)
+    for phase in PHASES:
+        if phase not in baseline_phases:
+            continue
+        ratio = phases[phase]["best_seconds"] / baseline_phases[phase]["best_seconds"]
+        click.echo(f"{phase:<8} {ratio:8.3f}x")
+
+
+@click.command()
+@click.option(
+    "--tree-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory to generate (or reuse) the tree in.",
+)
+@tree_options
+@click.option("--threads", default=8, show_default=True)
+@click.option("--repeat", default=3, show_default=True)
+@click.option(
+    "--json-out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write results as JSON.",
+)
+@click.option(
+    "compare_path",
+    "--compare",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Compare with the results of an earlier run.",
+)
+def main(
+    tree_dir: Path | None,
+    threads: int,
+    repeat: int,
+    json_out: Path | None,
+    compare_path: Path | None,
+    **tree_args: object,
+) -> None:
+    spec = get_tree_spec(**tree_args)  # type: ignore[arg-type]
+
+    with TemporaryDirectory() as temp_dir:
+        root_dir = tree_dir if tree_dir is not None else Path(temp_dir)
+        generate_start_time = perf_counter()
+        summary = ensure_tree(root_dir, spec)
+        click.echo(
+            f"Tree: {summary.included_count}/{summary.file_count} file(s) included"
+            f" in {summary.dir_count} dir(s)"
+            f" ({perf_counter() - generate_start_time:.1f}s to prepare)"
+        )
+        durations = time_phases(root_dir, threads=threads, repeat=repeat)
+
+    results = get_results(spec, summary, durations, threads=threads)
+    for phase in PHASES:
+        best_seconds = min(durations[phase])
+        click.echo(
+            f"{phase:<8} {best_seconds:8.3f}s"
+            f" {best_seconds / max(summary.included_count, 1) * 1e6:8.1f} us/file"
+        )
+
+    if compare_path is not None:
+        print_comparison(results, json.loads(compare_path.read_text()))
+
+    if json_out is not None:
+        json_out.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Generate a reproducible synthetic source tree for benchmarks.
+
+Usage: python benchmarks/synthetic_tree.py DIR [--files 100000] [--seed 0] ...
+
+The same options (and seed) always give the same directories, names, sizes
+and contents. Files are spread over `--dirs` directories up to `--depth`
+levels deep, with sizes drawn from `--size-distribution`. A share of the
+files (`--excluded-ratio`) is left out by the generated config: half of
+them by extension and half by being in `cache` directories.
+
+The spec is stored in `DIR/tree.json`, so that a tree is generated once
+and reused by later runs (and by other commits) with the same options.
+"""
+
+import json
+import math
+import random
+from pathlib import Path
+from typing import Final, Literal, NamedTuple, assert_never, get_args
+
+import click
+from copy_benchmark import parse_size
+
+type SizeDistributionType = Literal["fixed", "uniform", "lognormal"]
+
+TREE_SPEC_FILE: Final = "tree.json"
+SRC_DIR: Final = "src"
+OUT_DIR: Final = "archive"
+# The weights of the extensions of included files.
+INCLUDED_SUFFIXES: Final = {".dat": 5, ".txt": 3, ".log": 2}
+EXCLUDED_SUFFIX: Final = ".tmp"
+EXCLUDED_DIR: Final = "cache"
+LOGNORMAL_SIGMA: Final = 1.5
+# Contents are slices of one seeded buffer, so that generation stays fast.
+CONTENT_BUFFER_SIZE: Final = 4 * 1024 * 1024
+
+
+class TreeSpec(NamedTuple):
+    file_count: int
+    dir_count: int
+    depth: int
+    fanout: int
+    size_distribution: SizeDistributionType
+    mean_size: int
+    max_size: int
+    excluded_ratio: float
+    seed: int
+
+
+class TreeSummary(NamedTuple):
+    dir_count: int
+    file_count: int
+    total_bytes: int
+    included_count: int
+    included_bytes: int
+
+
+def get_config_text(spec: TreeSpec) -> str:
+    include = "".join(f"  - '{SRC_DIR}/**/*{suffix}'\n" for suffix in INCLUDED_SUFFIXES)
+    return (
+        f"include:\n{include}"
+        f"exclude:\n"
+        f"  - '**/*{EXCLUDED_SUFFIX}'\n"
+        f"  - '**/{EXCLUDED_DIR}/*'\n"
+        f"out_dir: {OUT_DIR}\n"
+    )
+
+
+def draw_size(rng: random.Random, spec: TreeSpec) -> int:
+    match spec.size_distribution:
+        case "fixed":
+            size = spec.mean_size
+        case "uniform":
+            size = rng.randint(0, 2 * spec.mean_size)
+        case "lognormal":
+            # Most files are small and a few are large, like real trees.
+            mu = math.log(max(spec.mean_size, 1)) - LOGNORMAL_SIGMA**2 / 2
+            size = round(rng.lognormvariate(mu, LOGNORMAL_SIGMA))
+        case _:
+            assert_never(spec.size_distribution)
+    return min(size, spec.max_size)
+
+
+def write_content(path: Path, content: bytes, offset: int, size: int) -> None:
+    with path.open("wb") as file:
+        while size > 0:
+            chunk = content[offset : offset + size]
+            file.write(chunk)
+            size -= len(chunk)
+            offset = 0
+
+
+def generate_tree(root_dir: Path, spec: TreeSpec) -> TreeSummary:
+    rng = random.Random(spec.seed)
+    content = rng.randbytes(CONTENT_BUFFER_SIZE)
+
+    dir_paths: list[str] = []
+    cache_dir_paths: list[str] = []
+    seen_dir_paths = set[str]()
+    for _ in range(spec.dir_count):
+        dir_depth = rng.randint(1, spec.depth)
+        dir_path = "/".join(f"d{rng.randrange(spec.fanout)}" for _ in range(dir_depth))
+        if dir_path not in seen_dir_paths:
+            seen_dir_paths.add(dir_path)
+            dir_paths.append(dir_path)
+            cache_dir_paths.append(f"{dir_path}/{EXCLUDED_DIR}")
+
+    suffixes = list(INCLUDED_SUFFIXES)
+    suffix_weights = list(INCLUDED_SUFFIXES.values())
+    created_dirs = set[str]()
+    total_bytes = 0
+    included_count = 0
+    included_bytes = 0
+    for i in range(spec.file_count):
+        size = draw_size(rng, spec)
+        dir_index = rng.randrange(len(dir_paths))
+        dir_path = dir_paths[dir_index]
+        suffix = rng.choices(suffixes, suffix_weights)[0]
+        if rng.random() < spec.excluded_ratio:
+            if rng.random() < 0.5:
+                suffix = EXCLUDED_SUFFIX
+            else:
+                dir_path = cache_dir_paths[dir_index]
+        else:
+            included_count += 1
+            included_bytes += size
+
+        if dir_path not in created_dirs:
+            (root_dir / SRC_DIR / dir_path).mkdir(parents=True, exist_ok=True)
+            created_dirs.add(dir_path)
+        write_content(
+            root_dir / SRC_DIR / dir_path / f"f{i:07d}{suffix}",
+            content,
+            rng.randrange(CONTENT_BUFFER_SIZE),
+            size,
+        )
+        total_bytes += size
+
+    (root_dir / "h3a.yaml").write_text(get_config_text(spec))
+    summary = TreeSummary(
+        dir_count=len(created_dirs),
+        file_count=spec.file_count,
+        total_bytes=total_bytes,
+        included_count=included_count,
+        included_bytes=included_bytes,
+    )
+    (root_dir / TREE_SPEC_FILE).write_text(
+        json.dumps({"spec": spec._asdict(), "summary": summary._asdict()}, indent=2)
+    )
+    return summary
+
+
+def ensure_tree(root_dir: Path, spec: TreeSpec) -> TreeSummary:
+    # An existing tree is reused only if it was generated from the same
+    # spec, and a directory holding anything else is never written into.
+    spec_path = root_dir / TREE_SPEC_FILE
+    if spec_path.exists():
+        tree_data = json.loads(spec_path.read_text())
+        if tree_data["spec"] != spec._asdict():
+            raise RuntimeError(f"Tree was generated from another spec: {root_dir}")
+        return TreeSummary(**tree_data["summary"])
+    if root_dir.exists() and any(root_dir.iterdir()):
+        raise RuntimeError(f"Tree directory is not empty: {root_dir}")
+    root_dir.mkdir(parents=True, exist_ok=True)
+    return generate_tree(root_dir, spec)
+
+
+def tree_options[F](command: F) -> F:
+    # Options shared with the benchmark suite.
+    options = [
+        click.option("--files", "file_count", default=100_000, show_default=True),
+        click.option("--dirs", "dir_count", default=1000, show_default=True),
+        click.option("--depth", default=4, show_default=True),
+        click.option("--fanout", default=8, show_default=True),
+        click.option(
+            "--size-distribution",
+            type=click.Choice(get_args(SizeDistributionType.__value__)),
+            default="lognormal",
+            show_default=True,
+        ),
+        click.option("--mean-size", default="4K", show_default=True),
+        click.option("--max-size", default="64M", show_default=True),
+        click.option("--excluded-ratio", default=0.2, show_default=True),
+        click.option("--seed", default=0, show_default=True),
+    ]
+    for option in reversed(options):
+        command = option(command)  # type: ignore[operator]
+    return command
+
+
+def get_tree_spec(
+    *,
+    file_count: int,
+    dir_count: int,
+    depth: int,
+    fanout: int,
+    size_distribution: SizeDistributionType,
+    mean_size: str,
+    max_size: str,
+    excluded_ratio: float,
+    seed: int,
+) -> TreeSpec:
+    return TreeSpec(
+        file_count=file_count,
+        dir_count=dir_count,
+        depth=depth,
+        fanout=fanout,
+        size_distribution=size_distribution,
+        mean_size=parse_size(mean_size),
+        max_size=parse_size(max_size),
+        excluded_ratio=excluded_ratio,
+        seed=seed,
+    )
+
+
+@click.command()
+@click.argument("root_dir", type=click.Path(file_okay=False, path_type=Path))
+@tree_options
+def main(root_dir: Path, **tree_args: object) -> None:
+    spec = get_tree_spec(**tree_args)  # type: ignore[arg-type]
+    summary = ensure_tree(root_dir, spec)
+    click.echo(
+        f"{summary.file_count} file(s) in {summary.dir_count} dir(s),"
+        f" {summary.total_bytes} byte(s); {summary.included_count} file(s),"
+        f" {summary.included_bytes} byte(s) included."
+    )
+
+
+if __name__ == "__main__":
+    main()
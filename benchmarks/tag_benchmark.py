@@ -0,0 +1,111 @@
+"""Compare per-file tag handling in planning with and without `TagRenderer`.
+
+Usage: python benchmarks/tag_benchmark.py [--files 1000000] [--seconds 10000]
+
+A synthetic tree is described by file stems and mtimes only (no files are
+created), with the mtimes spread over `--seconds` distinct seconds, as
+files written in batches are. The measured loop is the tag part of
+planning: the matched-tag skip check, rendering the tag and checking it.
+"""
+
+import json
+import random
+import re
+from pathlib import Path
+from time import localtime, perf_counter, strftime
+
+import click
+
+from h3a.config import DEFAULT_TAG_FORMAT, DEFAULT_TAG_PATTERN
+from h3a.plan import TagRenderer
+
+
+def plan_tags_baseline(
+    files: list[tuple[str, float]], tag_format: str, tag_pattern: str
+) -> list[str]:
+    # The pipeline before `TagRenderer`: patterns are looked up by string
+    # and every tag is rendered with `strftime`.
+    tag_length = len(strftime(tag_format))
+    tags: list[str] = []
+    for stem, mtime in files:
+        if re.fullmatch(tag_pattern, stem[-tag_length:]):
+            continue
+        tag = strftime(tag_format, localtime(mtime))
+        if not re.fullmatch(tag_pattern, tag):
+            raise RuntimeError(f"Generated tag {tag!r} is incompatible")
+        tags.append(tag)
+    return tags
+
+
+def plan_tags_renderer(
+    files: list[tuple[str, float]], tag_format: str, tag_pattern: str
+) -> list[str]:
+    tag_renderer = TagRenderer(tag_format, tag_pattern)
+    tag_length = len(strftime(tag_format))
+    tags: list[str] = []
+    for stem, mtime in files:
+        if tag_renderer.matches(stem[-tag_length:]):
+            continue
+        tags.append(tag_renderer.render(mtime))
+    return tags
+
+
+@click.command()
+@click.option("--files", "file_count", default=1_000_000, show_default=True)
+@click.option("--seconds", "second_count", default=10_000, show_default=True)
+@click.option("--tag-format", default=DEFAULT_TAG_FORMAT, show_default=True)
+@click.option("--tag-pattern", default=DEFAULT_TAG_PATTERN, show_default=True)
+@click.option("--repeat", default=3, show_default=True)
+@click.option(
+    "--json-out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write results as JSON.",
+)
+def main(
+    file_count: int,
+    second_count: int,
+    tag_format: str,
+    tag_pattern: str,
+    repeat: int,
+    json_out: Path | None,
+) -> None:
+    rng = random.Random(0)
+    base_time = 1_700_000_000
+    files = [
+        (f"file-{i:08d}", base_time + rng.randrange(second_count) + rng.random())
+        for i in range(file_count)
+    ]
+    methods = {"baseline": plan_tags_baseline, "renderer": plan_tags_renderer}
+    results: list[dict[str, object]] = []
+
+    expected_tags: list[str] | None = None
+    for name, method in methods.items():
+        durations: list[float] = []
+        for _ in range(repeat):
+            start_time = perf_counter()
+            tags = method(files, tag_format, tag_pattern)
+            durations.append(perf_counter() - start_time)
+        if expected_tags is None:
+            expected_tags = tags
+        assert tags == expected_tags
+
+        best_duration = min(durations)
+        results.append(
+            {
+                "method": name,
+                "files": file_count,
+                "seconds": durations,
+                "ns_per_file": best_duration / file_count * 1e9,
+            }
+        )
+        click.echo(
+            f"{name:<9} {best_duration:8.3f}s"
+            f" {best_duration / file_count * 1e9:8.0f} ns/file"
+        )
+
+    if json_out is not None:
+        json_out.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,21 @@
-from . import cli, config, context, execute, plan  # noqa: F401
+from . import (  # noqa: F401
+    autotune,
+    catalog,
+    cli,
+    config,
+    context,
+    digest,
+    execute,
+    log,
+    manifest,
+    metrics,
+    output,
+    plan,
+    planfile,
+    profile,
+    progress,
+    prune,
+    scan,
+    schedule,
+    transfer,
+)
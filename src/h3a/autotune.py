@@ -0,0 +1,142 @@
+import json
+import os
+from logging import getLogger
+from pathlib import Path
+from typing import Final, NamedTuple
+
+logger = getLogger(__name__)
+
+AUTOTUNE_MIN_THREADS: Final = 1
+AUTOTUNE_MAX_THREADS: Final = 64
+AUTOTUNE_INITIAL_THREADS: Final = 4
+AUTOTUNE_INTERVAL_SECONDS: Final = 1.0
+# Relative changes in throughput smaller than this are treated as noise.
+AUTOTUNE_TOLERANCE: Final = 0.1
+
+
+class Throughput(NamedTuple):
+    bytes_per_second: float
+    files_per_second: float
+
+
+def is_better_throughput(throughput: Throughput, baseline: Throughput) -> bool:
+    # Either rate has to improve while the other doesn't get worse,
+    # so that both large-file and small-file runs can be tuned.
+    changes = [
+        (value - baseline_value) / baseline_value if baseline_value > 0 else 0.0
+        for value, baseline_value in zip(throughput, baseline)
+    ]
+    return max(changes) > AUTOTUNE_TOLERANCE and min(changes) > -AUTOTUNE_TOLERANCE
+
+
+class ThreadTuner:
+    threads: int
+    min_threads: int
+    max_threads: int
+    interval_seconds: float
+    settled: bool
+    best_threads: int
+    best_throughput: Throughput | None
+    direction: int
+    turned_back: bool
+    sample_start_time: float | None
+    sample_start_bytes: int
+    sample_start_files: int
+
+    def __init__(
+        self,
+        threads: int = AUTOTUNE_INITIAL_THREADS,
+        *,
+        min_threads: int = AUTOTUNE_MIN_THREADS,
+        max_threads: int = AUTOTUNE_MAX_THREADS,
+        interval_seconds: float = AUTOTUNE_INTERVAL_SECONDS,
+    ) -> None:
+        self.threads = min(max(threads, min_threads), max_threads)
+        self.min_threads = min_threads
+        self.max_threads = max_threads
+        self.interval_seconds = interval_seconds
+        self.settled = False
+        self.best_threads = self.threads
+        self.best_throughput = None
+        self.direction = 1
+        self.turned_back = False
+        self.sample_start_time = None
+        self.sample_start_bytes = 0
+        self.sample_start_files = 0
+
+    def get_next_threads(self) -> int:
+        if self.direction > 0:
+            return min(self.best_threads * 2, self.max_threads)
+        return max(self.best_threads // 2, self.min_threads)
+
+    def move(self) -> None:
+        next_threads = self.get_next_threads()
+        if next_threads == self.best_threads and not self.turned_back:
+            self.turned_back = True
+            self.direction = -self.direction
+            next_threads = self.get_next_threads()
+        if next_threads == self.best_threads:
+            self.settled = True
+        self.threads = next_threads
+
+    def update(self, now: float, bytes_done: int, files_done: int) -> None:
+        # Hill climbing: the thread count is doubled (or halved) as long as
+        # the throughput improves, then the other direction is tried once,
+        # and the best thread count is settled on.
+        if self.settled:
+            return
+        if self.sample_start_time is None:
+            self.sample_start_time = now
+            self.sample_start_bytes = bytes_done
+            self.sample_start_files = files_done
+            return
+
+        elapsed = now - self.sample_start_time
+        if elapsed < self.interval_seconds:
+            return
+        throughput = Throughput(
+            bytes_per_second=(bytes_done - self.sample_start_bytes) / elapsed,
+            files_per_second=(files_done - self.sample_start_files) / elapsed,
+        )
+        self.sample_start_time = now
+        self.sample_start_bytes = bytes_done
+        self.sample_start_files = files_done
+
+        logger.debug(
+            f"Throughput with {self.threads} threads:"
+            f" {throughput.bytes_per_second:.0f} B/s,"
+            f" {throughput.files_per_second:.1f} files/s"
+        )
+
+        if self.best_throughput is None:
+            self.best_throughput = throughput
+        elif is_better_throughput(throughput, self.best_throughput):
+            self.best_threads = self.threads
+            self.best_throughput = throughput
+        elif self.turned_back:
+            self.threads = self.best_threads
+            self.settled = True
+            return
+        else:
+            self.turned_back = True
+            self.direction = -self.direction
+        self.move()
+
+
+def load_tuned_threads(path: Path) -> int | None:
+    try:
+        tuned_threads = json.loads(path.read_text(encoding="utf-8"))["threads"]
+    except FileNotFoundError:
+        return None
+    except (ValueError, TypeError, KeyError):
+        tuned_threads = None
+    if not isinstance(tuned_threads, int) or tuned_threads < 1:
+        logger.warning(f"Tuned threads file is corrupt, ignoring it: {path}")
+        return None
+    return tuned_threads
+
+
+def save_tuned_threads(path: Path, threads: int) -> None:
+    temp_path = path.with_name(path.name + ".tmp")
+    temp_path.write_text(json.dumps({"threads": threads}), encoding="utf-8")
+    os.replace(temp_path, path)
@@ -0,0 +1,312 @@
+import bisect
+import json
+import os
+import re
+from collections.abc import Iterable
+from datetime import datetime
+from functools import lru_cache
+from hashlib import sha256
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import Final
+
+from .config import Config
+
+logger = getLogger(__name__)
+
+CATALOG_VERSION: Final = 1
+TAG_TIME_CACHE_SIZE: Final = 4096
+
+
+class CatalogDir:
+    mtime_ns: int
+    subdirs: set[str]
+    # Source names (stem + suffix) mapped to the sorted tags of their versions.
+    versions: dict[str, list[str]]
+
+    def __init__(
+        self,
+        mtime_ns: int,
+        subdirs: set[str] | None = None,
+        versions: dict[str, list[str]] | None = None,
+    ) -> None:
+        self.mtime_ns = mtime_ns
+        self.subdirs = subdirs if subdirs is not None else set()
+        self.versions = versions if versions is not None else {}
+
+
+def get_catalog_fingerprint(config: Config, root_dir: Path) -> str:
+    # Only the config items affecting the indexed versions invalidate the catalog.
+    fingerprint_data = [str(root_dir), config["out_dir"], config["tag_pattern"]]
+    return sha256(json.dumps(fingerprint_data).encode()).hexdigest()
+
+
+@lru_cache(maxsize=TAG_TIME_CACHE_SIZE)
+def parse_tag_time(tag: str, tag_format: str) -> datetime | None:
+    # Many versions share their tags, so parsed tags are memoized.
+    try:
+        return datetime.strptime(tag, tag_format)
+    except ValueError:
+        return None
+
+
+def sort_versions(
+    versions: Iterable[tuple[str, Path]], *, tag_format: str
+) -> list[Path]:
+    # Versions are ordered by the time of their tags, which need not sort as
+    # text (e.g. `_%d%m%Y`), or by their mtimes if any tag doesn't parse.
+    # Missing versions are left out in the latter case.
+    versions = list(versions)
+    tag_times = [parse_tag_time(tag, tag_format) for tag, _ in versions]
+    if None not in tag_times:
+        return [
+            version_path
+            for _, _, version_path in sorted(
+                (tag_time, tag, version_path)
+                for tag_time, (tag, version_path) in zip(tag_times, versions)
+            )
+        ]
+    version_mtimes: list[tuple[float, str, Path]] = []
+    for tag, version_path in versions:
+        try:
+            version_mtimes.append((version_path.stat().st_mtime, tag, version_path))
+        except FileNotFoundError:
+            continue
+    return [version_path for _, _, version_path in sorted(version_mtimes)]
+
+
+class VersionCatalog:
+    # Catalogs without a path are kept in memory only.
+    path: Path | None
+    fingerprint: str
+    out_dir: Path
+    tag_regex: re.Pattern[str]
+    tag_format: str
+    lock: Lock
+    dirs: dict[str, CatalogDir]
+    touched_dirs: set[str]
+
+    def __init__(self, path: Path | None, *, config: Config, root_dir: Path) -> None:
+        self.path = path
+        self.fingerprint = get_catalog_fingerprint(config, root_dir)
+        self.out_dir = (root_dir / config["out_dir"]).resolve()
+        self.tag_regex = re.compile(f"(?s:(.*?)(?:{config['tag_pattern']}))\\Z")
+        self.tag_format = config["tag_format"]
+        self.lock = Lock()
+        self.dirs = {}
+        self.touched_dirs = set()
+
+    def parse_name(self, name: str) -> tuple[str, str] | None:
+        # Returns the source name and the tag of a version file name.
+        name_path = Path(name)
+        match = self.tag_regex.match(name_path.stem)
+        if match is None:
+            return None
+        stem = match.group(1)
+        return stem + name_path.suffix, name_path.stem[len(stem) :]
+
+    def load(self) -> None:
+        assert self.path is not None
+        self.dirs = {}
+
+        try:
+            catalog_text = self.path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            logger.info(
+                f"Catalog not found, indexing the output directory: {self.path}"
+            )
+            return
+
+        try:
+            catalog_data = json.loads(catalog_text)
+            if catalog_data["version"] != CATALOG_VERSION:
+                logger.warning(f"Catalog version mismatch, reindexing: {self.path}")
+                return
+            if catalog_data["fingerprint"] != self.fingerprint:
+                logger.warning(f"Catalog is stale, reindexing: {self.path}")
+                return
+            dirs = {
+                str(key): CatalogDir(
+                    mtime_ns=int(mtime_ns),
+                    subdirs=set(map(str, subdirs)),
+                    versions={
+                        str(name): sorted(map(str, tags))
+                        for name, tags in versions.items()
+                    },
+                )
+                for key, (mtime_ns, subdirs, versions) in catalog_data["dirs"].items()
+            }
+        except (ValueError, TypeError, KeyError, AttributeError):
+            logger.warning(f"Catalog is corrupt, reindexing: {self.path}")
+            return
+
+        self.dirs = dirs
+        logger.debug(f"Loaded {len(dirs)} catalog directories from: {self.path}")
+
+    def index_dir(self, key: str, mtime_ns: int) -> CatalogDir:
+        catalog_dir = CatalogDir(mtime_ns)
+        try:
+            with os.scandir(self.out_dir / key) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        catalog_dir.subdirs.add(entry.name)
+                    elif entry.is_file():
+                        parsed_name = self.parse_name(entry.name)
+                        if parsed_name is not None:
+                            name, tag = parsed_name
+                            catalog_dir.versions.setdefault(name, []).append(tag)
+        except OSError:
+            pass
+        for tags in catalog_dir.versions.values():
+            tags.sort()
+        return catalog_dir
+
+    def refresh(self) -> None:
+        # Only directories whose mtime changed since they were indexed are
+        # listed again, so a valid catalog costs one stat per directory.
+        dirs: dict[str, CatalogDir] = {}
+        indexed_count = 0
+        pending_keys = ["."]
+        while pending_keys:
+            key = pending_keys.pop()
+            try:
+                dir_stat = os.stat(self.out_dir / key)
+            except OSError:
+                continue
+            catalog_dir = self.dirs.get(key)
+            if catalog_dir is None or catalog_dir.mtime_ns != dir_stat.st_mtime_ns:
+                catalog_dir = self.index_dir(key, dir_stat.st_mtime_ns)
+                indexed_count += 1
+            dirs[key] = catalog_dir
+            pending_keys.extend(
+                os.path.normpath(os.path.join(key, subdir))
+                for subdir in catalog_dir.subdirs
+            )
+        self.dirs = dirs
+        self.touched_dirs = set()
+        logger.debug(f"Indexed {indexed_count} of {len(dirs)} catalog directories.")
+
+    def get_dir_key(self, dir_path: Path) -> str:
+        return os.path.normpath(dir_path.relative_to(self.out_dir))
+
+    def get_versions(self, relative_src_path: str) -> list[str]:
+        # The tags of the versions of a source path relative to the output
+        # directory, oldest first for the default tag format.
+        dir_key, name = os.path.split(relative_src_path)
+        catalog_dir = self.dirs.get(os.path.normpath(dir_key))
+        if catalog_dir is None:
+            return []
+        return list(catalog_dir.versions.get(name, ()))
+
+    def exists(self, dest_path: Path) -> bool:
+        parsed_name = self.parse_name(dest_path.name)
+        if parsed_name is None:
+            return False
+        name, tag = parsed_name
+        catalog_dir = self.dirs.get(self.get_dir_key(dest_path.parent))
+        if catalog_dir is None:
+            return False
+        tags = catalog_dir.versions.get(name, [])
+        index = bisect.bisect_left(tags, tag)
+        return index < len(tags) and tags[index] == tag
+
+    def get_version_path(self, dir_key: str, name: str, tag: str) -> Path:
+        name_path = Path(name)
+        return self.out_dir / dir_key / name_path.with_stem(name_path.stem + tag)
+
+    def find_latest(self, dest_dir: Path, src_path: Path) -> Path | None:
+        dir_key = self.get_dir_key(dest_dir)
+        catalog_dir = self.dirs.get(dir_key)
+        if catalog_dir is None:
+            return None
+        tags = catalog_dir.versions.get(src_path.name)
+        if not tags:
+            return None
+        # Tags are sorted as text for lookups, not by time.
+        version_paths = sort_versions(
+            ((tag, self.get_version_path(dir_key, src_path.name, tag)) for tag in tags),
+            tag_format=self.tag_format,
+        )
+        return version_paths[-1] if version_paths else None
+
+    def ensure_dir(self, key: str) -> CatalogDir:
+        catalog_dir = self.dirs.get(key)
+        if catalog_dir is None:
+            catalog_dir = self.dirs[key] = CatalogDir(mtime_ns=-1)
+            if key != ".":
+                parent_key, name = os.path.split(key)
+                self.ensure_dir(parent_key or ".").subdirs.add(name)
+                self.touched_dirs.add(parent_key or ".")
+        return catalog_dir
+
+    def add(self, dest_path: Path) -> None:
+        parsed_name = self.parse_name(dest_path.name)
+        if parsed_name is None:
+            return
+        name, tag = parsed_name
+        key = self.get_dir_key(dest_path.parent)
+        with self.lock:
+            tags = self.ensure_dir(key).versions.setdefault(name, [])
+            index = bisect.bisect_left(tags, tag)
+            if index == len(tags) or tags[index] != tag:
+                tags.insert(index, tag)
+            self.touched_dirs.add(key)
+
+    def remove(self, dest_path: Path) -> None:
+        parsed_name = self.parse_name(dest_path.name)
+        if parsed_name is None:
+            return
+        name, tag = parsed_name
+        key = self.get_dir_key(dest_path.parent)
+        with self.lock:
+            catalog_dir = self.dirs.get(key)
+            if catalog_dir is None:
+                return
+            tags = catalog_dir.versions.get(name, [])
+            index = bisect.bisect_left(tags, tag)
+            if index < len(tags) and tags[index] == tag:
+                del tags[index]
+                if not tags:
+                    del catalog_dir.versions[name]
+            self.touched_dirs.add(key)
+
+    def save(self) -> None:
+        assert self.path is not None
+        # Directories written by this run are stated again, so that they
+        # aren't listed again next time.
+        for key in self.touched_dirs:
+            try:
+                self.dirs[key].mtime_ns = os.stat(self.out_dir / key).st_mtime_ns
+            except OSError:
+                self.dirs[key].mtime_ns = -1
+        self.touched_dirs = set()
+
+        catalog_data = {
+            "version": CATALOG_VERSION,
+            "fingerprint": self.fingerprint,
+            "dirs": {
+                key: [
+                    catalog_dir.mtime_ns,
+                    sorted(catalog_dir.subdirs),
+                    catalog_dir.versions,
+                ]
+                for key, catalog_dir in self.dirs.items()
+            },
+        }
+
+        # Write to a temporary file first so that an interrupted
+        # save never leaves a truncated catalog behind.
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with temp_path.open("w", encoding="utf-8") as temp_file:
+            json.dump(catalog_data, temp_file, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+        logger.debug(f"Saved {len(self.dirs)} catalog directories to: {self.path}")
+
+
+def load_catalog(path: Path, *, config: Config, root_dir: Path) -> VersionCatalog:
+    catalog = VersionCatalog(path, config=config, root_dir=root_dir)
+    catalog.load()
+    catalog.refresh()
+    return catalog
@@ -1,14 +1,21 @@
 import logging
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from threading import RLock
+from threading import Event, RLock
+from time import perf_counter, time
 from typing import TYPE_CHECKING, NamedTuple
 
 import click
 
 if TYPE_CHECKING:  # pragma: no cover
-    from .config import Config
+    from .config import Config, ThreadsType
     from .context import Context
+    from .metrics import RunStats
+    from .output import PlanFormatType
     from .plan import Plan
+    from .prune import PruneItem
 
 
 def help_config(context: click.Context, param: click.Parameter, value: object) -> None:
@@ -21,10 +28,29 @@ def help_config(context: click.Context, param: click.Parameter, value: object) -
     context.exit()
 
 
+class ThreadsParamType(click.ParamType):
+    name = "threads"
+
+    def convert(
+        self, value: object, param: click.Parameter | None, ctx: click.Context | None
+    ) -> "ThreadsType":
+        if value == "auto":
+            return "auto"
+        try:
+            threads = int(value)  # type: ignore[call-overload]
+        except (TypeError, ValueError):
+            threads = 0
+        if threads < 1:
+            self.fail(f"{value!r} is not a positive integer or 'auto'.", param, ctx)
+        return threads
+
+
 class CliResult(NamedTuple):
     config: "Config"
     context: "Context"
     plan: "Plan"
+    prune_plan: "list[PruneItem]"
+    stats: "RunStats"
 
 
 @click.command()
@@ -62,14 +88,55 @@ class CliResult(NamedTuple):
 @click.option(
     "-t",
     "--threads",
-    type=click.IntRange(min=1),
-    help="Number of threads to use.",
+    type=ThreadsParamType(),
+    help="Number of threads to use, or 'auto'.",
 )
 @click.option(
     "--dry-run",
     is_flag=True,
     help="Print plan and exit.",
 )
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Execute plan items while planning (requires -y).",
+)
+@click.option(
+    "plan_out_path",
+    "--plan-out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write the generated plan to a file.",
+)
+@click.option(
+    "plan_in_path",
+    "--plan-in",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="Execute a plan file instead of generating a plan.",
+)
+@click.option(
+    "--plan-format",
+    type=click.Choice(["text", "jsonl"]),
+    default="text",
+    help="Format of the printed plan.",
+    show_default=True,
+)
+@click.option(
+    "--plan-summary",
+    is_flag=True,
+    help="Print counts and sizes per dest directory instead of every plan item.",
+)
+@click.option(
+    "profile_path",
+    "--profile",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write a JSON report of phase timings, item latencies and counters.",
+)
+@click.option(
+    "metrics_path",
+    "--metrics",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write run metrics to a file in Prometheus textfile format.",
+)
 @click.option(
     "--verbose",
     is_flag=True,
@@ -85,13 +152,32 @@ def main(
     config_file_path: Path,
     config_encoding: str,
     skip_confirm: bool,
-    threads: int | None,
+    threads: "ThreadsType | None",
     dry_run: bool,
+    stream: bool,
+    plan_out_path: Path | None,
+    plan_in_path: Path | None,
+    plan_format: "PlanFormatType",
+    plan_summary: bool,
+    profile_path: Path | None,
+    metrics_path: Path | None,
     verbose: bool,
     debug: bool,
 ) -> CliResult:
     """A simple script for file archiving."""
 
+    if stream and (dry_run or not skip_confirm):
+        raise click.UsageError(
+            "--stream requires --skip-confirm and can't be used with --dry-run."
+        )
+    if plan_in_path is not None and (stream or plan_out_path is not None):
+        raise click.UsageError("--plan-in can't be used with --stream or --plan-out.")
+    if plan_out_path is not None and stream:
+        raise click.UsageError("--plan-out can't be used with --stream.")
+    if plan_summary and plan_format != "text":
+        raise click.UsageError("--plan-summary can't be used with --plan-format jsonl.")
+
+    start_time = perf_counter()
     if debug:
         verbose = True
 
@@ -101,58 +187,296 @@ def main(
         logging_level = logging.INFO
     if debug:
         logging_level = logging.DEBUG
-    logging.basicConfig(
-        level=logging_level,
-        format="[%(asctime)s] %(levelname)s (%(name)s) %(message)s",
-        force=True,
-    )
+    from .log import start_log_writer
+
+    # Log records are written by a background thread, which is stopped
+    # (and thus flushed) when the command finishes.
+    log_listener = start_log_writer(logging_level)
+    click.get_current_context().call_on_close(log_listener.stop)
     logger = logging.getLogger(__name__)
 
     # -- Import APIs --
+    from .autotune import (
+        AUTOTUNE_INITIAL_THREADS,
+        load_tuned_threads,
+        save_tuned_threads,
+    )
+    from .catalog import VersionCatalog, load_catalog
     from .config import ExtraConfig, load_config
     from .context import Context
-    from .execute import execute_plan
-    from .plan import format_plan_item, generate_plan
-
-    # -- Load config --
-    config_file_path = config_file_path.resolve()
-    logger.debug(f"Config file path: {config_file_path!r}")
-    extra_config = ExtraConfig()
-    config = load_config(
-        config_file_path.read_text(encoding=config_encoding),
-        extras=extra_config,
-    )
-    if threads is not None:
-        config["threads"] = threads
-    logger.debug(f"Config: {config!r}")
-
-    # -- Create context --
-    context = Context(
-        log_lock=RLock(),
-        verbose=verbose,
-        debug=debug,
-        threads=config["threads"],
-        _execute_delay_seconds=extra_config.get("_execute_delay_seconds", None),
+    from .execute import (
+        ExecuteStats,
+        execute_plan,
+        execute_plan_stream,
+        execute_prune_plan,
     )
+    from .manifest import Manifest, load_manifest
+    from .metrics import RunStats, write_metrics_file
+    from .output import write_plan, write_plan_summary, write_prune_plan
+    from .plan import CompactPlan, PlanItem, PlanStats, generate_plan, iter_plan
+    from .planfile import get_plan_fingerprint, load_plan_file, write_plan_file
+    from .profile import Profiler, write_profile_report
+    from .prune import generate_prune_plan
+    from .schedule import resolve_device_threads
 
-    # -- Generate and execute plan --
-    plan = generate_plan(
-        config=config, root_dir=config_file_path.parent, context=context
-    )
-    if len(plan) == 0:
-        print("An empty plan was generated. Nothing to do.")
-    else:
-        print("Generated plan:")
-        for plan_item in plan:
-            print(format_plan_item(plan_item))
-
-        if not dry_run:
-            if not skip_confirm:
-                click.confirm("Continue?", abort=True)
-            execute_plan(plan, context=context)
+    # -- Setup stats and profiling --
+    run_stats = RunStats()
+    profiler: Profiler | None = None
+    if profile_path is not None:
+        profiler = Profiler()
+
+    @contextmanager
+    def run_phase(name: str) -> Iterator[None]:
+        # Phases are always timed for the stats, and profiled on demand.
+        with profiler.phase(name) if profiler is not None else nullcontext():
+            phase_start_time = perf_counter()
+            try:
+                yield
+            finally:
+                run_stats.add_phase_seconds(name, perf_counter() - phase_start_time)
+
+    run_succeeded = False
+    try:
+        # -- Load config --
+        config_file_path = config_file_path.resolve()
+        logger.debug(f"Config file path: {config_file_path!r}")
+        extra_config = ExtraConfig()
+        with run_phase("load_config"):
+            config = load_config(
+                config_file_path.read_text(encoding=config_encoding),
+                extras=extra_config,
+            )
+        if threads is not None:
+            config["threads"] = threads
+        logger.debug(f"Config: {config!r}")
+
+        # -- Create context --
+        root_dir = config_file_path.parent
+        tuned_threads_path: Path | None = None
+        if config["tuned_threads_file"]:
+            tuned_threads_path = root_dir / config["tuned_threads_file"]
+        initial_threads = config["threads"]
+        if initial_threads == "auto":
+            initial_threads = AUTOTUNE_INITIAL_THREADS
+            if tuned_threads_path is not None:
+                initial_threads = (
+                    load_tuned_threads(tuned_threads_path) or AUTOTUNE_INITIAL_THREADS
+                )
+        context = Context(
+            log_lock=RLock(),
+            verbose=verbose,
+            debug=debug,
+            threads=initial_threads,
+            autotune=(config["threads"] == "auto"),
+            copy_mode=config["copy_mode"],
+            copy_block_size=config["copy_block_size"],
+            chunk_threshold=config["chunk_threshold"],
+            chunk_size=config["chunk_size"],
+            max_in_flight=config["max_in_flight"],
+            max_in_flight_bytes=config["max_in_flight_bytes"],
+            execute_order=config["execute_order"],
+            batch_threshold=config["batch_threshold"],
+            batch_size=config["batch_size"],
+            device_threads=config["device_threads"],
+            device_threads_by_device=resolve_device_threads(
+                config["device_threads_by_path"], root_dir=root_dir
+            ),
+            profiler=profiler,
+            _execute_delay_seconds=extra_config.get("_execute_delay_seconds", None),
+        )
+
+        if stream and context.execute_order != "plan":
+            # Other orders sort the plan, which would hold all of it in memory.
+            logger.warning(
+                f"Ignoring execute_order {context.execute_order!r} with --stream."
+            )
+            context.execute_order = "plan"
+
+        # -- Load manifest --
+        manifest: Manifest | None = None
+        if config["manifest"]:
+            with run_phase("load_manifest"):
+                manifest = load_manifest(
+                    root_dir / config["manifest"], config=config, root_dir=root_dir
+                )
+
+        # -- Load catalog --
+        catalog: VersionCatalog | None = None
+        if config["catalog"]:
+            with run_phase("load_catalog"):
+                catalog = load_catalog(
+                    root_dir / config["catalog"], config=config, root_dir=root_dir
+                )
+
+        # -- Generate and execute plan --
+        execute_stats: ExecuteStats | None = None
+        plan: Plan
+        prune_plan: list[PruneItem]
+        if stream:
+            plan = streamed_plan = CompactPlan()
+            stream_closed = Event()
+
+            def iter_recorded_plan() -> Iterator[PlanItem]:
+                for plan_item in iter_plan(
+                    config=config,
+                    root_dir=root_dir,
+                    context=context,
+                    manifest=manifest,
+                    catalog=catalog,
+                    stats=run_stats.plan_stats,
+                    closed=stream_closed,
+                ):
+                    streamed_plan.append(plan_item)
+                    yield plan_item
+
+            # Planning and execution overlap, so they are timed together.
+            with run_phase("stream"):
+                execute_stats = execute_plan_stream(
+                    iter_recorded_plan(),
+                    context=context,
+                    catalog=catalog,
+                    closed=stream_closed,
+                )
+            # Old versions are pruned once the whole plan is known.
+            with run_phase("prune_plan"):
+                prune_plan = generate_prune_plan(
+                    config=config,
+                    root_dir=root_dir,
+                    plan=plan,
+                    catalog=catalog,
+                    first_id=(len(plan) + 1),
+                )
+            if len(prune_plan) > 0:
+                with run_phase("prune"):
+                    run_stats.deleted_versions = execute_prune_plan(
+                        prune_plan, context=context, catalog=catalog
+                    )
+            if len(plan) == 0 and len(prune_plan) == 0:
+                print("An empty plan was generated. Nothing to do.")
+            else:
+                print(f"Executed a streamed plan of {len(plan)} item(s).")
+                if len(prune_plan) > 0:
+                    print(f"Deleted {len(prune_plan)} old version(s).")
+        else:
+            plan_fingerprint = get_plan_fingerprint(config, root_dir)
+            if plan_in_path is not None:
+                with run_phase("load_plan"):
+                    plan = load_plan_file(
+                        plan_in_path, fingerprint=plan_fingerprint, manifest=manifest
+                    )
+                run_stats.plan_stats = PlanStats(
+                    planned_items=len(plan),
+                    overwrite_items=sum(plan_item.overwrite_flag for plan_item in plan),
+                )
+                plan_source = "loaded"
+            else:
+                with run_phase("plan"):
+                    plan = generate_plan(
+                        config=config,
+                        root_dir=root_dir,
+                        context=context,
+                        manifest=manifest,
+                        catalog=catalog,
+                        stats=run_stats.plan_stats,
+                        compact=True,
+                    )
+                plan_source = "generated"
+                if plan_out_path is not None:
+                    with run_phase("write_plan_file"):
+                        write_plan_file(
+                            plan_out_path, plan, fingerprint=plan_fingerprint
+                        )
+
+            # Deletes of old versions follow the copies in the plan, and are
+            # only executed after all copies have succeeded.
+            with run_phase("prune_plan"):
+                prune_plan = generate_prune_plan(
+                    config=config,
+                    root_dir=root_dir,
+                    plan=plan,
+                    catalog=catalog,
+                    first_id=(len(plan) + 1),
+                )
+
+            # Messages go to stderr when the plan is printed as JSON lines,
+            # so that stdout can be consumed by other tools.
+            message_file = sys.stderr if plan_format == "jsonl" else sys.stdout
+            if len(plan) == 0 and len(prune_plan) == 0:
+                print(
+                    f"An empty plan was {plan_source}. Nothing to do.",
+                    file=message_file,
+                )
+            else:
+                print(f"{plan_source.capitalize()} plan:", file=message_file)
+                with run_phase("print_plan"):
+                    if plan_summary:
+                        write_plan_summary(plan, sys.stdout)
+                        if len(prune_plan) > 0:
+                            print(f"{len(prune_plan)} old version(s) to delete.")
+                    else:
+                        write_plan(plan, sys.stdout, plan_format=plan_format)
+                        write_prune_plan(
+                            prune_plan, sys.stdout, plan_format=plan_format
+                        )
+
+                if not dry_run:
+                    if not skip_confirm:
+                        click.confirm(
+                            "Continue?", abort=True, err=(plan_format == "jsonl")
+                        )
+                    if len(plan) > 0:
+                        with run_phase("execute"):
+                            execute_stats = execute_plan(
+                                plan, context=context, catalog=catalog
+                            )
+                    if len(prune_plan) > 0:
+                        with run_phase("prune"):
+                            run_stats.deleted_versions = execute_prune_plan(
+                                prune_plan, context=context, catalog=catalog
+                            )
+
+        with run_phase("save"):
+            if (
+                execute_stats is not None
+                and execute_stats.tuned_threads is not None
+                and tuned_threads_path is not None
+            ):
+                save_tuned_threads(tuned_threads_path, execute_stats.tuned_threads)
+
+            # -- Save manifest --
+            if manifest is not None and not dry_run:
+                manifest.save()
+
+            # -- Save catalog --
+            if catalog is not None and not dry_run:
+                catalog.save()
+
+        if execute_stats is not None:
+            run_stats.execute_stats = execute_stats
+        run_succeeded = True
+    finally:
+        run_stats.succeeded = run_succeeded
+        run_stats.duration_seconds = perf_counter() - start_time
+        run_stats.finish_time = time()
+
+        # -- Write metrics --
+        # Failed runs write metrics too, so that failures can be alerted on.
+        if metrics_path is not None and not dry_run:
+            write_metrics_file(
+                metrics_path, run_stats, labels={"config": str(config_file_path)}
+            )
+            logger.info(f"Metrics written to: {metrics_path}")
+
+    # -- Write profile report --
+    if profiler is not None:
+        assert profile_path is not None
+        write_profile_report(profile_path, profiler.get_report(threads=context.threads))
+        logger.info(f"Profile report written to: {profile_path}")
 
     return CliResult(
         config=config,
         context=context,
         plan=plan,
+        prune_plan=prune_plan,
+        stats=run_stats,
     )
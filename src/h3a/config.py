@@ -1,16 +1,44 @@
 from inspect import get_annotations
-from typing import Annotated, Final, Literal, NamedTuple, TypeAliasType, TypedDict, cast
+from typing import (
+    Annotated,
+    Any,
+    Final,
+    Literal,
+    NamedTuple,
+    TypeAliasType,
+    TypedDict,
+    cast,
+)
 
 import strictyaml as yaml
 
 type TagTimeSourceType = Literal["now", "mtime", "ctime"]
 type OnConflictType = Literal["error", "skip", "overwrite"]
+type ThreadsType = int | Literal["auto"]
+type CopyModeType = Literal["copy", "reflink", "reflink-or-copy", "hardlink"]
+type ExecuteOrderType = Literal["plan", "largest-first", "locality", "packed"]
 
 DEFAULT_TAG_FORMAT: Final = "_v%Y%m%d-%H%M%S"
 DEFAULT_TAG_PATTERN: Final = r"_v\d{8}-\d{6}"
 DEFAULT_TAG_TIME_SOURCE: Final[TagTimeSourceType] = "mtime"
 DEFAULT_ON_CONFLICT: Final[OnConflictType] = "error"
-DEFAULT_THREADS: Final = 8
+DEFAULT_THREADS: Final[ThreadsType] = 8
+DEFAULT_SKIP_IDENTICAL: Final = False
+DEFAULT_COPY_MODE: Final[CopyModeType] = "copy"
+DEFAULT_COPY_BLOCK_SIZE: Final = 8 * 1024 * 1024
+DEFAULT_CHUNK_THRESHOLD: Final = 256 * 1024 * 1024
+DEFAULT_CHUNK_SIZE: Final = 64 * 1024 * 1024
+DEFAULT_MAX_IN_FLIGHT: Final = 0
+DEFAULT_MAX_IN_FLIGHT_BYTES: Final = 0
+DEFAULT_EXECUTE_ORDER: Final[ExecuteOrderType] = "plan"
+DEFAULT_BATCH_THRESHOLD: Final = 64 * 1024
+DEFAULT_BATCH_SIZE: Final = 16
+DEFAULT_DEVICE_THREADS: Final = 0
+DEFAULT_KEEP_LAST: Final = 0
+
+# Durations are a number followed by a unit, like `30d`, or empty.
+DURATION_UNITS: Final = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+DURATION_PATTERN: Final = r"(\d+[smhdw])?"
 
 
 class ConfigItemMetaData(NamedTuple):
@@ -69,10 +97,129 @@ class Config(TypedDict):
         ),
     ]
     threads: Annotated[
+        ThreadsType,
+        ConfigItemMetaData(
+            required=False,
+            help=f"The number of maximum threads to use, or 'auto' to tune it while executing. (default: {DEFAULT_THREADS!r})",
+        ),
+    ]
+    tuned_threads_file: Annotated[
+        str,
+        ConfigItemMetaData(
+            required=False,
+            help="The path of an optional file to keep the tuned threads in for later runs.",
+        ),
+    ]
+    manifest: Annotated[
+        str,
+        ConfigItemMetaData(
+            required=False,
+            help="The path of an optional scan manifest for incremental runs.",
+        ),
+    ]
+    catalog: Annotated[
+        str,
+        ConfigItemMetaData(
+            required=False,
+            help="The path of an optional catalog of the versions in the output directory.",
+        ),
+    ]
+    keep_last: Annotated[
+        int,
+        ConfigItemMetaData(
+            required=False,
+            help=f"The number of latest versions to keep per source file; older ones are deleted. (0 for unlimited; default: {DEFAULT_KEEP_LAST:d})",
+        ),
+    ]
+    keep_within: Annotated[
+        str,
+        ConfigItemMetaData(
+            required=False,
+            help="A duration like '30d' within which versions are kept by their mtime; older ones are deleted. (units: s, m, h, d, w; default: '' for unlimited)",
+        ),
+    ]
+    skip_identical: Annotated[
+        bool,
+        ConfigItemMetaData(
+            required=False,
+            help=f"Whether to skip files identical to their latest versions. (requires manifest, which keeps their digests) (default: {DEFAULT_SKIP_IDENTICAL!r})",
+        ),
+    ]
+    copy_mode: Annotated[
+        CopyModeType,
+        ConfigItemMetaData(
+            required=False,
+            help=f"The way to create dest files. (default: {DEFAULT_COPY_MODE!r})",
+        ),
+    ]
+    copy_block_size: Annotated[
+        int,
+        ConfigItemMetaData(
+            required=False,
+            help=f"The number of bytes to copy per system call. (default: {DEFAULT_COPY_BLOCK_SIZE:d})",
+        ),
+    ]
+    chunk_threshold: Annotated[
+        int,
+        ConfigItemMetaData(
+            required=False,
+            help=f"The size above which files are copied in parallel chunks. (0 to disable; default: {DEFAULT_CHUNK_THRESHOLD:d})",
+        ),
+    ]
+    chunk_size: Annotated[
+        int,
+        ConfigItemMetaData(
+            required=False,
+            help=f"The number of bytes per chunk of a chunked copy. (default: {DEFAULT_CHUNK_SIZE:d})",
+        ),
+    ]
+    max_in_flight: Annotated[
+        int,
+        ConfigItemMetaData(
+            required=False,
+            help=f"The maximum number of plan items executed at once. (0 for 4 times the threads; default: {DEFAULT_MAX_IN_FLIGHT:d})",
+        ),
+    ]
+    max_in_flight_bytes: Annotated[
+        int,
+        ConfigItemMetaData(
+            required=False,
+            help=f"The maximum total size of plan items executed at once. (0 for unlimited; default: {DEFAULT_MAX_IN_FLIGHT_BYTES:d})",
+        ),
+    ]
+    execute_order: Annotated[
+        ExecuteOrderType,
+        ConfigItemMetaData(
+            required=False,
+            help=f"The order to execute plan items in. (default: {DEFAULT_EXECUTE_ORDER!r})",
+        ),
+    ]
+    batch_threshold: Annotated[
+        int,
+        ConfigItemMetaData(
+            required=False,
+            help=f"The size up to which files are executed in batches. (0 to disable; default: {DEFAULT_BATCH_THRESHOLD:d})",
+        ),
+    ]
+    batch_size: Annotated[
+        int,
+        ConfigItemMetaData(
+            required=False,
+            help=f"The maximum number of files per batch. (default: {DEFAULT_BATCH_SIZE:d})",
+        ),
+    ]
+    device_threads: Annotated[
         int,
         ConfigItemMetaData(
             required=False,
-            help=f"The number of maximum threads to use. (default: {DEFAULT_THREADS:d})",
+            help=f"The maximum number of tasks running at once per device. (0 for unlimited; default: {DEFAULT_DEVICE_THREADS:d})",
+        ),
+    ]
+    device_threads_by_path: Annotated[
+        dict[str, int],
+        ConfigItemMetaData(
+            required=False,
+            help="A mapping from paths to the device_threads of their devices. (default: {})",
         ),
     ]
 
@@ -81,6 +228,24 @@ class ExtraConfig(TypedDict, total=False):
     _execute_delay_seconds: float
 
 
+class MinInt(yaml.Int):
+    # Integers of at least a minimum, so that sizes and limits that could
+    # never make progress (like a block size of 0) are rejected with the
+    # config.
+    min_value: int
+
+    def __init__(self, min_value: int) -> None:
+        self.min_value = min_value
+
+    def validate_scalar(self, chunk: Any) -> int:
+        value: int = super().validate_scalar(chunk)
+        if value < self.min_value:
+            chunk.expecting_but_found(
+                f"when expecting an integer of at least {self.min_value}"
+            )
+        return value
+
+
 config_schema = yaml.Map(
     {
         "include": yaml.Seq(yaml.Str()),
@@ -97,7 +262,36 @@ config_schema = yaml.Map(
         yaml.Optional("on_conflict", default=DEFAULT_ON_CONFLICT): yaml.Enum(
             OnConflictType.__value__.__args__
         ),
-        yaml.Optional("threads", default=DEFAULT_THREADS): yaml.Int(),
+        yaml.Optional("threads", default=DEFAULT_THREADS): yaml.OrValidator(
+            yaml.Int(),
+            yaml.Enum(["auto"]),
+        ),
+        yaml.Optional("tuned_threads_file", default=""): yaml.Str(),
+        yaml.Optional("manifest", default=""): yaml.Str(),
+        yaml.Optional("catalog", default=""): yaml.Str(),
+        yaml.Optional("keep_last", default=DEFAULT_KEEP_LAST): MinInt(0),
+        yaml.Optional("keep_within", default=""): yaml.Regex(DURATION_PATTERN),
+        yaml.Optional("skip_identical", default=DEFAULT_SKIP_IDENTICAL): yaml.Bool(),
+        yaml.Optional("copy_mode", default=DEFAULT_COPY_MODE): yaml.Enum(
+            CopyModeType.__value__.__args__
+        ),
+        yaml.Optional("copy_block_size", default=DEFAULT_COPY_BLOCK_SIZE): MinInt(1),
+        yaml.Optional("chunk_threshold", default=DEFAULT_CHUNK_THRESHOLD): MinInt(0),
+        yaml.Optional("chunk_size", default=DEFAULT_CHUNK_SIZE): MinInt(1),
+        yaml.Optional("max_in_flight", default=DEFAULT_MAX_IN_FLIGHT): MinInt(0),
+        yaml.Optional(
+            "max_in_flight_bytes", default=DEFAULT_MAX_IN_FLIGHT_BYTES
+        ): MinInt(0),
+        yaml.Optional("execute_order", default=DEFAULT_EXECUTE_ORDER): yaml.Enum(
+            ExecuteOrderType.__value__.__args__
+        ),
+        yaml.Optional("batch_threshold", default=DEFAULT_BATCH_THRESHOLD): MinInt(0),
+        yaml.Optional("batch_size", default=DEFAULT_BATCH_SIZE): MinInt(1),
+        yaml.Optional("device_threads", default=DEFAULT_DEVICE_THREADS): MinInt(0),
+        yaml.Optional("device_threads_by_path", default={}): yaml.OrValidator(
+            yaml.MapPattern(yaml.Str(), MinInt(0)),
+            yaml.EmptyDict(),
+        ),
         yaml.Optional("_execute_delay_seconds", default=0.0): yaml.Float(),
     }
 )
@@ -113,9 +307,20 @@ def load_config(yaml_string: str, *, extras: ExtraConfig | None = None) -> Confi
     else:
         for key in EXTRA_CONFIG_KEYS:
             config.pop(key)
+    if config["skip_identical"] and not config["manifest"]:
+        # Without a manifest to keep the digests, every source and its
+        # latest version would be hashed again on every run.
+        raise RuntimeError("skip_identical requires a manifest.")
     return config
 
 
+def parse_duration(duration: str) -> float | None:
+    # Returns the duration in seconds, or `None` for an empty duration.
+    if not duration:
+        return None
+    return int(duration[:-1]) * DURATION_UNITS[duration[-1]]
+
+
 def format_config_help() -> str:
     help_text: str = ""
 
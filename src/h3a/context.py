@@ -1,6 +1,22 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from threading import RLock
 
+from .config import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_BATCH_THRESHOLD,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CHUNK_THRESHOLD,
+    DEFAULT_COPY_BLOCK_SIZE,
+    DEFAULT_COPY_MODE,
+    DEFAULT_DEVICE_THREADS,
+    DEFAULT_EXECUTE_ORDER,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_IN_FLIGHT_BYTES,
+    CopyModeType,
+    ExecuteOrderType,
+)
+from .profile import Profiler
+
 
 @dataclass
 class Context:
@@ -8,4 +24,17 @@ class Context:
     verbose: bool
     debug: bool
     threads: int
+    autotune: bool = False
+    copy_mode: CopyModeType = DEFAULT_COPY_MODE
+    copy_block_size: int = DEFAULT_COPY_BLOCK_SIZE
+    chunk_threshold: int = DEFAULT_CHUNK_THRESHOLD
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT
+    max_in_flight_bytes: int = DEFAULT_MAX_IN_FLIGHT_BYTES
+    execute_order: ExecuteOrderType = DEFAULT_EXECUTE_ORDER
+    batch_threshold: int = DEFAULT_BATCH_THRESHOLD
+    batch_size: int = DEFAULT_BATCH_SIZE
+    device_threads: int = DEFAULT_DEVICE_THREADS
+    device_threads_by_device: dict[int, int] = field(default_factory=dict)
+    profiler: Profiler | None = None
     _execute_delay_seconds: float | None = None
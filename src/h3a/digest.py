@@ -0,0 +1,60 @@
+import os
+from hashlib import file_digest
+from pathlib import Path
+from typing import Final, NamedTuple
+
+DIGEST_ALGORITHM: Final = "sha256"
+
+
+def compute_file_digest(path: Path) -> str:
+    with path.open("rb") as file:
+        return file_digest(file, DIGEST_ALGORITHM).hexdigest()
+
+
+class DigestCacheEntry(NamedTuple):
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+class DigestCache:
+    entries: dict[str, DigestCacheEntry]
+    used_entries: dict[str, DigestCacheEntry]
+
+    def __init__(self, entries: dict[str, DigestCacheEntry] | None = None) -> None:
+        self.entries = entries if entries is not None else {}
+        self.used_entries = {}
+
+    def get_digest(self, path: Path, path_stat: os.stat_result) -> str:
+        key = str(path)
+        entry = self.entries.get(key)
+        if (
+            entry is None
+            or entry.size != path_stat.st_size
+            or entry.mtime_ns != path_stat.st_mtime_ns
+        ):
+            entry = DigestCacheEntry(
+                size=path_stat.st_size,
+                mtime_ns=path_stat.st_mtime_ns,
+                digest=compute_file_digest(path),
+            )
+            self.entries[key] = entry
+        self.used_entries[key] = entry
+        return entry.digest
+
+    def set_digest(self, path: Path, entry: DigestCacheEntry) -> None:
+        key = str(path)
+        self.entries[key] = self.used_entries[key] = entry
+
+    def is_identical(
+        self,
+        path: Path,
+        path_stat: os.stat_result,
+        other_path: Path,
+        other_path_stat: os.stat_result,
+    ) -> bool:
+        # Files of different sizes are never read.
+        return path_stat.st_size == other_path_stat.st_size and (
+            self.get_digest(path, path_stat)
+            == self.get_digest(other_path, other_path_stat)
+        )
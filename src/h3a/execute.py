@@ -1,78 +1,711 @@
-from concurrent.futures import ThreadPoolExecutor
+import sys
+from array import array
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from functools import partial
-from logging import getLogger
-from shutil import copy2
-from threading import RLock
-from time import sleep
+from logging import DEBUG, INFO, getLogger
+from pathlib import Path
+from queue import Empty, Full, Queue, SimpleQueue
+from threading import Event, Thread
+from time import monotonic, perf_counter, sleep
+from typing import Final, NamedTuple, Self
 
 from click import progressbar
 
+from .autotune import AUTOTUNE_MAX_THREADS, ThreadTuner
+from .catalog import VersionCatalog
 from .context import Context
 from .plan import Plan, PlanItem
+from .profile import Profiler
+from .progress import (
+    PROGRESS_LOG_SECONDS,
+    PROGRESS_REFRESH_SECONDS,
+    PerThread,
+    ProgressMeter,
+    ProgressSnapshot,
+    format_progress,
+)
+from .prune import PruneItem
+from .schedule import (
+    ExecuteUnit,
+    PlanSizes,
+    iter_execute_units,
+    iter_sized_plan_items,
+    needs_inodes,
+)
+from .transfer import (
+    ChunkedCopy,
+    TransferResult,
+    TransferStrategyType,
+    start_transfer,
+)
 
 logger = getLogger(__name__)
 
+STREAM_BUFFER_SIZE: Final = 1024
+STREAM_POLL_SECONDS: Final = 0.1
+PRUNE_BATCH_SIZE: Final = 256
+
+
+@dataclass
+class ExecuteStats:
+    strategy_counts: Counter[TransferStrategyType] = field(default_factory=Counter)
+    bytes_copied: int = 0
+    tuned_threads: int | None = None
+    finished_items: int = 0
+    overwritten_items: int = 0
+    # Source bytes of the finished items and chunks, including those
+    # that were linked instead of copied.
+    finished_bytes: int = 0
+    # The time workers spent running tasks, against the wall time of
+    # the execution and the size of the pool.
+    busy_seconds: float = 0.0
+    duration_seconds: float = 0.0
+    max_threads: int = 0
+
+    def get_utilization(self) -> float | None:
+        if self.duration_seconds <= 0 or self.max_threads <= 0:
+            return None
+        return self.busy_seconds / (self.duration_seconds * self.max_threads)
+
 
 class ExecuteProgress:
-    lock: RLock
-    finished: int
-    total: int
+    total: int | None
+    total_bytes: int | None
+    thread_stats: PerThread[ExecuteStats]
+    catalog: VersionCatalog | None
 
-    def __init__(self, total: int) -> None:
-        self.lock = RLock()
-        self.finished = 0
+    def __init__(
+        self,
+        total: int | None,
+        *,
+        total_bytes: int | None = None,
+        catalog: VersionCatalog | None = None,
+    ) -> None:
         self.total = total
+        self.total_bytes = total_bytes
+        self.thread_stats = PerThread(ExecuteStats)
+        self.catalog = catalog
 
-    def step(self) -> float:
-        with self.lock:
-            assert self.finished < self.total
-            self.finished += 1
-            return self.finished / self.total
+    def step(self, plan_item: PlanItem, transfer_result: TransferResult) -> None:
+        # The catalog learns about each version as soon as it is written.
+        if self.catalog is not None:
+            self.catalog.add(plan_item.dest)
+        stats = self.thread_stats.get()
+        stats.finished_items += 1
+        if plan_item.overwrite_flag:
+            stats.overwritten_items += 1
+        stats.strategy_counts[transfer_result.strategy] += 1
+        stats.bytes_copied += transfer_result.bytes_copied
 
+    def add_bytes(self, size: int) -> None:
+        self.thread_stats.get().finished_bytes += size
 
-def execute_plan_item(
-    plan_item: PlanItem, *, context: Context, progress: ExecuteProgress
-) -> None:
-    with context.log_lock:
-        logger.debug(f"Executing plan item: {plan_item!r}")
+    def add_busy_seconds(self, seconds: float) -> None:
+        self.thread_stats.get().busy_seconds += seconds
+
+    def get_totals(self) -> tuple[int, int]:
+        # Only the counters are read, which is safe while workers run.
+        finished_items = 0
+        finished_bytes = 0
+        for stats in self.thread_stats.get_all():
+            finished_items += stats.finished_items
+            finished_bytes += stats.finished_bytes
+        return finished_items, finished_bytes
 
-    plan_item.dest.parent.mkdir(parents=True, exist_ok=True)
-    copy2(plan_item.src, plan_item.dest)
+    def get_stats(self) -> ExecuteStats:
+        total_stats = ExecuteStats()
+        for stats in self.thread_stats.get_all():
+            total_stats.strategy_counts.update(stats.strategy_counts)
+            total_stats.bytes_copied += stats.bytes_copied
+            total_stats.finished_items += stats.finished_items
+            total_stats.overwritten_items += stats.overwritten_items
+            total_stats.finished_bytes += stats.finished_bytes
+            total_stats.busy_seconds += stats.busy_seconds
+        return total_stats
 
+
+def finish_plan_item(
+    plan_item: PlanItem,
+    transfer_result: TransferResult,
+    *,
+    context: Context,
+    progress: ExecuteProgress,
+) -> None:
     if context._execute_delay_seconds is not None:
         assert isinstance(context._execute_delay_seconds, float)
         sleep(context._execute_delay_seconds)
 
-    precentage = progress.step()
+    progress.step(plan_item, transfer_result)
 
-    with context.log_lock:
+    # Per-item logs are skipped entirely unless enabled, and are formatted
+    # by the log writer thread otherwise.
+    if logger.isEnabledFor(INFO):
         if plan_item.overwrite_flag:
-            logger.info(f"Overwrote: {plan_item.dest} ({precentage:.2%})")
+            logger.info("Overwrote: %s", plan_item.dest)
         else:
-            logger.info(f"Created: {plan_item.dest} ({precentage:.2%})")
+            logger.info("Created: %s", plan_item.dest)
 
 
-def execute_plan(plan: Plan, *, context: Context) -> None:
-    progress = ExecuteProgress(len(plan))
+def execute_chunk(
+    plan_item: PlanItem,
+    chunked_copy: ChunkedCopy,
+    offset: int,
+    length: int,
+    *,
+    context: Context,
+    progress: ExecuteProgress,
+) -> int:
+    start_time = perf_counter()
+    transfer_result = chunked_copy.copy_chunk(offset, length)
+    progress.add_bytes(length)
+    if context.profiler is not None:
+        context.profiler.add_latency("execute.chunk", perf_counter() - start_time)
+    if transfer_result is not None:
+        finish_plan_item(plan_item, transfer_result, context=context, progress=progress)
+    progress.add_busy_seconds(perf_counter() - start_time)
+    return 0 if transfer_result is None else 1
 
-    with ThreadPoolExecutor(max_workers=context.threads) as executor:
-        execute_results_iterable = executor.map(
-            partial(execute_plan_item, context=context, progress=progress),
+
+def execute_plan_item(
+    plan_item: PlanItem,
+    *,
+    context: Context,
+    progress: ExecuteProgress,
+    allow_chunks: bool = True,
+) -> int | ChunkedCopy:
+    if logger.isEnabledFor(DEBUG):
+        logger.debug("Executing plan item: %r", plan_item)
+
+    start_time = perf_counter()
+    transfer = start_transfer(
+        plan_item.src,
+        plan_item.dest,
+        copy_mode=context.copy_mode,
+        block_size=context.copy_block_size,
+        chunk_threshold=(context.chunk_threshold if allow_chunks else 0),
+        chunk_size=context.chunk_size,
+    )
+
+    if isinstance(transfer, ChunkedCopy):
+        if logger.isEnabledFor(DEBUG):
+            logger.debug(
+                "Copying in %d chunks: %s", len(transfer.chunks), plan_item.src
+            )
+        return transfer
+
+    finish_plan_item(plan_item, transfer, context=context, progress=progress)
+    # Chunked copies are timed by chunk instead.
+    if context.profiler is not None:
+        context.profiler.add_latency("execute.item", perf_counter() - start_time)
+    return 1
+
+
+def execute_unit(
+    unit: ExecuteUnit, *, context: Context, progress: ExecuteProgress
+) -> int | ChunkedCopy:
+    # The bytes of chunked copies are counted as their chunks finish.
+    start_time = perf_counter()
+    result: int | ChunkedCopy
+    if len(unit.plan_items) == 1:
+        result = execute_plan_item(
+            unit.plan_items[0], context=context, progress=progress
+        )
+        if not isinstance(result, ChunkedCopy):
+            progress.add_bytes(unit.size)
+    else:
+        for plan_item in unit.plan_items:
+            execute_plan_item(
+                plan_item, context=context, progress=progress, allow_chunks=False
+            )
+        progress.add_bytes(unit.size)
+        result = len(unit.plan_items)
+    progress.add_busy_seconds(perf_counter() - start_time)
+    return result
+
+
+class ExecuteTask(NamedTuple):
+    # The unit of a chunk task has the item of the chunked copy and the
+    # size of the chunk.
+    unit: ExecuteUnit
+    run: Callable[[], int | ChunkedCopy]
+
+
+def uses_devices(context: Context) -> bool:
+    return context.device_threads > 0 or len(context.device_threads_by_device) > 0
+
+
+def iter_finished_plan_items(
+    plan: Iterable[PlanItem],
+    *,
+    context: Context,
+    progress: ExecuteProgress,
+    executor: ThreadPoolExecutor,
+    tuner: ThreadTuner | None = None,
+    plan_sizes: PlanSizes | None = None,
+) -> Iterator[None]:
+    # Only a bounded number of plan items (and bytes) are in flight at once,
+    # so that memory doesn't grow with the plan size. Finished futures are
+    # reported through a queue, so that the chunks of large files can be
+    # submitted as soon as they are known. Each future reports how many
+    # plan items it has finished. With a tuner, the pool is sized for the
+    # maximum threads, but no more tasks than the currently tuned threads
+    # are submitted at once, and the default window follows them. Something
+    # is yielded for each finished task, and at least once per refresh
+    # interval, so that the caller can refresh the progress at a fixed rate.
+    max_in_flight_bytes = context.max_in_flight_bytes
+    device_threads = context.device_threads
+    device_threads_by_device = context.device_threads_by_device
+    done_queue = SimpleQueue[tuple[ExecuteTask, Future[int | ChunkedCopy]]]()
+    pending_tasks = 0
+    in_flight = 0
+    in_flight_bytes = 0
+    device_tasks = Counter[int]()
+    deferred_tasks: list[ExecuteTask] = []
+    chunked_copies: dict[int, ChunkedCopy] = {}
+
+    def get_max_in_flight() -> int:
+        threads = context.threads if tuner is None else tuner.threads
+        return context.max_in_flight or threads * 4
+
+    def fits_threads() -> bool:
+        return tuner is None or pending_tasks < tuner.threads
+
+    def fits_window(unit: ExecuteUnit) -> bool:
+        # A single unit larger than the byte limit is still let through.
+        return in_flight < get_max_in_flight() and (
+            max_in_flight_bytes <= 0
+            or in_flight == 0
+            or in_flight_bytes + unit.size <= max_in_flight_bytes
+        )
+
+    def fits_devices(unit: ExecuteUnit) -> bool:
+        for device in unit.devices:
+            limit = device_threads_by_device.get(device, device_threads)
+            if limit > 0 and device_tasks[device] >= limit:
+                return False
+        return True
+
+    def try_submit(task: ExecuteTask) -> bool:
+        nonlocal pending_tasks, in_flight, in_flight_bytes
+        if not (fits_threads() and fits_window(task.unit) and fits_devices(task.unit)):
+            return False
+        in_flight += len(task.unit.plan_items)
+        in_flight_bytes += task.unit.size
+        for device in task.unit.devices:
+            device_tasks[device] += 1
+        executor.submit(task.run).add_done_callback(
+            lambda future: done_queue.put((task, future))
+        )
+        pending_tasks += 1
+        return True
+
+    unit_tasks = (
+        ExecuteTask(
+            unit=unit,
+            run=partial(execute_unit, unit, context=context, progress=progress),
+        )
+        for unit in iter_execute_units(
+            plan,
+            order=context.execute_order,
+            batch_threshold=context.batch_threshold,
+            batch_size=context.batch_size,
+            # Sources are always sized, so that progress is tracked in bytes.
+            stat_sources=True,
+            with_devices=uses_devices(context),
+            plan_sizes=plan_sizes,
+        )
+    )
+    next_task = next(unit_tasks, None)
+
+    try:
+        while True:
+            # Tasks waiting for their devices go first. Then new units are
+            # taken while there is room, and those whose devices are busy
+            # wait, so that the other devices are kept busy meanwhile.
+            deferred_tasks = [task for task in deferred_tasks if not try_submit(task)]
+            while (
+                next_task is not None
+                and len(deferred_tasks) < get_max_in_flight()
+                and fits_threads()
+                and fits_window(next_task.unit)
+            ):
+                if not try_submit(next_task):
+                    deferred_tasks.append(next_task)
+                next_task = next(unit_tasks, None)
+
+            if pending_tasks == 0:
+                assert len(deferred_tasks) == 0
+                break
+
+            try:
+                task, future = done_queue.get(timeout=PROGRESS_REFRESH_SECONDS)
+            except Empty:
+                yield
+                continue
+            # Each task holds its share of the window until it is done, and
+            # a chunked copy hands its share over to its chunks.
+            pending_tasks -= 1
+            in_flight -= len(task.unit.plan_items)
+            in_flight_bytes -= task.unit.size
+            for device in task.unit.devices:
+                device_tasks[device] -= 1
+            task_result = future.result()
+            if tuner is not None:
+                finished_items, finished_bytes = progress.get_totals()
+                tuner.update(monotonic(), finished_bytes, finished_items)
+            if isinstance(task_result, ChunkedCopy):
+                plan_item = task.unit.plan_items[0]
+                chunked_copies[plan_item.id] = task_result
+                for offset, length in task_result.chunks:
+                    deferred_tasks.append(
+                        ExecuteTask(
+                            unit=task.unit._replace(size=length),
+                            run=partial(
+                                execute_chunk,
+                                plan_item,
+                                task_result,
+                                offset,
+                                length,
+                                context=context,
+                                progress=progress,
+                            ),
+                        )
+                    )
+            elif task_result > 0:
+                chunked_copies.pop(task.unit.plan_items[0].id, None)
+            yield
+
+    except BaseException:
+        # Pending work is dropped right away on errors and interrupts;
+        # only the running tasks are waited for.
+        executor.shutdown(wait=True, cancel_futures=True)
+        while not done_queue.empty():
+            task, future = done_queue.get()
+            if not future.cancelled() and future.exception() is None:
+                task_result = future.result()
+                if isinstance(task_result, ChunkedCopy):
+                    chunked_copies[task.unit.plan_items[0].id] = task_result
+        for chunked_copy in chunked_copies.values():
+            chunked_copy.discard()
+        raise
+
+
+def get_dest_dirs(plan: Plan) -> list[Path]:
+    # Parents go before their children, so that each directory is created
+    # by a single mkdir call.
+    return sorted(
+        {plan_item.dest.parent for plan_item in plan},
+        key=lambda dest_dir: (len(dest_dir.parts), dest_dir),
+    )
+
+
+def create_dest_dirs(plan: Plan) -> int:
+    # Dest directories are created once before execution instead of once
+    # per plan item, so the cost scales with the number of directories.
+    dest_dirs = get_dest_dirs(plan)
+    for dest_dir in dest_dirs:
+        dest_dir.mkdir(parents=True, exist_ok=True)
+    return len(dest_dirs)
+
+
+def format_strategy_counts(strategy_counts: Counter[TransferStrategyType]) -> str:
+    return ", ".join(
+        f"{strategy}={count}" for strategy, count in sorted(strategy_counts.items())
+    )
+
+
+def iter_progress_snapshots(
+    ticks: Iterable[None],
+    *,
+    progress: ExecuteProgress,
+    meter: ProgressMeter,
+    interval_seconds: float,
+) -> Iterator[ProgressSnapshot]:
+    next_time = meter.start_time + interval_seconds
+    for _ in ticks:
+        now = monotonic()
+        if now >= next_time:
+            next_time = now + interval_seconds
+            yield meter.update(now, *progress.get_totals())
+
+
+def execute_plan_items(
+    plan: Iterable[PlanItem],
+    *,
+    context: Context,
+    total: int | None,
+    total_bytes: int | None = None,
+    catalog: VersionCatalog | None = None,
+    plan_sizes: PlanSizes | None = None,
+) -> ExecuteStats:
+    progress = ExecuteProgress(total, total_bytes=total_bytes, catalog=catalog)
+    meter = ProgressMeter(total, total_bytes, start_time=monotonic())
+    tuner: ThreadTuner | None = None
+    max_workers = context.threads
+    if context.autotune:
+        tuner = ThreadTuner(context.threads, max_threads=AUTOTUNE_MAX_THREADS)
+        max_workers = tuner.max_threads
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        ticks = iter_finished_plan_items(
             plan,
+            context=context,
+            progress=progress,
+            executor=executor,
+            tuner=tuner,
+            plan_sizes=plan_sizes,
         )
 
         # Retrieve results to throw exceptions from threads.
         # (The following code must be put in the with statement because
         # the progresses must be collected before exiting the with statement.)
         if context.verbose:
-            for _ in execute_results_iterable:
-                pass
+            for snapshot in iter_progress_snapshots(
+                ticks,
+                progress=progress,
+                meter=meter,
+                interval_seconds=PROGRESS_LOG_SECONDS,
+            ):
+                with context.log_lock:
+                    logger.info(f"Progress: {format_progress(snapshot)}")
         else:
+            # The progress bar goes to stderr, so that stdout only holds
+            # the plan and messages. It moves by bytes when there are any,
+            # so that large files move it gradually.
+            by_bytes = bool(total_bytes)
+            snapshots = iter_progress_snapshots(
+                ticks,
+                progress=progress,
+                meter=meter,
+                interval_seconds=PROGRESS_REFRESH_SECONDS,
+            )
             with progressbar(
-                execute_results_iterable, label="Executing", length=len(plan)
-            ) as execute_results:
-                for _ in execute_results:
-                    pass
+                snapshots,
+                label="Executing",
+                length=(total_bytes if by_bytes else total),
+                show_eta=False,
+                item_show_func=(lambda text: text),
+                file=sys.stderr,
+            ) as execute_progress_bar:
+                for snapshot in snapshots:
+                    execute_progress_bar.update(
+                        (snapshot.bytes if by_bytes else snapshot.items)
+                        - execute_progress_bar.pos,
+                        format_progress(snapshot),
+                    )
 
+    stats = progress.get_stats()
+    finish_time = monotonic()
+    stats.duration_seconds = finish_time - meter.start_time
+    stats.max_threads = max_workers
+    final_snapshot = meter.finish(
+        finish_time, stats.finished_items, stats.finished_bytes
+    )
     with context.log_lock:
+        logger.info(
+            f"Transfer strategies: {format_strategy_counts(stats.strategy_counts)}"
+        )
+        logger.info(f"Executed: {format_progress(final_snapshot)}")
+        if tuner is not None:
+            stats.tuned_threads = tuner.best_threads
+            logger.info(f"Tuned threads: {tuner.best_threads}")
         logger.info("All done.")
+
+    return stats
+
+
+def get_plan_sizes(
+    plan: Iterable[PlanItem], *, with_inodes: bool, profiler: Profiler | None = None
+) -> PlanSizes:
+    # Sources are sized once, for the progress total and for scheduling.
+    plan_sizes = PlanSizes(sizes=array("q"), inodes=array("Q"), devices=array("Q"))
+    size_stat_count = 0
+    for sized_plan_item in iter_sized_plan_items(
+        plan, stat_sources=True, with_inodes=with_inodes
+    ):
+        if with_inodes or sized_plan_item.plan_item.src_size is None:
+            size_stat_count += 1
+        plan_sizes.sizes.append(sized_plan_item.size)
+        plan_sizes.inodes.append(sized_plan_item.inode)
+        plan_sizes.devices.append(sized_plan_item.device)
+    if profiler is not None:
+        profiler.count("execute.size_stats", size_stat_count)
+    return plan_sizes
+
+
+def execute_plan(
+    plan: Plan, *, context: Context, catalog: VersionCatalog | None = None
+) -> ExecuteStats:
+    dest_dir_count = create_dest_dirs(plan)
+    plan_sizes = get_plan_sizes(
+        plan,
+        with_inodes=needs_inodes(
+            context.execute_order, with_devices=uses_devices(context)
+        ),
+        profiler=context.profiler,
+    )
+    if context.profiler is not None:
+        context.profiler.count("execute.mkdirs", dest_dir_count)
+    return execute_plan_items(
+        plan,
+        context=context,
+        total=len(plan),
+        total_bytes=sum(plan_sizes.sizes),
+        catalog=catalog,
+        plan_sizes=plan_sizes,
+    )
+
+
+def iter_with_dest_dirs(
+    plan: Iterable[PlanItem], *, profiler: Profiler | None = None
+) -> Iterator[PlanItem]:
+    # Each dest directory is created once, before its first plan item
+    # is passed on.
+    created_dirs = set[Path]()
+    for plan_item in plan:
+        dest_dir = plan_item.dest.parent
+        if dest_dir not in created_dirs:
+            dest_dir.mkdir(parents=True, exist_ok=True)
+            created_dirs.add(dest_dir)
+            if profiler is not None:
+                profiler.count("execute.mkdirs")
+        yield plan_item
+
+
+class PlanStream:
+    queue: Queue[PlanItem | BaseException | None]
+    closed: Event
+    thread: Thread
+
+    def __init__(
+        self,
+        plan: Iterable[PlanItem],
+        *,
+        buffer_size: int = STREAM_BUFFER_SIZE,
+        closed: Event | None = None,
+    ) -> None:
+        # The plan may share `closed` to stop early while it yields nothing.
+        self.queue = Queue(maxsize=buffer_size)
+        self.closed = Event() if closed is None else closed
+        self.thread = Thread(target=self.produce, args=(plan,), daemon=True)
+
+    def put(self, item: PlanItem | BaseException | None) -> bool:
+        # The producer gives up once the consumer is gone.
+        while not self.closed.is_set():
+            try:
+                self.queue.put(item, timeout=STREAM_POLL_SECONDS)
+            except Full:
+                continue
+            return True
+        return False
+
+    def produce(self, plan: Iterable[PlanItem]) -> None:
+        try:
+            for plan_item in plan:
+                if not self.put(plan_item):
+                    return
+        except BaseException as error:
+            self.put(error)
+        else:
+            self.put(None)
+
+    def __iter__(self) -> Iterator[PlanItem]:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def __enter__(self) -> Self:
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        # The producer is waited for, so that nothing it touches
+        # (like the manifest) is still changing afterwards.
+        self.closed.set()
+        self.thread.join()
+
+
+def execute_plan_stream(
+    plan: Iterable[PlanItem],
+    *,
+    context: Context,
+    catalog: VersionCatalog | None = None,
+    buffer_size: int = STREAM_BUFFER_SIZE,
+    closed: Event | None = None,
+) -> ExecuteStats:
+    # Plan items are produced by another thread through a bounded queue,
+    # so that planning and execution overlap. Other orders than the plan
+    # order would sort (and hold) the whole plan before executing it.
+    if context.execute_order != "plan":
+        raise RuntimeError(
+            f"Streamed plans can't be executed in {context.execute_order!r} order."
+        )
+    with PlanStream(
+        iter_with_dest_dirs(plan, profiler=context.profiler),
+        buffer_size=buffer_size,
+        closed=closed,
+    ) as plan_stream:
+        return execute_plan_items(
+            plan_stream, context=context, total=None, catalog=catalog
+        )
+
+
+def delete_versions(
+    prune_items: Sequence[PruneItem],
+    *,
+    catalog: VersionCatalog | None,
+    profiler: Profiler | None = None,
+) -> int:
+    for prune_item in prune_items:
+        try:
+            prune_item.path.unlink()
+        except FileNotFoundError:
+            logger.warning("Version already deleted: %s", prune_item.path)
+        if catalog is not None:
+            catalog.remove(prune_item.path)
+        if logger.isEnabledFor(INFO):
+            logger.info("Deleted: %s", prune_item.path)
+    if profiler is not None:
+        profiler.count("prune.unlinks", len(prune_items))
+    return len(prune_items)
+
+
+def execute_prune_plan(
+    prune_plan: Sequence[PruneItem],
+    *,
+    context: Context,
+    catalog: VersionCatalog | None = None,
+) -> int:
+    # Deletes are independent of each other, so they run in parallel on a
+    # pool of the configured size. They are submitted in batches, so that
+    # pruning millions of versions doesn't take millions of futures.
+    batches = (
+        prune_plan[i : i + PRUNE_BATCH_SIZE]
+        for i in range(0, len(prune_plan), PRUNE_BATCH_SIZE)
+    )
+    with ThreadPoolExecutor(max_workers=context.threads) as executor:
+        deleted_counts = executor.map(
+            partial(delete_versions, catalog=catalog, profiler=context.profiler),
+            batches,
+        )
+        if context.verbose:
+            for _ in deleted_counts:
+                pass
+        else:
+            with progressbar(
+                length=len(prune_plan), label="Deleting", file=sys.stderr
+            ) as delete_progress:
+                for deleted_count in deleted_counts:
+                    delete_progress.update(deleted_count)
+
+    with context.log_lock:
+        logger.info(f"Deleted {len(prune_plan)} old version(s).")
+
+    return len(prune_plan)
@@ -0,0 +1,57 @@
+import logging
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import Final, TextIO
+
+LOG_FORMAT: Final = "[%(asctime)s] %(levelname)s (%(name)s) %(message)s"
+
+
+class DeferredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records are queued as they are, so that their messages are
+        # formatted by the writer thread instead of the logging threads.
+        # (Log arguments are never mutated after logging.)
+        return record
+
+
+class LogWriter(QueueListener):
+    # The root handlers and level replaced by the writer are restored when
+    # it stops, so that later records aren't lost in an undrained queue.
+    previous_handlers: list[logging.Handler]
+    previous_level: int
+
+    def __init__(
+        self,
+        log_queue: SimpleQueue[logging.LogRecord],
+        stream_handler: logging.Handler,
+        *,
+        level: int,
+    ) -> None:
+        super().__init__(log_queue, stream_handler)
+        root_logger = logging.getLogger()
+        self.previous_handlers = root_logger.handlers[:]
+        self.previous_level = root_logger.level
+        for handler in self.previous_handlers:
+            root_logger.removeHandler(handler)
+        root_logger.addHandler(DeferredQueueHandler(log_queue))
+        root_logger.setLevel(level)
+
+    def stop(self) -> None:
+        super().stop()
+        root_logger = logging.getLogger()
+        for handler in root_logger.handlers[:]:
+            root_logger.removeHandler(handler)
+        for handler in self.previous_handlers:
+            root_logger.addHandler(handler)
+        root_logger.setLevel(self.previous_level)
+
+
+def start_log_writer(level: int, *, stream: TextIO | None = None) -> LogWriter:
+    # Records are handed to a single writer thread through a queue, so that
+    # logging threads never wait for the stream or for each other.
+    stream_handler = logging.StreamHandler(sys.stderr if stream is None else stream)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log_writer = LogWriter(SimpleQueue(), stream_handler, level=level)
+    log_writer.start()
+    return log_writer
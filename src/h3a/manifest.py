@@ -0,0 +1,164 @@
+import json
+import os
+from hashlib import sha256
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING, Final, NamedTuple
+
+from .config import Config
+from .digest import DigestCache, DigestCacheEntry
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .catalog import VersionCatalog
+    from .plan import DestIndex
+
+logger = getLogger(__name__)
+
+MANIFEST_VERSION: Final = 1
+
+
+class ManifestEntry(NamedTuple):
+    size: int
+    mtime_ns: int
+    inode: int
+    dest: str
+
+
+def get_manifest_fingerprint(config: Config, root_dir: Path) -> str:
+    # Only the config items affecting dest paths invalidate the manifest.
+    fingerprint_data = [
+        str(root_dir),
+        config["out_dir"],
+        config["tag_time_source"],
+        config["tag_format"],
+        config["tag_pattern"],
+    ]
+    return sha256(json.dumps(fingerprint_data).encode()).hexdigest()
+
+
+class Manifest:
+    path: Path
+    fingerprint: str
+    root_dir: Path
+    out_dir: Path
+    entries: dict[str, ManifestEntry]
+    next_entries: dict[str, ManifestEntry]
+    digests: DigestCache
+
+    def __init__(self, path: Path, *, config: Config, root_dir: Path) -> None:
+        self.path = path
+        self.fingerprint = get_manifest_fingerprint(config, root_dir)
+        self.root_dir = root_dir
+        self.out_dir = (root_dir / config["out_dir"]).resolve()
+        self.entries = {}
+        self.next_entries = {}
+        self.digests = DigestCache()
+
+    def load(self) -> None:
+        self.entries = {}
+        self.digests = DigestCache()
+
+        try:
+            manifest_text = self.path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            logger.info(f"Manifest not found, doing a full scan: {self.path}")
+            return
+
+        try:
+            manifest_data = json.loads(manifest_text)
+            if manifest_data["version"] != MANIFEST_VERSION:
+                logger.warning(
+                    f"Manifest version mismatch, doing a full scan: {self.path}"
+                )
+                return
+            if manifest_data["fingerprint"] != self.fingerprint:
+                logger.warning(f"Manifest is stale, doing a full scan: {self.path}")
+                return
+            entries = {
+                str(key): ManifestEntry(
+                    size=int(size),
+                    mtime_ns=int(mtime_ns),
+                    inode=int(inode),
+                    dest=str(dest),
+                )
+                for key, (size, mtime_ns, inode, dest) in manifest_data[
+                    "entries"
+                ].items()
+            }
+            digests = {
+                str(key): DigestCacheEntry(
+                    size=int(size), mtime_ns=int(mtime_ns), digest=str(digest)
+                )
+                for key, (size, mtime_ns, digest) in manifest_data.get(
+                    "digests", {}
+                ).items()
+            }
+        except (ValueError, TypeError, KeyError, AttributeError):
+            logger.warning(f"Manifest is corrupt, doing a full scan: {self.path}")
+            return
+
+        self.entries = entries
+        self.digests = DigestCache(digests)
+        logger.debug(f"Loaded {len(entries)} manifest entries from: {self.path}")
+
+    def get_key(self, src_path: Path) -> str:
+        return str(src_path.relative_to(self.root_dir))
+
+    def is_unchanged(
+        self,
+        src_path: Path,
+        src_stat: os.stat_result,
+        *,
+        dest_index: "DestIndex | VersionCatalog",
+    ) -> bool:
+        # Dests are looked up in the dest index of the run, which lists
+        # each directory once (or not at all) instead of stating every dest.
+        key = self.get_key(src_path)
+        entry = self.entries.get(key)
+        if (
+            entry is None
+            or entry.size != src_stat.st_size
+            or entry.mtime_ns != src_stat.st_mtime_ns
+            or entry.inode != src_stat.st_ino
+        ):
+            return False
+        if not dest_index.exists(self.out_dir / entry.dest):
+            return False
+        self.next_entries[key] = entry
+        return True
+
+    def record(self, src_path: Path, src_stat: os.stat_result, dest_path: Path) -> None:
+        self.next_entries[self.get_key(src_path)] = ManifestEntry(
+            size=src_stat.st_size,
+            mtime_ns=src_stat.st_mtime_ns,
+            inode=src_stat.st_ino,
+            dest=str(dest_path.relative_to(self.out_dir)),
+        )
+
+    def carry_over(self) -> None:
+        # Keeps all loaded entries for a run that doesn't scan the sources.
+        self.next_entries = dict(self.entries)
+        self.digests.used_entries = dict(self.digests.entries)
+
+    def save(self) -> None:
+        manifest_data = {
+            "version": MANIFEST_VERSION,
+            "fingerprint": self.fingerprint,
+            "entries": self.next_entries,
+            "digests": self.digests.used_entries,
+        }
+
+        # Write to a temporary file first so that an interrupted
+        # save never leaves a truncated manifest behind.
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with temp_path.open("w", encoding="utf-8") as temp_file:
+            json.dump(manifest_data, temp_file, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+        logger.debug(f"Saved {len(self.next_entries)} manifest entries to: {self.path}")
+
+
+def load_manifest(path: Path, *, config: Config, root_dir: Path) -> Manifest:
+    manifest = Manifest(path, config=config, root_dir=root_dir)
+    manifest.load()
+    return manifest
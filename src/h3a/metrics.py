@@ -0,0 +1,189 @@
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Final, get_args
+
+from .execute import ExecuteStats
+from .plan import PlanStats, SkipReasonType
+
+METRIC_PREFIX: Final = "h3a_"
+
+
+@dataclass
+class RunStats:
+    plan_stats: PlanStats = field(default_factory=PlanStats)
+    execute_stats: ExecuteStats = field(default_factory=ExecuteStats)
+    deleted_versions: int = 0
+    # Wall time per phase of the run, in the order of the phases.
+    phase_seconds: dict[str, float] = field(default_factory=dict)
+    duration_seconds: float = 0.0
+    finish_time: float = 0.0
+    succeeded: bool = True
+
+    def add_phase_seconds(self, name: str, seconds: float) -> None:
+        self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+
+
+type MetricSample = tuple[dict[str, str], float]
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_sample_name(name: str, labels: dict[str, str]) -> str:
+    label_text = ",".join(
+        f'{label}="{escape_label_value(label_value)}"'
+        for label, label_value in labels.items()
+    )
+    if label_text:
+        label_text = f"{{{label_text}}}"
+    return f"{METRIC_PREFIX}{name}{label_text}"
+
+
+def format_metric(
+    name: str,
+    help_text: str,
+    samples: Iterable[MetricSample],
+    *,
+    labels: dict[str, str],
+) -> str:
+    # Every value is a gauge, because each file describes the last run only.
+    lines = [
+        f"# HELP {METRIC_PREFIX}{name} {help_text}",
+        f"# TYPE {METRIC_PREFIX}{name} gauge",
+    ]
+    for sample_labels, value in samples:
+        lines.append(f"{format_sample_name(name, labels | sample_labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def format_metrics(
+    stats: RunStats,
+    *,
+    labels: dict[str, str],
+    last_success_time: float | None = None,
+) -> str:
+    plan_stats = stats.plan_stats
+    execute_stats = stats.execute_stats
+    metrics: list[tuple[str, str, list[MetricSample]]] = [
+        (
+            "last_run_success",
+            "Whether the last run succeeded (1) or failed (0).",
+            [({}, int(stats.succeeded))],
+        ),
+        (
+            "last_run_timestamp_seconds",
+            "Time when the last run finished.",
+            [({}, stats.finish_time)],
+        ),
+        (
+            "run_duration_seconds",
+            "Wall time of the run.",
+            [({}, stats.duration_seconds)],
+        ),
+        (
+            "phase_duration_seconds",
+            "Wall time of each phase of the run.",
+            [
+                ({"phase": name}, seconds)
+                for name, seconds in stats.phase_seconds.items()
+            ],
+        ),
+        (
+            "files_planned",
+            "Files in the plan.",
+            [({}, plan_stats.planned_items)],
+        ),
+        (
+            "files_skipped",
+            "Files left out of the plan, by reason.",
+            [
+                ({"reason": reason}, plan_stats.skipped_counts[reason])
+                for reason in get_args(SkipReasonType.__value__)
+            ],
+        ),
+        (
+            "files_copied",
+            "Files written to the output directory.",
+            [({}, execute_stats.finished_items)],
+        ),
+        (
+            "files_overwritten",
+            "Files written over existing destination files.",
+            [({}, execute_stats.overwritten_items)],
+        ),
+        (
+            "bytes_copied",
+            "Bytes copied, excluding linked files.",
+            [({}, execute_stats.bytes_copied)],
+        ),
+        (
+            "versions_deleted",
+            "Old versions deleted.",
+            [({}, stats.deleted_versions)],
+        ),
+        (
+            "worker_threads",
+            "Size of the worker pool of the execution.",
+            [({}, execute_stats.max_threads)],
+        ),
+    ]
+    # Failed runs carry the time of the last success over, if it is known.
+    if stats.succeeded:
+        last_success_time = stats.finish_time
+    if last_success_time is not None:
+        metrics.insert(
+            0,
+            (
+                "last_success_timestamp_seconds",
+                "Time when the last run finished successfully.",
+                [({}, last_success_time)],
+            ),
+        )
+    worker_utilization = execute_stats.get_utilization()
+    if worker_utilization is not None:
+        metrics.append(
+            (
+                "worker_utilization_ratio",
+                "Busy time of the workers over their available time.",
+                [({}, worker_utilization)],
+            )
+        )
+    return "".join(
+        format_metric(name, help_text, samples, labels=labels)
+        for name, help_text, samples in metrics
+    )
+
+
+def read_last_success_time(path: Path, *, labels: dict[str, str]) -> float | None:
+    # Only a sample written by an earlier run with the same labels counts.
+    sample_prefix = format_sample_name("last_success_timestamp_seconds", labels) + " "
+    try:
+        metrics_text = path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    for line in metrics_text.splitlines():
+        if line.startswith(sample_prefix):
+            try:
+                return float(line[len(sample_prefix) :])
+            except ValueError:
+                return None
+    return None
+
+
+def write_metrics_file(path: Path, stats: RunStats, *, labels: dict[str, str]) -> None:
+    # Textfile collectors may read the file at any time, so it is replaced
+    # at once. (They ignore files without the `.prom` extension.) Failed
+    # runs keep the last success time of the replaced file, so that alerts
+    # on its age keep firing.
+    last_success_time: float | None = None
+    if not stats.succeeded:
+        last_success_time = read_last_success_time(path, labels=labels)
+    temp_path = path.with_name(path.name + ".tmp")
+    temp_path.write_text(
+        format_metrics(stats, labels=labels, last_success_time=last_success_time),
+        encoding="utf-8",
+    )
+    os.replace(temp_path, path)
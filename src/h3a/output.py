@@ -0,0 +1,107 @@
+import json
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Final, Literal, NamedTuple, TextIO, assert_never
+
+from .plan import Plan, PlanItem, format_plan_item
+from .prune import PruneItem, format_prune_item, format_prune_item_json
+
+type PlanFormatType = Literal["text", "jsonl"]
+
+# Lines are joined and written in chunks, since writing them one by one
+# to a terminal can take longer than executing the plan.
+PLAN_OUTPUT_CHUNK_SIZE: Final = 4096
+PLAN_SUMMARY_ITEMS: Final = 10
+
+
+def write_lines(lines: Iterable[str], file: TextIO) -> None:
+    chunk: list[str] = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= PLAN_OUTPUT_CHUNK_SIZE:
+            file.write("\n".join(chunk) + "\n")
+            chunk.clear()
+    if chunk:
+        file.write("\n".join(chunk) + "\n")
+    file.flush()
+
+
+def format_plan_item_json(plan_item: PlanItem) -> str:
+    return json.dumps(
+        {
+            "id": plan_item.id,
+            "src": str(plan_item.src),
+            "dest": str(plan_item.dest),
+            "overwrite": plan_item.overwrite_flag,
+        },
+        ensure_ascii=False,
+    )
+
+
+def write_plan(
+    plan: Iterable[PlanItem], file: TextIO, *, plan_format: PlanFormatType
+) -> None:
+    match plan_format:
+        case "text":
+            write_lines(map(format_plan_item, plan), file)
+        case "jsonl":
+            write_lines(map(format_plan_item_json, plan), file)
+        case _:  # pragma: no cover
+            assert_never(plan_format)
+
+
+def write_prune_plan(
+    prune_plan: Iterable[PruneItem], file: TextIO, *, plan_format: PlanFormatType
+) -> None:
+    match plan_format:
+        case "text":
+            write_lines(map(format_prune_item, prune_plan), file)
+        case "jsonl":
+            write_lines(map(format_prune_item_json, prune_plan), file)
+        case _:  # pragma: no cover
+            assert_never(plan_format)
+
+
+class PlanDirSummary(NamedTuple):
+    dest_dir: Path
+    count: int
+    size: int
+
+
+def summarize_plan(plan: Iterable[PlanItem]) -> list[PlanDirSummary]:
+    counts: dict[Path, int] = {}
+    sizes: dict[Path, int] = {}
+    for plan_item in plan:
+        dest_dir = plan_item.dest.parent
+        # Sources are statted again only if planning didn't stat them.
+        size = plan_item.src_size
+        if size is None:
+            try:
+                size = plan_item.src.stat().st_size
+            except OSError:
+                # Missing sources are reported on execution.
+                size = 0
+        counts[dest_dir] = counts.get(dest_dir, 0) + 1
+        sizes[dest_dir] = sizes.get(dest_dir, 0) + size
+    return [
+        PlanDirSummary(dest_dir=dest_dir, count=counts[dest_dir], size=sizes[dest_dir])
+        for dest_dir in sorted(counts)
+    ]
+
+
+def write_plan_summary(
+    plan: Plan, file: TextIO, *, item_count: int = PLAN_SUMMARY_ITEMS
+) -> None:
+    dir_summaries = summarize_plan(plan)
+    lines = [f"{len(plan)} item(s) in {len(dir_summaries)} dest directories:"]
+    lines.extend(
+        f"  {dir_summary.dest_dir}: {dir_summary.count} item(s),"
+        f" {dir_summary.size} bytes"
+        for dir_summary in dir_summaries
+    )
+    lines.append(
+        f"Total: {sum(dir_summary.size for dir_summary in dir_summaries)} bytes"
+    )
+    lines.append(f"First {min(item_count, len(plan))} item(s):")
+    lines.extend(format_plan_item(plan[i]) for i in range(min(item_count, len(plan))))
+    write_lines(lines, file)
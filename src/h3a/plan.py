@@ -1,29 +1,66 @@
+import math
+import os
 import re
-from fnmatch import fnmatch
-from glob import glob
-from logging import getLogger
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from logging import DEBUG, INFO, getLogger
 from pathlib import Path
-from time import localtime, strftime
-from typing import NamedTuple, assert_never
+from threading import Event
+from time import localtime, strftime, time
+from typing import (
+    TYPE_CHECKING,
+    Final,
+    Literal,
+    NamedTuple,
+    Never,
+    assert_never,
+    overload,
+)
 
+from .catalog import sort_versions
 from .config import Config
 from .context import Context
+from .digest import DigestCache
+from .profile import Profiler
+from .scan import ScannedFile, Scanner
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .catalog import VersionCatalog
+    from .manifest import Manifest
 
 logger = getLogger(__name__)
 
+TAG_CACHE_SIZE: Final = 65536
+
+type SkipReasonType = Literal["tagged", "unchanged", "identical", "existing"]
+
+
+def iter_source_files(
+    root_dir: Path, config: Config, *, profiler: Profiler | None = None
+) -> Iterator[tuple[Path, ScannedFile]]:
+    scanner = Scanner(config["include"], config["exclude"])
+    scanned_files: Iterable[ScannedFile] = scanner.scan_files(root_dir)
+    if profiler is not None:
+        # Scanning is interleaved with planning, so it is timed by item.
+        scanned_files = profiler.iter_timed("plan.scan", scanned_files)
+    file_count = 0
+    try:
+        for scanned_file in scanned_files:
+            file_count += 1
+            # Paths are normalized, since patterns may contain `.` or `..`.
+            yield Path(os.path.abspath(root_dir / scanned_file.path)), scanned_file
+    finally:
+        if profiler is not None:
+            profiler.count("scan.files", file_count)
+            profiler.count("scan.listings", scanner.listing_count)
+            profiler.count("scan.stats", scanner.stat_count)
+
 
 def collect_source_files(root_dir: Path, config: Config) -> set[Path]:
-    return set(
-        (root_dir / path).absolute()
-        for include_pattern in config["include"]
-        for path in glob(include_pattern, root_dir=root_dir, recursive=True)
-        if (
-            (root_dir / path).is_file()
-            and not any(
-                fnmatch(path, exclude_pattern) for exclude_pattern in config["exclude"]
-            )
-        )
-    )
+    # Kept for callers that need all sources at once; planning streams them.
+    return {src_path for src_path, _ in iter_source_files(root_dir, config)}
 
 
 class PlanItem(NamedTuple):
@@ -31,6 +68,17 @@ class PlanItem(NamedTuple):
     src: Path
     dest: Path
     overwrite_flag: bool
+    # The size and mtime of the source from the scan, if it was statted
+    # while planning, so that later steps don't stat it again.
+    src_size: int | None = None
+    src_mtime_ns: int | None = None
+
+
+@dataclass
+class PlanStats:
+    planned_items: int = 0
+    overwrite_items: int = 0
+    skipped_counts: Counter[SkipReasonType] = field(default_factory=Counter)
 
 
 def format_plan_item(plan_item: PlanItem) -> str:
@@ -38,33 +86,317 @@ def format_plan_item(plan_item: PlanItem) -> str:
     return f"({plan_item.id}) {plan_item.src} {arrow} {plan_item.dest}"
 
 
-def assert_tag_pattern(tag: str, tag_pattern: str) -> None:
-    if not re.fullmatch(tag_pattern, tag):
-        raise RuntimeError(
-            f"Generated tag {tag!r} is incompatible with tag pattern: {tag_pattern!r}"
+class TagRenderer:
+    tag_format: str
+    tag_pattern: str
+    tag_regex: re.Pattern[str]
+    tags: dict[int, str]
+
+    def __init__(self, tag_format: str, tag_pattern: str) -> None:
+        self.tag_format = tag_format
+        self.tag_pattern = tag_pattern
+        self.tag_regex = re.compile(tag_pattern)
+        self.tags = {}
+
+    def matches(self, text: str) -> bool:
+        return self.tag_regex.fullmatch(text) is not None
+
+    def render(self, timestamp: float) -> str:
+        # Tags have a resolution of one second, and many files share
+        # their second, so each rendered (and checked) tag is memoized.
+        seconds = math.floor(timestamp)
+        tag = self.tags.get(seconds)
+        if tag is None:
+            tag = strftime(self.tag_format, localtime(seconds))
+            if not self.matches(tag):
+                raise RuntimeError(
+                    f"Generated tag {tag!r} is incompatible with tag pattern:"
+                    f" {self.tag_pattern!r}"
+                )
+            if len(self.tags) >= TAG_CACHE_SIZE:
+                self.tags.clear()
+            self.tags[seconds] = tag
+        return tag
+
+
+class VersionIndex:
+    tag_regex: re.Pattern[str]
+    tag_format: str
+    dir_indexes: dict[Path, dict[tuple[str, str], list[tuple[str, os.DirEntry[str]]]]]
+
+    def __init__(self, tag_pattern: str, *, tag_format: str) -> None:
+        self.tag_regex = re.compile(f"(?s:(.*?)(?:{tag_pattern}))\\Z")
+        self.tag_format = tag_format
+        self.dir_indexes = {}
+
+    def index_dir(
+        self, dir_path: Path
+    ) -> dict[tuple[str, str], list[tuple[str, os.DirEntry[str]]]]:
+        # Existing versions are indexed by (stem, suffix) of their sources.
+        dir_index: dict[tuple[str, str], list[tuple[str, os.DirEntry[str]]]] = {}
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    entry_path = Path(entry.name)
+                    match = self.tag_regex.match(entry_path.stem)
+                    if match is None or not entry.is_file():
+                        continue
+                    stem = match.group(1)
+                    tag = entry_path.stem[len(stem) :]
+                    dir_index.setdefault((stem, entry_path.suffix), []).append(
+                        (tag, entry)
+                    )
+        except FileNotFoundError:
+            pass
+        return dir_index
+
+    def find_latest(self, dest_dir: Path, src_path: Path) -> Path | None:
+        dir_index = self.dir_indexes.get(dest_dir)
+        if dir_index is None:
+            dir_index = self.dir_indexes[dest_dir] = self.index_dir(dest_dir)
+        versions = dir_index.get((src_path.stem, src_path.suffix))
+        if not versions:
+            return None
+        version_paths = sort_versions(
+            ((tag, Path(entry.path)) for tag, entry in versions),
+            tag_format=self.tag_format,
         )
+        return version_paths[-1] if version_paths else None
+
+
+class DestIndex:
+    dir_names: dict[Path, frozenset[str]]
+    dir_folded_names: dict[Path, frozenset[str]]
 
+    def __init__(self) -> None:
+        self.dir_names = {}
+        self.dir_folded_names = {}
+
+    def exists(self, path: Path) -> bool:
+        # Each dest directory is listed once instead of
+        # stating every dest path in it.
+        names = self.dir_names.get(path.parent)
+        if names is None:
+            try:
+                names = frozenset(os.listdir(path.parent))
+            except (FileNotFoundError, NotADirectoryError):
+                names = frozenset()
+            self.dir_names[path.parent] = names
+            self.dir_folded_names[path.parent] = frozenset(
+                name.casefold() for name in names
+            )
+        if path.name in names:
+            return True
+        # Names differing only in case are the same file on case-insensitive
+        # file systems, which only the file system can tell.
+        if path.name.casefold() in self.dir_folded_names[path.parent]:
+            return path.exists()
+        return False
 
-type Plan = list[PlanItem]
 
+class CompactPlan(Sequence[PlanItem]):
+    # Directories are interned and file names are packed into one buffer,
+    # so that a plan item takes a few dozen bytes instead of two `Path`s.
+    # Plan items are rebuilt on access.
+    dirs: list[Path]
+    dir_indexes: dict[str, int]
+    ids: array[int]
+    overwrite_flags: array[int]
+    src_dirs: array[int]
+    dest_dirs: array[int]
+    # Unknown sizes and mtimes are stored as -1.
+    src_sizes: array[int]
+    src_mtimes_ns: array[int]
+    names: bytearray
+    # Item `i` has its source name at `names[name_offsets[2i]:name_offsets[2i+1]]`
+    # and its dest name right after it.
+    name_offsets: array[int]
 
-def generate_plan(*, config: Config, root_dir: Path, context: Context) -> Plan:
-    init_tag = strftime(config["tag_format"])
-    assert_tag_pattern(init_tag, config["tag_pattern"])
+    def __init__(self, plan_items: Iterable[PlanItem] = ()) -> None:
+        self.dirs = []
+        self.dir_indexes = {}
+        self.ids = array("q")
+        self.overwrite_flags = array("b")
+        self.src_dirs = array("I")
+        self.dest_dirs = array("I")
+        self.src_sizes = array("q")
+        self.src_mtimes_ns = array("q")
+        self.names = bytearray()
+        self.name_offsets = array("Q", [0])
+        for plan_item in plan_items:
+            self.append(plan_item)
+
+    def intern_dir(self, dir_path: str) -> int:
+        dir_index = self.dir_indexes.get(dir_path)
+        if dir_index is None:
+            dir_index = self.dir_indexes[dir_path] = len(self.dirs)
+            self.dirs.append(Path(dir_path))
+        return dir_index
+
+    def append(self, plan_item: PlanItem) -> None:
+        # Paths are split as strings, which is much cheaper than `Path.parent`.
+        src_dir, src_name = os.path.split(plan_item.src)
+        dest_dir, dest_name = os.path.split(plan_item.dest)
+        self.ids.append(plan_item.id)
+        self.overwrite_flags.append(plan_item.overwrite_flag)
+        self.src_dirs.append(self.intern_dir(src_dir))
+        self.dest_dirs.append(self.intern_dir(dest_dir))
+        self.src_sizes.append(-1 if plan_item.src_size is None else plan_item.src_size)
+        self.src_mtimes_ns.append(
+            -1 if plan_item.src_mtime_ns is None else plan_item.src_mtime_ns
+        )
+        for name in (src_name, dest_name):
+            self.names += os.fsencode(name)
+            self.name_offsets.append(len(self.names))
+
+    def get_name(self, offset_index: int) -> str:
+        start = self.name_offsets[offset_index]
+        end = self.name_offsets[offset_index + 1]
+        return os.fsdecode(bytes(self.names[start:end]))
+
+    def get_item(self, index: int) -> PlanItem:
+        src_size = self.src_sizes[index]
+        src_mtime_ns = self.src_mtimes_ns[index]
+        return PlanItem(
+            id=self.ids[index],
+            src=self.dirs[self.src_dirs[index]] / self.get_name(2 * index),
+            dest=self.dirs[self.dest_dirs[index]] / self.get_name(2 * index + 1),
+            overwrite_flag=bool(self.overwrite_flags[index]),
+            src_size=(None if src_size < 0 else src_size),
+            src_mtime_ns=(None if src_mtime_ns < 0 else src_mtime_ns),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @overload
+    def __getitem__(self, index: int) -> PlanItem: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[PlanItem]: ...
+
+    def __getitem__(self, index: int | slice) -> PlanItem | list[PlanItem]:
+        if isinstance(index, slice):
+            return [self.get_item(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("plan index out of range")
+        return self.get_item(index)
+
+    def __iter__(self) -> Iterator[PlanItem]:
+        for index in range(len(self)):
+            yield self.get_item(index)
+
+
+# Plans are either lists of plan items or compact plans.
+type Plan = Sequence[PlanItem]
+
+
+def raise_overwriting_src(src_path: Path) -> Never:
+    # This should never happen because source files conflicting with
+    # destination files should have tags matched and thus be skipped.
+    raise RuntimeError(f"Overwriting source file: {src_path}")  # pragma: no cover
+
+
+def generate_plan(
+    *,
+    config: Config,
+    root_dir: Path,
+    context: Context,
+    manifest: "Manifest | None" = None,
+    catalog: "VersionCatalog | None" = None,
+    stats: PlanStats | None = None,
+    compact: bool = False,
+) -> Plan:
+    plan_items = iter_plan(
+        config=config,
+        root_dir=root_dir,
+        context=context,
+        manifest=manifest,
+        catalog=catalog,
+        stats=stats,
+    )
+    if compact:
+        return CompactPlan(plan_items)
+    return list(plan_items)
+
+
+def iter_plan(
+    *,
+    config: Config,
+    root_dir: Path,
+    context: Context,
+    manifest: "Manifest | None" = None,
+    catalog: "VersionCatalog | None" = None,
+    stats: PlanStats | None = None,
+    closed: Event | None = None,
+) -> Iterator[PlanItem]:
+    # Plan items are yielded while the sources are still being scanned,
+    # so that they can be executed meanwhile. Each item is yielded only
+    # after its conflict checks have passed. Planning stops early once
+    # `closed` is set, even while no items are being yielded.
+    tag_renderer = TagRenderer(config["tag_format"], config["tag_pattern"])
+    init_tag = tag_renderer.render(time())
 
     tag_length = len(init_tag)
+    if stats is None:
+        stats = PlanStats()
     out_dir = (root_dir / config["out_dir"]).resolve()
-    plan: Plan = []
-    src_paths = collect_source_files(root_dir, config)
-    overwriting_src_paths = set[Path]()
+    plan_item_count = 0
+    src_paths = set[Path]()
+    existing_dest_paths = set[Path]()
     skipped_paths = set[Path]()
+    # A version catalog answers from its index without listing directories.
+    dest_index: DestIndex | VersionCatalog = (
+        catalog if catalog is not None else DestIndex()
+    )
+
+    digest_cache: DigestCache | None = None
+    version_index: VersionIndex | VersionCatalog | None = None
+    if config["skip_identical"]:
+        digest_cache = manifest.digests if manifest is not None else DigestCache()
+        version_index = (
+            catalog
+            if catalog is not None
+            else VersionIndex(config["tag_pattern"], tag_format=config["tag_format"])
+        )
 
-    for src_path in src_paths:
-        if re.fullmatch(config["tag_pattern"], src_path.stem[-tag_length:]):
+    # Syscall-heavy operations are counted locally and recorded once.
+    src_stat_count = 0
+    latest_stat_count = 0
+
+    for src_path, scanned_file in iter_source_files(
+        root_dir, config, profiler=context.profiler
+    ):
+        if closed is not None and closed.is_set():
+            break
+        src_paths.add(src_path)
+        if tag_renderer.matches(src_path.stem[-tag_length:]):
             skipped_paths.add(src_path)
-            with context.log_lock:
-                logger.info(f"Skipping file with matched tag: {src_path}")
+            stats.skipped_counts["tagged"] += 1
+            if logger.isEnabledFor(INFO):
+                logger.info("Skipping file with matched tag: %s", src_path)
             continue
+        if src_path in existing_dest_paths:  # pragma: no cover
+            raise_overwriting_src(src_path)
+
+        src_stat: os.stat_result | None = None
+        if (
+            manifest is not None
+            or digest_cache is not None
+            or config["tag_time_source"] != "now"
+        ):
+            src_stat = scanned_file.stat()
+            src_stat_count += 1
+
+        if manifest is not None:
+            assert src_stat is not None
+            if manifest.is_unchanged(src_path, src_stat, dest_index=dest_index):
+                stats.skipped_counts["unchanged"] += 1
+                if logger.isEnabledFor(INFO):
+                    logger.info("Skipping unchanged file: %s", src_path)
+                continue
 
         overwrite_flag = False
 
@@ -73,53 +405,88 @@ def generate_plan(*, config: Config, root_dir: Path, context: Context) -> Plan:
             case "now":
                 tag = init_tag
             case "mtime":
-                time = localtime(src_path.stat().st_mtime)
-                tag = strftime(config["tag_format"], time)
+                assert src_stat is not None
+                tag = tag_renderer.render(src_stat.st_mtime)
             case "ctime":
-                time = localtime(src_path.stat().st_ctime)
-                tag = strftime(config["tag_format"], time)
+                assert src_stat is not None
+                tag = tag_renderer.render(src_stat.st_ctime)
             case _:  # pragma: no cover
                 assert_never(config["tag_time_source"])
-        assert_tag_pattern(tag, config["tag_pattern"])
 
         assert src_path.is_relative_to(root_dir)
         dest_stem = src_path.stem + tag
         relative_dest_path = src_path.with_stem(dest_stem).relative_to(root_dir)
         dest_path = out_dir / relative_dest_path
 
-        if dest_path.exists():
-            if dest_path in src_paths:
-                overwriting_src_paths.add(dest_path)
+        if version_index is not None:
+            assert digest_cache is not None
+            assert src_stat is not None
+            latest_version = version_index.find_latest(dest_path.parent, src_path)
+            if latest_version is not None:
+                latest_stat_count += 1
+            if latest_version is not None and digest_cache.is_identical(
+                src_path, src_stat, latest_version, latest_version.stat()
+            ):
+                stats.skipped_counts["identical"] += 1
+                if logger.isEnabledFor(INFO):
+                    logger.info(
+                        "Skipping file identical to its latest version: %s", src_path
+                    )
+                if manifest is not None:
+                    manifest.record(src_path, src_stat, latest_version)
+                continue
+
+        if dest_index.exists(dest_path):
+            existing_dest_paths.add(dest_path)
+            if (
+                dest_path in src_paths and dest_path not in skipped_paths
+            ):  # pragma: no cover
+                raise_overwriting_src(dest_path)
 
             match config["on_conflict"]:
                 case "error":
                     raise RuntimeError(f"Destination file exists: {dest_path}")
                 case "skip":
-                    with context.log_lock:
-                        logger.info(f"Skipping existing destination file: {dest_path}")
+                    stats.skipped_counts["existing"] += 1
+                    if logger.isEnabledFor(INFO):
+                        logger.info("Skipping existing destination file: %s", dest_path)
                     continue
                 case "overwrite":
                     overwrite_flag = True
-                    with context.log_lock:
+                    stats.overwrite_items += 1
+                    if logger.isEnabledFor(DEBUG):
                         logger.debug(
-                            f"Overwriting existing destination file: {dest_path}"
+                            "Overwriting existing destination file: %s", dest_path
                         )
 
-        plan.append(
-            PlanItem(
-                id=(len(plan) + 1),
-                src=src_path,
-                dest=dest_path,
-                overwrite_flag=overwrite_flag,
-            )
-        )
+        if manifest is not None:
+            assert src_stat is not None
+            manifest.record(src_path, src_stat, dest_path)
+
+        if digest_cache is not None:
+            # The dest will have the same content as the source.
+            src_digest_entry = digest_cache.used_entries.get(str(src_path))
+            if src_digest_entry is not None:
+                digest_cache.set_digest(dest_path, src_digest_entry)
 
-    overwriting_src_paths -= skipped_paths
-    if len(overwriting_src_paths):
-        # This should never happen because source files conflicting with
-        # destination files should have tags matched and thus be skipped.
-        raise RuntimeError(  # pragma: no cover
-            f"Overwriting source file(s): {', '.join(map(str, overwriting_src_paths))}"
+        plan_item_count += 1
+        stats.planned_items += 1
+        yield PlanItem(
+            id=plan_item_count,
+            src=src_path,
+            dest=dest_path,
+            overwrite_flag=overwrite_flag,
+            src_size=(None if src_stat is None else src_stat.st_size),
+            src_mtime_ns=(None if src_stat is None else src_stat.st_mtime_ns),
         )
 
-    return plan
+    if context.profiler is not None:
+        context.profiler.count("plan.src_stats", src_stat_count)
+        context.profiler.count("plan.latest_stats", latest_stat_count)
+        # A version catalog lists directories only when refreshing.
+        if isinstance(dest_index, DestIndex):
+            context.profiler.count("plan.dest_listings", len(dest_index.dir_names))
+        if isinstance(version_index, VersionIndex):
+            context.profiler.count(
+                "plan.version_listings", len(version_index.dir_indexes)
+            )
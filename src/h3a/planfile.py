@@ -0,0 +1,144 @@
+import json
+import os
+from collections.abc import Iterable, Iterator
+from hashlib import sha256
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING, Final, NamedTuple
+
+from .config import Config
+from .plan import CompactPlan, DestIndex, PlanItem
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .manifest import Manifest
+
+logger = getLogger(__name__)
+
+PLAN_FILE_VERSION: Final = 1
+
+
+class PlanFileItem(NamedTuple):
+    plan_item: PlanItem
+    size: int
+    mtime_ns: int
+
+
+def get_plan_fingerprint(config: Config, root_dir: Path) -> str:
+    # Only the config items affecting the plan invalidate plan files.
+    fingerprint_data = [
+        str(root_dir),
+        config["include"],
+        config["exclude"],
+        config["out_dir"],
+        config["tag_time_source"],
+        config["tag_format"],
+        config["tag_pattern"],
+        config["on_conflict"],
+        config["skip_identical"],
+    ]
+    return sha256(json.dumps(fingerprint_data).encode()).hexdigest()
+
+
+def write_plan_file(path: Path, plan: Iterable[PlanItem], *, fingerprint: str) -> int:
+    # One JSON value per line: a header, then one array per plan item,
+    # so that plan files can be streamed and inspected with line-based
+    # tools. A plan file may be split at line boundaries if each part starts
+    # with a copy of the header, and such parts may be concatenated again.
+    temp_path = path.with_name(path.name + ".tmp")
+    count = 0
+    with temp_path.open("w", encoding="utf-8") as temp_file:
+        header = {"version": PLAN_FILE_VERSION, "fingerprint": fingerprint}
+        temp_file.write(json.dumps(header, separators=(",", ":")) + "\n")
+        for plan_item in plan:
+            # Sources are statted again only if planning didn't stat them.
+            size = plan_item.src_size
+            mtime_ns = plan_item.src_mtime_ns
+            if size is None or mtime_ns is None:
+                src_stat = plan_item.src.stat()
+                size = src_stat.st_size
+                mtime_ns = src_stat.st_mtime_ns
+            item_data = [
+                plan_item.id,
+                str(plan_item.src),
+                str(plan_item.dest),
+                plan_item.overwrite_flag,
+                size,
+                mtime_ns,
+            ]
+            temp_file.write(json.dumps(item_data, separators=(",", ":")) + "\n")
+            count += 1
+    os.replace(temp_path, path)
+
+    logger.debug(f"Wrote {count} plan items to: {path}")
+    return count
+
+
+def check_plan_file_header(header: object, path: Path, *, fingerprint: str) -> None:
+    if not isinstance(header, dict):
+        raise ValueError("Plan file header is not an object")
+    if header["version"] != PLAN_FILE_VERSION:
+        raise RuntimeError(f"Plan file version mismatch: {path}")
+    if header["fingerprint"] != fingerprint:
+        raise RuntimeError(f"Plan file was generated with a different config: {path}")
+
+
+def iter_plan_file(path: Path, *, fingerprint: str) -> Iterator[PlanFileItem]:
+    with path.open("r", encoding="utf-8") as plan_file:
+        try:
+            check_plan_file_header(
+                json.loads(plan_file.readline()), path, fingerprint=fingerprint
+            )
+            for line in plan_file:
+                line_data = json.loads(line)
+                if isinstance(line_data, dict):
+                    # Parts of a split plan file each have their header.
+                    check_plan_file_header(line_data, path, fingerprint=fingerprint)
+                    continue
+                plan_id, src, dest, overwrite_flag, size, mtime_ns = line_data
+                yield PlanFileItem(
+                    plan_item=PlanItem(
+                        id=int(plan_id),
+                        src=Path(src),
+                        dest=Path(dest),
+                        overwrite_flag=bool(overwrite_flag),
+                        # Sizes and mtimes are checked against the sources
+                        # when loaded.
+                        src_size=int(size),
+                        src_mtime_ns=int(mtime_ns),
+                    ),
+                    size=int(size),
+                    mtime_ns=int(mtime_ns),
+                )
+        except (ValueError, TypeError, KeyError) as error:
+            raise RuntimeError(f"Plan file is corrupt: {path}") from error
+
+
+def load_plan_file(
+    path: Path, *, fingerprint: str, manifest: "Manifest | None" = None
+) -> CompactPlan:
+    # Sources must be unchanged since planning and dest files must not
+    # have appeared since then, or the plan would be executed blindly.
+    plan = CompactPlan()
+    dest_index = DestIndex()
+    if manifest is not None:
+        # No scan happens, so the manifest is updated instead of rebuilt.
+        manifest.carry_over()
+    for plan_item, size, mtime_ns in iter_plan_file(path, fingerprint=fingerprint):
+        try:
+            src_stat = plan_item.src.stat()
+        except FileNotFoundError as error:
+            raise RuntimeError(
+                f"Source file disappeared since planning: {plan_item.src}"
+            ) from error
+        if src_stat.st_size != size or src_stat.st_mtime_ns != mtime_ns:
+            raise RuntimeError(f"Source file changed since planning: {plan_item.src}")
+        if not plan_item.overwrite_flag and dest_index.exists(plan_item.dest):
+            raise RuntimeError(
+                f"Destination file appeared since planning: {plan_item.dest}"
+            )
+        if manifest is not None:
+            manifest.record(plan_item.src, src_stat, plan_item.dest)
+        plan.append(plan_item)
+
+    logger.debug(f"Loaded {len(plan)} plan items from: {path}")
+    return plan
@@ -0,0 +1,233 @@
+import json
+import os
+import platform
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from time import perf_counter, process_time, thread_time
+from typing import Final, TypedDict
+
+from .progress import PerThread
+
+PROFILE_REPORT_VERSION: Final = 1
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKET_SECONDS: Final = (
+    0.0001,
+    0.0002,
+    0.0005,
+    0.001,
+    0.002,
+    0.005,
+    0.01,
+    0.02,
+    0.05,
+    0.1,
+    0.2,
+    0.5,
+    1.0,
+    2.0,
+    5.0,
+    10.0,
+)
+LATENCY_PERCENTILES: Final = (50, 95, 99)
+
+
+class PhaseReport(TypedDict):
+    calls: int
+    wall_seconds: float
+    cpu_seconds: float
+
+
+class LatencyBucket(TypedDict):
+    # `None` is the bucket of the latencies above all bounds.
+    le: float | None
+    count: int
+
+
+class LatencyReport(TypedDict):
+    count: int
+    mean_seconds: float
+    max_seconds: float
+    p50_seconds: float
+    p95_seconds: float
+    p99_seconds: float
+    histogram: list[LatencyBucket]
+
+
+class HostReport(TypedDict):
+    name: str
+    platform: str
+    python: str
+    cpu_count: int | None
+
+
+class ProfileReport(TypedDict):
+    report_version: int
+    h3a_version: str
+    host: HostReport
+    threads: int
+    wall_seconds: float
+    cpu_seconds: float
+    phases: dict[str, PhaseReport]
+    counters: dict[str, int]
+    latencies: dict[str, LatencyReport]
+
+
+def get_percentile(sorted_samples: Sequence[float], percentile: int) -> float:
+    # The nearest-rank percentile, which is always one of the samples.
+    rank = max(-(-len(sorted_samples) * percentile // 100), 1)
+    return sorted_samples[rank - 1]
+
+
+def summarize_latencies(samples: Iterable[float]) -> LatencyReport:
+    sorted_samples = sorted(samples)
+    if not sorted_samples:
+        raise RuntimeError("No latency samples to summarize.")
+    bucket_counts = [0] * (len(LATENCY_BUCKET_SECONDS) + 1)
+    bucket_index = 0
+    for sample in sorted_samples:
+        while (
+            bucket_index < len(LATENCY_BUCKET_SECONDS)
+            and sample > LATENCY_BUCKET_SECONDS[bucket_index]
+        ):
+            bucket_index += 1
+        bucket_counts[bucket_index] += 1
+    p50, p95, p99 = (
+        get_percentile(sorted_samples, percentile) for percentile in LATENCY_PERCENTILES
+    )
+    return LatencyReport(
+        count=len(sorted_samples),
+        mean_seconds=(sum(sorted_samples) / len(sorted_samples)),
+        max_seconds=sorted_samples[-1],
+        p50_seconds=p50,
+        p95_seconds=p95,
+        p99_seconds=p99,
+        histogram=[
+            LatencyBucket(le=bound, count=count)
+            for bound, count in zip(
+                (*LATENCY_BUCKET_SECONDS, None), bucket_counts, strict=True
+            )
+        ],
+    )
+
+
+def get_h3a_version() -> str:
+    # Running from a source tree that isn't installed leaves no metadata.
+    try:
+        return version("h3a")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def get_host_report() -> HostReport:
+    return HostReport(
+        name=platform.node(),
+        platform=platform.platform(),
+        python=platform.python_version(),
+        cpu_count=os.cpu_count(),
+    )
+
+
+class Profiler:
+    # Phases are timed by the main thread. Their CPU time is that of the
+    # whole process, so it includes the workers of the phase.
+    start_wall: float
+    start_cpu: float
+    phases: dict[str, PhaseReport]
+    # Counters and latencies are recorded by each thread on its own,
+    # like the execution progress, so that workers never wait for
+    # each other.
+    thread_counters: PerThread[Counter[str]]
+    thread_latencies: PerThread[dict[str, array[float]]]
+
+    def __init__(self) -> None:
+        self.start_wall = perf_counter()
+        self.start_cpu = process_time()
+        self.phases = {}
+        self.thread_counters = PerThread(Counter)
+        self.thread_latencies = PerThread(dict)
+
+    def add_phase_time(
+        self, name: str, wall_seconds: float, cpu_seconds: float
+    ) -> None:
+        phase = self.phases.setdefault(
+            name, PhaseReport(calls=0, wall_seconds=0.0, cpu_seconds=0.0)
+        )
+        phase["calls"] += 1
+        phase["wall_seconds"] += wall_seconds
+        phase["cpu_seconds"] += cpu_seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start_wall = perf_counter()
+        start_cpu = process_time()
+        try:
+            yield
+        finally:
+            self.add_phase_time(
+                name, perf_counter() - start_wall, process_time() - start_cpu
+            )
+
+    def iter_timed[T](self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        # Only the time spent producing items is counted, which is done
+        # in the consuming thread, so its CPU time is that thread's.
+        # (Lazy phases like scanning are interleaved with their consumers.)
+        iterator = iter(iterable)
+        wall_seconds = 0.0
+        cpu_seconds = 0.0
+        try:
+            while True:
+                start_wall = perf_counter()
+                start_cpu = thread_time()
+                try:
+                    item = next(iterator)
+                finally:
+                    wall_seconds += perf_counter() - start_wall
+                    cpu_seconds += thread_time() - start_cpu
+                yield item
+        except StopIteration:
+            return
+        finally:
+            self.add_phase_time(name, wall_seconds, cpu_seconds)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.thread_counters.get()[name] += n
+
+    def add_latency(self, name: str, seconds: float) -> None:
+        latencies = self.thread_latencies.get()
+        samples = latencies.get(name)
+        if samples is None:
+            samples = latencies[name] = array("d")
+        samples.append(seconds)
+
+    def get_report(self, *, threads: int) -> ProfileReport:
+        counters = Counter[str]()
+        for thread_counters in self.thread_counters.get_all():
+            counters.update(thread_counters)
+        samples_by_name: dict[str, list[float]] = {}
+        for thread_latencies in self.thread_latencies.get_all():
+            for name, samples in thread_latencies.items():
+                samples_by_name.setdefault(name, []).extend(samples)
+        return ProfileReport(
+            report_version=PROFILE_REPORT_VERSION,
+            h3a_version=get_h3a_version(),
+            host=get_host_report(),
+            threads=threads,
+            wall_seconds=(perf_counter() - self.start_wall),
+            cpu_seconds=(process_time() - self.start_cpu),
+            phases=dict(self.phases),
+            counters=dict(sorted(counters.items())),
+            latencies={
+                name: summarize_latencies(samples)
+                for name, samples in sorted(samples_by_name.items())
+            },
+        )
+
+
+def write_profile_report(path: Path, report: ProfileReport) -> None:
+    # Keys are kept in order and indented, so that reports of different
+    # releases and hosts can be diffed.
+    path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
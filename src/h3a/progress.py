@@ -0,0 +1,148 @@
+from collections.abc import Callable
+from threading import Lock, local
+from typing import Final, NamedTuple
+
+# The progress bar is redrawn, and progress is logged, at fixed rates
+# instead of on every finished item.
+PROGRESS_REFRESH_SECONDS: Final = 0.5
+PROGRESS_LOG_SECONDS: Final = 5.0
+# The weight of the latest sample in the smoothed throughput.
+PROGRESS_SMOOTHING: Final = 0.3
+BYTE_UNITS: Final = ("B", "KiB", "MiB", "GiB", "TiB", "PiB")
+
+
+class PerThread[T]:
+    # Each thread updates its own value, so that workers never wait for
+    # each other. Readers go through all the values, which may be slightly
+    # behind while the workers are running.
+    factory: Callable[[], T]
+    lock: Lock
+    local: local
+    values: list[T]
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        self.factory = factory
+        self.lock = Lock()
+        self.local = local()
+        self.values = []
+
+    def get(self) -> T:
+        try:
+            value: T = self.local.value
+        except AttributeError:
+            value = self.local.value = self.factory()
+            # The lock is only taken once per thread.
+            with self.lock:
+                self.values.append(value)
+        return value
+
+    def get_all(self) -> list[T]:
+        with self.lock:
+            return list(self.values)
+
+
+class ProgressSnapshot(NamedTuple):
+    items: int
+    total_items: int | None
+    bytes: int
+    total_bytes: int | None
+    elapsed_seconds: float
+    bytes_per_second: float
+    eta_seconds: float | None
+
+
+def format_bytes(size: float) -> str:
+    for unit in BYTE_UNITS[:-1]:
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} {BYTE_UNITS[-1]}"
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours > 0:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def format_progress(snapshot: ProgressSnapshot) -> str:
+    items_text = f"{snapshot.items}"
+    if snapshot.total_items is not None:
+        items_text += f"/{snapshot.total_items}"
+    bytes_text = format_bytes(snapshot.bytes)
+    if snapshot.total_bytes is not None:
+        bytes_text += f"/{format_bytes(snapshot.total_bytes)}"
+    progress_text = (
+        f"{items_text} item(s), {bytes_text},"
+        f" {format_bytes(snapshot.bytes_per_second)}/s"
+    )
+    if snapshot.eta_seconds is not None:
+        progress_text += f", ETA {format_duration(snapshot.eta_seconds)}"
+    return progress_text
+
+
+class ProgressMeter:
+    total_items: int | None
+    total_bytes: int | None
+    start_time: float
+    last_time: float
+    last_bytes: int
+    bytes_per_second: float | None
+
+    def __init__(
+        self, total_items: int | None, total_bytes: int | None, *, start_time: float
+    ) -> None:
+        self.total_items = total_items
+        self.total_bytes = total_bytes
+        self.start_time = start_time
+        self.last_time = start_time
+        self.last_bytes = 0
+        self.bytes_per_second = None
+
+    def get_eta(self, items: int, size: int, elapsed_seconds: float) -> float | None:
+        # Bytes predict the remaining time better than items do,
+        # unless there are no bytes to go by.
+        if self.total_bytes and self.bytes_per_second:
+            return max(self.total_bytes - size, 0) / self.bytes_per_second
+        if self.total_items and items > 0:
+            return elapsed_seconds * max(self.total_items - items, 0) / items
+        return None
+
+    def update(self, now: float, items: int, size: int) -> ProgressSnapshot:
+        # The throughput is smoothed over updates, so that it follows
+        # changes in speed without jumping on every large file.
+        if now > self.last_time:
+            sample = (size - self.last_bytes) / (now - self.last_time)
+            if self.bytes_per_second is None:
+                self.bytes_per_second = sample
+            else:
+                self.bytes_per_second += PROGRESS_SMOOTHING * (
+                    sample - self.bytes_per_second
+                )
+            self.last_time = now
+            self.last_bytes = size
+        elapsed_seconds = now - self.start_time
+        return ProgressSnapshot(
+            items=items,
+            total_items=self.total_items,
+            bytes=size,
+            total_bytes=self.total_bytes,
+            elapsed_seconds=elapsed_seconds,
+            bytes_per_second=(self.bytes_per_second or 0.0),
+            eta_seconds=self.get_eta(items, size, elapsed_seconds),
+        )
+
+    def finish(self, now: float, items: int, size: int) -> ProgressSnapshot:
+        # The final throughput is the average over the whole run.
+        elapsed_seconds = now - self.start_time
+        return ProgressSnapshot(
+            items=items,
+            total_items=self.total_items,
+            bytes=size,
+            total_bytes=self.total_bytes,
+            elapsed_seconds=elapsed_seconds,
+            bytes_per_second=(size / elapsed_seconds if elapsed_seconds > 0 else 0.0),
+            eta_seconds=None,
+        )
@@ -0,0 +1,114 @@
+import json
+import os
+from collections.abc import Iterable, Iterator
+from logging import getLogger
+from pathlib import Path
+from time import time
+from typing import NamedTuple
+
+from .catalog import VersionCatalog, sort_versions
+from .config import Config, parse_duration
+from .plan import PlanItem
+from .scan import Scanner
+
+logger = getLogger(__name__)
+
+
+class PruneItem(NamedTuple):
+    id: int
+    path: Path
+
+
+def format_prune_item(prune_item: PruneItem) -> str:
+    return f"({prune_item.id}) {prune_item.path} -> (deleted)"
+
+
+def format_prune_item_json(prune_item: PruneItem) -> str:
+    return json.dumps(
+        {"id": prune_item.id, "delete": str(prune_item.path)}, ensure_ascii=False
+    )
+
+
+def iter_prune_plan(
+    *,
+    config: Config,
+    root_dir: Path,
+    plan: Iterable[PlanItem],
+    catalog: VersionCatalog | None = None,
+    first_id: int = 1,
+    now: float | None = None,
+) -> Iterator[PruneItem]:
+    # Versions are grouped per source from the catalog, so the output tree
+    # is listed at most once. Versions of the plan count as the latest ones
+    # and are never deleted, and neither is the latest existing version.
+    keep_last = config["keep_last"]
+    keep_within = parse_duration(config["keep_within"])
+    if keep_last <= 0 and keep_within is None:
+        return
+    if catalog is None:
+        catalog = VersionCatalog(None, config=config, root_dir=root_dir)
+        catalog.refresh()
+    min_mtime: float | None = None
+    if keep_within is not None:
+        min_mtime = (time() if now is None else now) - keep_within
+
+    planned_tags: dict[tuple[str, str], set[str]] = {}
+    for plan_item in plan:
+        parsed_name = catalog.parse_name(plan_item.dest.name)
+        if parsed_name is not None:
+            name, tag = parsed_name
+            dir_key = catalog.get_dir_key(plan_item.dest.parent)
+            planned_tags.setdefault((dir_key, name), set()).add(tag)
+
+    scanner = Scanner(config["include"], config["exclude"])
+    prune_item_count = 0
+    for dir_key in sorted(catalog.dirs):
+        versions = catalog.dirs[dir_key].versions
+        for name in sorted(versions):
+            # Versions of sources that are no longer included (or that were
+            # never sources, such as files of an output dir that overlaps the
+            # sources) are left alone.
+            src_path = os.path.normpath(os.path.join(dir_key, name))
+            if not scanner.matches(src_path) and not scanner.matches(
+                os.path.join(root_dir, src_path)
+            ):
+                continue
+            kept_tags = planned_tags.get((dir_key, name), set())
+            tags = [tag for tag in versions[name] if tag not in kept_tags]
+            keep_count = max(max(keep_last, 1) - len(kept_tags), 0)
+            if keep_count >= len(tags):
+                continue
+            version_paths = sort_versions(
+                ((tag, catalog.get_version_path(dir_key, name, tag)) for tag in tags),
+                tag_format=config["tag_format"],
+            )
+            for version_path in version_paths[: len(version_paths) - keep_count]:
+                if min_mtime is not None:
+                    try:
+                        if version_path.stat().st_mtime >= min_mtime:
+                            continue
+                    except FileNotFoundError:
+                        continue
+                prune_item_count += 1
+                yield PruneItem(id=(first_id + prune_item_count - 1), path=version_path)
+
+
+def generate_prune_plan(
+    *,
+    config: Config,
+    root_dir: Path,
+    plan: Iterable[PlanItem],
+    catalog: VersionCatalog | None = None,
+    first_id: int = 1,
+    now: float | None = None,
+) -> list[PruneItem]:
+    return list(
+        iter_prune_plan(
+            config=config,
+            root_dir=root_dir,
+            plan=plan,
+            catalog=catalog,
+            first_id=first_id,
+            now=now,
+        )
+    )
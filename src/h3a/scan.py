@@ -0,0 +1,308 @@
+import os
+import re
+import stat
+from collections.abc import Iterable, Iterator
+from fnmatch import translate
+from pathlib import Path
+from typing import NamedTuple
+
+MAGIC_PATTERN = re.compile(r"[*?[]")
+SEPARATOR_PATTERN = re.compile(
+    "[" + re.escape(os.sep + (os.altsep if os.altsep else "")) + "]+"
+)
+REGEX_FLAGS = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+
+
+def is_hidden(name: str) -> bool:
+    return name.startswith(".")
+
+
+class PatternComponent(NamedTuple):
+    text: str
+    recursive: bool
+    literal: bool
+    regex: str
+
+
+def compile_component(text: str) -> PatternComponent:
+    if text == "**":
+        # Like `glob`, recursive wildcards skip hidden entries.
+        return PatternComponent(
+            text=text, recursive=True, literal=False, regex=r"(?!\.)(?s:.*)\Z"
+        )
+    if not MAGIC_PATTERN.search(text):
+        return PatternComponent(
+            text=text, recursive=False, literal=True, regex=re.escape(text) + r"\Z"
+        )
+    regex = translate(text)
+    if not is_hidden(text):
+        # Like `glob`, wildcards don't match hidden entries
+        # unless the pattern component starts with a dot.
+        regex = r"(?!\.)" + regex
+    return PatternComponent(text=text, recursive=False, literal=False, regex=regex)
+
+
+class ExcludeMatcher:
+    regex: re.Pattern[str] | None
+    prune_regex: re.Pattern[str] | None
+
+    def __init__(self, exclude: Iterable[str]) -> None:
+        # Same semantics as `fnmatch(path, pattern)`, compiled into one regex.
+        patterns = [os.path.normcase(pattern) for pattern in exclude]
+        self.regex = (
+            re.compile("|".join(translate(pattern) for pattern in patterns))
+            if patterns
+            else None
+        )
+
+        # Since `*` in `fnmatch` also matches separators, a pattern ending
+        # with `*` that matches `dir/` matches every path under `dir/`.
+        prunable_patterns = [pattern for pattern in patterns if pattern.endswith("*")]
+        self.prune_regex = (
+            re.compile("|".join(translate(pattern) for pattern in prunable_patterns))
+            if prunable_patterns
+            else None
+        )
+
+    def matches(self, path: str) -> bool:
+        return self.regex is not None and (
+            self.regex.match(os.path.normcase(path)) is not None
+        )
+
+    def covers_dir(self, dir_path: str) -> bool:
+        return self.prune_regex is not None and (
+            self.prune_regex.match(os.path.normcase(dir_path + os.sep)) is not None
+        )
+
+
+class ScannedFile(NamedTuple):
+    path: str
+    # The stat result of a probed file, or the directory entry of a listed
+    # one, whose `stat()` is cached, so that planning doesn't stat it again.
+    stat_source: os.stat_result | os.DirEntry[str]
+
+    def stat(self) -> os.stat_result:
+        if isinstance(self.stat_source, os.stat_result):
+            return self.stat_source
+        return self.stat_source.stat()
+
+
+# A scan state is a position in one of the include patterns:
+# (pattern index, component index).
+type ScanState = tuple[int, int]
+
+
+class ScanNode:
+    states: frozenset[ScanState]
+    file_regex: re.Pattern[str] | None
+    component_regexes: tuple[tuple[ScanState, re.Pattern[str]], ...]
+    literal_names: tuple[str, ...] | None
+
+    def __init__(
+        self, states: frozenset[ScanState], patterns: list[list[PatternComponent]]
+    ) -> None:
+        self.states = states
+
+        file_regexes: list[str] = []
+        component_regexes: list[tuple[ScanState, re.Pattern[str]]] = []
+        for pattern_index, component_index in sorted(states):
+            pattern = patterns[pattern_index]
+            component = pattern[component_index]
+            if component_index == len(pattern) - 1:
+                file_regexes.append(f"(?:{component.regex})")
+            component_regexes.append(
+                (
+                    (pattern_index, component_index),
+                    re.compile(component.regex, REGEX_FLAGS),
+                )
+            )
+        self.file_regex = (
+            re.compile("|".join(file_regexes), REGEX_FLAGS) if file_regexes else None
+        )
+        self.component_regexes = tuple(component_regexes)
+
+        # Directories in which only literal components are expected
+        # are probed directly instead of being listed.
+        self.literal_names = None
+        if all(patterns[i][j].literal for i, j in states):
+            self.literal_names = tuple(sorted({patterns[i][j].text for i, j in states}))
+
+
+class Scanner:
+    patterns: list[list[PatternComponent]]
+    roots: dict[str, frozenset[ScanState]]
+    nodes: dict[frozenset[ScanState], ScanNode]
+    exclude: ExcludeMatcher
+    # The numbers of directories listed and of paths probed so far.
+    listing_count: int
+    stat_count: int
+
+    def __init__(self, include: Iterable[str], exclude: Iterable[str] = ()) -> None:
+        self.patterns = []
+        self.exclude = ExcludeMatcher(exclude)
+        self.nodes = {}
+        self.listing_count = 0
+        self.stat_count = 0
+        root_states: dict[str, set[ScanState]] = {}
+
+        for include_pattern in include:
+            drive, rest = os.path.splitdrive(include_pattern)
+            relative = rest.lstrip(os.sep + (os.altsep if os.altsep else ""))
+            anchor = drive + rest[: len(rest) - len(relative)]
+            texts = SEPARATOR_PATTERN.split(relative)
+            if texts[-1] in ("", os.curdir, os.pardir):
+                # Patterns ending with a separator only match directories.
+                continue
+            # Directory listings never contain `.` or `..`, so `.` is dropped
+            # and a literal prefix up to the last `..` goes to the anchor.
+            texts = [text for text in texts if text != os.curdir]
+            if os.pardir in texts:
+                pardir_index = len(texts) - 1 - texts[::-1].index(os.pardir)
+                if not any(MAGIC_PATTERN.search(text) for text in texts[:pardir_index]):
+                    anchor += os.sep.join(texts[: pardir_index + 1]) + os.sep
+                    texts = texts[pardir_index + 1 :]
+            pattern_index = len(self.patterns)
+            self.patterns.append([compile_component(text) for text in texts])
+            root_states.setdefault(anchor, set()).add((pattern_index, 0))
+
+        self.roots = {
+            anchor: self.expand(states) for anchor, states in root_states.items()
+        }
+
+    def expand(self, states: Iterable[ScanState]) -> frozenset[ScanState]:
+        # Recursive components may also match zero path components.
+        expanded = set[ScanState]()
+        for pattern_index, component_index in states:
+            pattern = self.patterns[pattern_index]
+            while component_index < len(pattern):
+                expanded.add((pattern_index, component_index))
+                if not pattern[component_index].recursive:
+                    break
+                component_index += 1
+        return frozenset(expanded)
+
+    def get_node(self, states: frozenset[ScanState]) -> ScanNode:
+        node = self.nodes.get(states)
+        if node is None:
+            node = self.nodes[states] = ScanNode(states, self.patterns)
+        return node
+
+    def enter(self, node: ScanNode, name: str) -> frozenset[ScanState]:
+        next_states = set[ScanState]()
+        for state, regex in node.component_regexes:
+            if regex.match(name) is None:
+                continue
+            pattern_index, component_index = state
+            if self.patterns[pattern_index][component_index].recursive:
+                next_states.add(state)
+            elif component_index < len(self.patterns[pattern_index]) - 1:
+                next_states.add((pattern_index, component_index + 1))
+        return self.expand(next_states)
+
+    def matches(self, path: str) -> bool:
+        # Whether a file path, in the form of scanned paths, would be
+        # scanned if it existed, without touching the filesystem.
+        for anchor, states in self.roots.items():
+            if not path.startswith(anchor) or (not anchor and os.path.isabs(path)):
+                continue
+            names = SEPARATOR_PATTERN.split(path[len(anchor) :])
+            relative_dir = anchor
+            for name in names[:-1]:
+                relative_dir = os.path.join(relative_dir, name)
+                states = self.enter(self.get_node(states), name)
+                if not states or self.exclude.covers_dir(relative_dir):
+                    break
+            else:
+                file_regex = self.get_node(states).file_regex
+                if (
+                    file_regex is not None
+                    and file_regex.match(names[-1])
+                    and not self.exclude.matches(path)
+                ):
+                    return True
+        return False
+
+    def scan(self, root_dir: Path) -> Iterator[str]:
+        # Paths are yielded in the same form as `glob(..., root_dir=root_dir)`.
+        for scanned_file in self.scan_files(root_dir):
+            yield scanned_file.path
+
+    def scan_files(self, root_dir: Path) -> Iterator[ScannedFile]:
+        if len(self.roots) == 1:
+            for anchor, states in self.roots.items():
+                yield from self.walk(os.path.join(root_dir, anchor), anchor, states)
+            return
+
+        # Paths under different anchors may be the same file, like an
+        # absolute path and the equivalent relative one.
+        seen_paths = set[str]()
+        for anchor, states in self.roots.items():
+            for scanned_file in self.walk(
+                os.path.join(root_dir, anchor), anchor, states
+            ):
+                normalized_path = os.path.normpath(
+                    os.path.join(root_dir, scanned_file.path)
+                )
+                if normalized_path not in seen_paths:
+                    seen_paths.add(normalized_path)
+                    yield scanned_file
+
+    def walk(
+        self, dir_path: str, relative_dir: str, states: frozenset[ScanState]
+    ) -> Iterator[ScannedFile]:
+        node = self.get_node(states)
+
+        if node.literal_names is not None:
+            for name in node.literal_names:
+                self.stat_count += 1
+                try:
+                    file_stat = os.stat(os.path.join(dir_path, name))
+                except (OSError, ValueError):
+                    continue
+                mode = file_stat.st_mode
+                relative_path = os.path.join(relative_dir, name)
+                if stat.S_ISDIR(mode):
+                    child_states = self.enter(node, name)
+                    if child_states and not self.exclude.covers_dir(relative_path):
+                        yield from self.walk(
+                            os.path.join(dir_path, name), relative_path, child_states
+                        )
+                elif stat.S_ISREG(mode):
+                    if (
+                        node.file_regex is not None
+                        and node.file_regex.match(name)
+                        and not self.exclude.matches(relative_path)
+                    ):
+                        yield ScannedFile(path=relative_path, stat_source=file_stat)
+            return
+
+        subdirs: list[tuple[str, str, frozenset[ScanState]]] = []
+        self.listing_count += 1
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            child_states = self.enter(node, entry.name)
+                            if not child_states:
+                                continue
+                            relative_path = os.path.join(relative_dir, entry.name)
+                            if not self.exclude.covers_dir(relative_path):
+                                subdirs.append(
+                                    (entry.path, relative_path, child_states)
+                                )
+                        elif entry.is_file():
+                            if node.file_regex is None or not node.file_regex.match(
+                                entry.name
+                            ):
+                                continue
+                            relative_path = os.path.join(relative_dir, entry.name)
+                            if not self.exclude.matches(relative_path):
+                                yield ScannedFile(path=relative_path, stat_source=entry)
+                    except OSError:  # pragma: no cover
+                        pass
+        except OSError:
+            return
+
+        for child_path, relative_path, child_states in subdirs:
+            yield from self.walk(child_path, relative_path, child_states)
@@ -0,0 +1,193 @@
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+from pathlib import Path
+from typing import NamedTuple, assert_never
+
+from .config import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_BATCH_THRESHOLD,
+    DEFAULT_EXECUTE_ORDER,
+    ExecuteOrderType,
+)
+from .plan import PlanItem
+
+
+class SizedPlanItem(NamedTuple):
+    plan_item: PlanItem
+    size: int
+    inode: int
+    device: int
+
+
+class PlanSizes(NamedTuple):
+    # The sizes, inodes and devices of the sources of a whole plan, by
+    # position, so that a plan sized beforehand isn't statted again.
+    sizes: array[int]
+    inodes: array[int]
+    devices: array[int]
+
+
+class ExecuteUnit(NamedTuple):
+    plan_items: list[PlanItem]
+    size: int
+    devices: tuple[int, ...] = ()
+
+
+def needs_inodes(order: ExecuteOrderType, *, with_devices: bool) -> bool:
+    return with_devices or order in ("locality", "packed")
+
+
+def iter_sized_plan_items(
+    plan: Iterable[PlanItem],
+    *,
+    stat_sources: bool,
+    with_inodes: bool = True,
+    plan_sizes: PlanSizes | None = None,
+) -> Iterator[SizedPlanItem]:
+    # Sizes from the scan are reused unless inodes and devices are needed.
+    for index, plan_item in enumerate(plan):
+        if plan_sizes is not None:
+            yield SizedPlanItem(
+                plan_item=plan_item,
+                size=plan_sizes.sizes[index],
+                inode=plan_sizes.inodes[index],
+                device=plan_sizes.devices[index],
+            )
+            continue
+        if not stat_sources:
+            yield SizedPlanItem(plan_item=plan_item, size=0, inode=0, device=0)
+            continue
+        if not with_inodes and plan_item.src_size is not None:
+            yield SizedPlanItem(
+                plan_item=plan_item, size=plan_item.src_size, inode=0, device=0
+            )
+            continue
+        try:
+            src_stat = plan_item.src.stat()
+        except OSError:
+            # Missing sources are reported on execution.
+            yield SizedPlanItem(plan_item=plan_item, size=0, inode=0, device=0)
+        else:
+            yield SizedPlanItem(
+                plan_item=plan_item,
+                size=src_stat.st_size,
+                inode=src_stat.st_ino,
+                device=src_stat.st_dev,
+            )
+
+
+def get_existing_device(path: Path, device_cache: dict[Path, int]) -> int:
+    # Dest files (and maybe their directories) don't exist yet,
+    # so the device of the nearest existing ancestor is used.
+    missing_dirs: list[Path] = []
+    for parent_dir in path.parents:
+        device = device_cache.get(parent_dir)
+        if device is None:
+            try:
+                device = parent_dir.stat().st_dev
+            except OSError:
+                missing_dirs.append(parent_dir)
+                continue
+            device_cache[parent_dir] = device
+        for missing_dir in missing_dirs:
+            device_cache[missing_dir] = device
+        return device
+    return 0  # pragma: no cover
+
+
+def resolve_device_threads(
+    device_threads_by_path: Mapping[str, int], *, root_dir: Path
+) -> dict[int, int]:
+    device_threads: dict[int, int] = {}
+    for path, threads in device_threads_by_path.items():
+        try:
+            device = (root_dir / path).stat().st_dev
+        except OSError as error:
+            raise RuntimeError(f"Failed to find the device of: {path}") from error
+        device_threads[device] = threads
+    return device_threads
+
+
+def get_size_key(sized_plan_item: SizedPlanItem) -> int:
+    return -sized_plan_item.size
+
+
+def get_locality_key(sized_plan_item: SizedPlanItem) -> tuple[str, int]:
+    # Files in the same directory are read together, in inode order,
+    # which usually follows their on-disk layout.
+    return (str(sized_plan_item.plan_item.src.parent), sized_plan_item.inode)
+
+
+def order_plan_items(
+    sized_plan_items: Iterable[SizedPlanItem],
+    *,
+    order: ExecuteOrderType,
+    batch_threshold: int,
+) -> Iterable[SizedPlanItem]:
+    match order:
+        case "plan":
+            return sized_plan_items
+        case "largest-first":
+            return sorted(sized_plan_items, key=get_size_key)
+        case "locality":
+            return sorted(sized_plan_items, key=get_locality_key)
+        case "packed":
+            large_items: list[SizedPlanItem] = []
+            small_items: list[SizedPlanItem] = []
+            for sized_plan_item in sized_plan_items:
+                if sized_plan_item.size > batch_threshold:
+                    large_items.append(sized_plan_item)
+                else:
+                    small_items.append(sized_plan_item)
+            large_items.sort(key=get_size_key)
+            small_items.sort(key=get_locality_key)
+            return large_items + small_items
+        case _:  # pragma: no cover
+            assert_never(order)
+
+
+def iter_execute_units(
+    plan: Iterable[PlanItem],
+    *,
+    order: ExecuteOrderType = DEFAULT_EXECUTE_ORDER,
+    batch_threshold: int = DEFAULT_BATCH_THRESHOLD,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    stat_sources: bool = False,
+    with_devices: bool = False,
+    plan_sizes: PlanSizes | None = None,
+) -> Iterator[ExecuteUnit]:
+    # Consecutive small files on the same devices are batched into one unit
+    # to save the overhead of scheduling them one by one.
+    batching = batch_threshold > 0 and batch_size > 1
+    sized_plan_items = order_plan_items(
+        iter_sized_plan_items(
+            plan,
+            stat_sources=(stat_sources or with_devices or batching or order != "plan"),
+            with_inodes=needs_inodes(order, with_devices=with_devices),
+            plan_sizes=plan_sizes,
+        ),
+        order=order,
+        batch_threshold=batch_threshold,
+    )
+    device_cache: dict[Path, int] = {}
+
+    batch: list[PlanItem] = []
+    batch_bytes = 0
+    batch_devices: tuple[int, ...] = ()
+    for plan_item, size, _, src_device in sized_plan_items:
+        devices: tuple[int, ...] = ()
+        if with_devices:
+            dest_device = get_existing_device(plan_item.dest, device_cache)
+            devices = tuple(sorted({src_device, dest_device}))
+        if batch and (devices != batch_devices or len(batch) >= batch_size):
+            yield ExecuteUnit(plan_items=batch, size=batch_bytes, devices=batch_devices)
+            batch = []
+            batch_bytes = 0
+        if not batching or size > batch_threshold:
+            yield ExecuteUnit(plan_items=[plan_item], size=size, devices=devices)
+            continue
+        batch.append(plan_item)
+        batch_bytes += size
+        batch_devices = devices
+    if batch:
+        yield ExecuteUnit(plan_items=batch, size=batch_bytes, devices=batch_devices)
@@ -0,0 +1,412 @@
+import errno
+import os
+from collections.abc import Iterable
+from logging import getLogger
+from pathlib import Path
+from shutil import copystat
+from threading import Lock, local
+from typing import Final, Literal, NamedTuple, assert_never
+
+from .config import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CHUNK_THRESHOLD,
+    DEFAULT_COPY_BLOCK_SIZE,
+    CopyModeType,
+)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = getLogger(__name__)
+
+type TransferStrategyType = Literal["copy", "reflink", "hardlink"]
+type CopyEngineType = Literal["copy_file_range", "sendfile", "buffered"]
+
+COPY_ENGINES: Final[tuple[CopyEngineType, ...]] = (
+    "copy_file_range",
+    "sendfile",
+    "buffered",
+)
+
+# From <linux/fs.h>: _IOW(0x94, 9, int)
+FICLONE: Final = 0x40049409
+
+# Errors meaning that the filesystem (or platform) can't do the operation.
+UNSUPPORTED_ERRNOS: Final = frozenset(
+    {
+        errno.EOPNOTSUPP,
+        errno.ENOTSUP,
+        errno.ENOTTY,
+        errno.ENOSYS,
+        errno.EINVAL,
+        errno.EXDEV,
+        errno.EPERM,
+        errno.EMLINK,
+        errno.ENOTSOCK,
+    }
+)
+
+
+class TransferResult(NamedTuple):
+    strategy: TransferStrategyType
+    bytes_copied: int
+
+
+def get_temp_path(dest: Path) -> Path:
+    return dest.with_name(f".{dest.name}.h3a-tmp")
+
+
+def copy_range_with_copy_file_range(
+    src_fd: int, dest_fd: int, offset: int, length: int | None, block_size: int
+) -> int | None:
+    if not hasattr(os, "copy_file_range"):  # pragma: no cover
+        return None
+
+    copied = 0
+    while length is None or copied < length:
+        count = block_size if length is None else min(block_size, length - copied)
+        try:
+            n_bytes = os.copy_file_range(
+                src_fd, dest_fd, count, offset + copied, offset + copied
+            )
+        except OSError as error:
+            if copied == 0 and error.errno in UNSUPPORTED_ERRNOS:
+                return None
+            raise  # pragma: no cover
+        if n_bytes == 0:
+            # Some filesystems silently copy nothing instead of failing.
+            if copied == 0 and os.fstat(src_fd).st_size > offset:
+                return None
+            break
+        copied += n_bytes
+    return copied
+
+
+def copy_range_with_sendfile(
+    src_fd: int, dest_fd: int, offset: int, length: int | None, block_size: int
+) -> int | None:
+    if not hasattr(os, "sendfile"):  # pragma: no cover
+        return None
+
+    os.lseek(dest_fd, offset, os.SEEK_SET)
+    copied = 0
+    while length is None or copied < length:
+        count = block_size if length is None else min(block_size, length - copied)
+        try:
+            n_bytes = os.sendfile(dest_fd, src_fd, offset + copied, count)
+        except OSError as error:
+            if copied == 0 and error.errno in UNSUPPORTED_ERRNOS:
+                return None
+            raise  # pragma: no cover
+        if n_bytes == 0:
+            break
+        copied += n_bytes
+    return copied
+
+
+buffer_storage = local()
+
+
+def get_buffer(block_size: int) -> memoryview:
+    # Buffers are reused per thread to avoid reallocating them per file.
+    buffer: memoryview | None = getattr(buffer_storage, "buffer", None)
+    if buffer is None or len(buffer) != block_size:
+        buffer = buffer_storage.buffer = memoryview(bytearray(block_size))
+    return buffer
+
+
+def copy_range_with_buffer(
+    src_fd: int, dest_fd: int, offset: int, length: int | None, block_size: int
+) -> int:
+    buffer = get_buffer(block_size)
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    os.lseek(dest_fd, offset, os.SEEK_SET)
+    copied = 0
+    with open(src_fd, "rb", buffering=0, closefd=False) as src_file:
+        while length is None or copied < length:
+            count = block_size if length is None else min(block_size, length - copied)
+            n_bytes = src_file.readinto(buffer[:count])
+            if not n_bytes:
+                break
+            written = 0
+            while written < n_bytes:
+                written += os.write(dest_fd, buffer[written:n_bytes])
+            copied += n_bytes
+    return copied
+
+
+def copy_data(
+    src_fd: int,
+    dest_fd: int,
+    *,
+    offset: int = 0,
+    length: int | None = None,
+    block_size: int = DEFAULT_COPY_BLOCK_SIZE,
+    engines: Iterable[CopyEngineType] = COPY_ENGINES,
+) -> int:
+    # Engines are tried in order; one is skipped only if it can't copy
+    # anything at all, so no data is copied twice.
+    for engine in engines:
+        copied: int | None
+        match engine:
+            case "copy_file_range":
+                copied = copy_range_with_copy_file_range(
+                    src_fd, dest_fd, offset, length, block_size
+                )
+            case "sendfile":
+                copied = copy_range_with_sendfile(
+                    src_fd, dest_fd, offset, length, block_size
+                )
+            case "buffered":
+                copied = copy_range_with_buffer(
+                    src_fd, dest_fd, offset, length, block_size
+                )
+            case _:  # pragma: no cover
+                assert_never(engine)
+        if copied is not None:
+            return copied
+        logger.debug("Copy engine unavailable, trying the next one: %s", engine)
+    raise RuntimeError("No copy engine available.")
+
+
+def copy_file(
+    src: Path,
+    dest: Path,
+    *,
+    block_size: int = DEFAULT_COPY_BLOCK_SIZE,
+    engines: Iterable[CopyEngineType] = COPY_ENGINES,
+) -> int:
+    # Data is copied into a temporary file which replaces the dest at last,
+    # so dest files are never left half-written and existing dest files
+    # (possibly hardlinks) are replaced instead of being written through.
+    temp_path = get_temp_path(dest)
+    replaced = False
+    try:
+        with src.open("rb") as src_file, temp_path.open("wb") as temp_file:
+            copied = copy_data(
+                src_file.fileno(),
+                temp_file.fileno(),
+                block_size=block_size,
+                engines=engines,
+            )
+        copystat(src, temp_path)
+        os.replace(temp_path, dest)
+        replaced = True
+    finally:
+        if not replaced:
+            temp_path.unlink(missing_ok=True)
+    return copied
+
+
+class ChunkedCopy:
+    src: Path
+    dest: Path
+    temp_path: Path
+    size: int
+    chunks: list[tuple[int, int]]
+    block_size: int
+    engines: tuple[CopyEngineType, ...]
+    lock: Lock
+    pending: int
+    failed: bool
+    bytes_copied: int
+
+    def __init__(
+        self,
+        src: Path,
+        dest: Path,
+        *,
+        size: int,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        block_size: int = DEFAULT_COPY_BLOCK_SIZE,
+        engines: Iterable[CopyEngineType] = COPY_ENGINES,
+    ) -> None:
+        self.src = src
+        self.dest = dest
+        self.temp_path = get_temp_path(dest)
+        self.size = size
+        self.chunks = [
+            (offset, min(chunk_size, size - offset))
+            for offset in range(0, size, chunk_size)
+        ]
+        self.block_size = block_size
+        self.engines = tuple(engines)
+        self.lock = Lock()
+        self.pending = len(self.chunks)
+        self.failed = False
+        self.bytes_copied = 0
+
+        # The temporary file is allocated up front
+        # so that chunks can be written in any order.
+        with self.temp_path.open("wb") as temp_file:
+            temp_file.truncate(size)
+
+    def copy_chunk(self, offset: int, length: int) -> TransferResult | None:
+        # Whichever chunk finishes last finalizes (or discards) the file,
+        # so None is returned for all the other chunks.
+        succeeded = False
+        try:
+            if not self.failed:
+                # Each chunk uses its own file descriptors
+                # because some engines move the file offsets.
+                with (
+                    self.src.open("rb") as src_file,
+                    self.temp_path.open("r+b") as temp_file,
+                ):
+                    copied = copy_data(
+                        src_file.fileno(),
+                        temp_file.fileno(),
+                        offset=offset,
+                        length=length,
+                        block_size=self.block_size,
+                        engines=self.engines,
+                    )
+                if copied != length:
+                    raise RuntimeError(f"Source file changed while copying: {self.src}")
+                succeeded = True
+        finally:
+            with self.lock:
+                self.pending -= 1
+                self.failed |= not succeeded
+                if succeeded:
+                    self.bytes_copied += length
+                is_last = self.pending == 0
+            if is_last and self.failed:
+                self.temp_path.unlink(missing_ok=True)
+
+        if not is_last or self.failed:
+            return None
+
+        try:
+            copystat(self.src, self.temp_path)
+            os.replace(self.temp_path, self.dest)
+        except BaseException:  # pragma: no cover
+            self.temp_path.unlink(missing_ok=True)
+            raise
+        return TransferResult(strategy="copy", bytes_copied=self.bytes_copied)
+
+    def discard(self) -> None:
+        # For chunks cancelled before they ran.
+        with self.lock:
+            if self.pending > 0:
+                self.pending = 0
+                self.failed = True
+                self.temp_path.unlink(missing_ok=True)
+
+
+def reflink_file(src: Path, dest: Path) -> bool:
+    if fcntl is None:  # pragma: no cover
+        return False
+
+    # Clone into a temporary file so that a failed clone
+    # never truncates an existing dest file.
+    temp_path = get_temp_path(dest)
+    replaced = False
+    try:
+        with src.open("rb") as src_file, temp_path.open("wb") as temp_file:
+            try:
+                fcntl.ioctl(temp_file.fileno(), FICLONE, src_file.fileno())
+            except OSError as error:
+                if error.errno in UNSUPPORTED_ERRNOS:
+                    return False
+                raise  # pragma: no cover
+        copystat(src, temp_path)
+        os.replace(temp_path, dest)
+        replaced = True
+    finally:
+        if not replaced:
+            temp_path.unlink(missing_ok=True)
+
+    return True
+
+
+def hardlink_file(src: Path, dest: Path) -> bool:
+    # Replacing a link with a link to the same file does nothing, which
+    # would leave the temp link behind, so such dests are left as they are.
+    try:
+        if os.path.samefile(src, dest):
+            return True
+    except FileNotFoundError:
+        pass
+
+    # A temp link left by an interrupted run would make the link fail.
+    temp_path = get_temp_path(dest)
+    temp_path.unlink(missing_ok=True)
+    try:
+        os.link(src, temp_path)
+    except OSError as error:
+        if error.errno in UNSUPPORTED_ERRNOS:
+            return False
+        raise
+
+    try:
+        os.replace(temp_path, dest)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+    return True
+
+
+def transfer_file(
+    src: Path,
+    dest: Path,
+    *,
+    copy_mode: CopyModeType,
+    block_size: int = DEFAULT_COPY_BLOCK_SIZE,
+) -> TransferResult:
+    match copy_mode:
+        case "copy":
+            return TransferResult(
+                strategy="copy",
+                bytes_copied=copy_file(src, dest, block_size=block_size),
+            )
+        case "reflink":
+            if not reflink_file(src, dest):
+                raise RuntimeError(f"Failed to reflink: {src} -> {dest}")
+            return TransferResult(strategy="reflink", bytes_copied=0)
+        case "reflink-or-copy":
+            if reflink_file(src, dest):
+                return TransferResult(strategy="reflink", bytes_copied=0)
+            logger.debug("Reflink unsupported, falling back to copy: %s", src)
+            return TransferResult(
+                strategy="copy",
+                bytes_copied=copy_file(src, dest, block_size=block_size),
+            )
+        case "hardlink":
+            if not hardlink_file(src, dest):
+                raise RuntimeError(f"Failed to hardlink: {src} -> {dest}")
+            return TransferResult(strategy="hardlink", bytes_copied=0)
+        case _:  # pragma: no cover
+            assert_never(copy_mode)
+
+
+def start_transfer(
+    src: Path,
+    dest: Path,
+    *,
+    copy_mode: CopyModeType,
+    block_size: int = DEFAULT_COPY_BLOCK_SIZE,
+    chunk_threshold: int = DEFAULT_CHUNK_THRESHOLD,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> TransferResult | ChunkedCopy:
+    # Large files to be copied are returned as chunks for several workers
+    # to copy concurrently; everything else is transferred right away.
+    if chunk_threshold <= 0 or chunk_size <= 0 or copy_mode in ("reflink", "hardlink"):
+        return transfer_file(src, dest, copy_mode=copy_mode, block_size=block_size)
+
+    if copy_mode == "reflink-or-copy":
+        if reflink_file(src, dest):
+            return TransferResult(strategy="reflink", bytes_copied=0)
+        logger.debug("Reflink unsupported, falling back to copy: %s", src)
+
+    size = os.stat(src).st_size
+    if size > chunk_threshold and size > chunk_size:
+        return ChunkedCopy(
+            src, dest, size=size, chunk_size=chunk_size, block_size=block_size
+        )
+    return TransferResult(
+        strategy="copy",
+        bytes_copied=copy_file(src, dest, block_size=block_size),
+    )
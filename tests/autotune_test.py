@@ -0,0 +1,148 @@
+from collections.abc import Callable
+from contextlib import chdir
+from pathlib import Path
+
+from pytest import LogCaptureFixture
+
+
+def simulate_tuner(
+    threads: int, get_throughput: Callable[[int], tuple[float, float]]
+) -> list[int]:
+    from h3a.autotune import ThreadTuner
+
+    tuner = ThreadTuner(threads, max_threads=64, interval_seconds=1.0)
+    history = [tuner.threads]
+    now = 0.0
+    bytes_done = 0.0
+    files_done = 0.0
+    tuner.update(now, 0, 0)
+    while not tuner.settled:
+        bytes_per_second, files_per_second = get_throughput(tuner.threads)
+        # Samples shorter than the interval are ignored.
+        tuner.update(now + 0.5, int(bytes_done), int(files_done))
+        now += 1.0
+        bytes_done += bytes_per_second
+        files_done += files_per_second
+        tuner.update(now, int(bytes_done), int(files_done))
+        history.append(tuner.threads)
+        assert len(history) < 20
+    return history
+
+
+def test_autotune_tuner() -> None:
+    from h3a.autotune import ThreadTuner, Throughput, is_better_throughput
+
+    # -- Throughput comparison --
+    assert is_better_throughput(Throughput(200, 10), Throughput(100, 10))
+    assert is_better_throughput(Throughput(100, 20), Throughput(100, 10))
+    assert not is_better_throughput(Throughput(105, 10), Throughput(100, 10))
+    assert not is_better_throughput(Throughput(200, 5), Throughput(100, 10))
+    assert is_better_throughput(Throughput(100, 10), Throughput(0, 0)) is False
+
+    # -- Growing to the best point --
+    assert simulate_tuner(4, lambda threads: (min(threads, 16) * 1e6, 0)) == [
+        4,
+        8,
+        16,
+        32,
+        8,
+        16,
+    ]
+
+    # -- Shrinking to the best point --
+    assert simulate_tuner(4, lambda threads: (0, 100 / threads)) == [4, 8, 2, 1, 1]
+
+    # -- Bounded thread counts --
+    assert simulate_tuner(64, lambda threads: (0, threads)) == [64, 32, 64]
+    assert simulate_tuner(1, lambda threads: (0, 100 / threads)) == [1, 2, 1]
+
+    # -- Settled tuners ignore later samples --
+    tuner = ThreadTuner(1, max_threads=1)
+    tuner.update(0.0, 0, 0)
+    tuner.update(1.0, 100, 1)
+    assert tuner.settled
+    tuner.update(2.0, 100, 1)
+    assert tuner.threads == 1
+
+
+def test_autotune_file(tmp_path: Path, caplog: LogCaptureFixture) -> None:
+    from h3a.autotune import load_tuned_threads, save_tuned_threads
+
+    # -- Missing files --
+    assert load_tuned_threads(tmp_path / "threads.json") is None
+
+    # -- Saved threads --
+    save_tuned_threads(tmp_path / "threads.json", 16)
+    assert load_tuned_threads(tmp_path / "threads.json") == 16
+    assert set(path.name for path in tmp_path.iterdir()) == {"threads.json"}
+
+    # -- Corrupt files --
+    for text in ["{", "[]", '{"threads": "8"}', '{"threads": 0}']:
+        (tmp_path / "threads.json").write_text(text)
+        caplog.clear()
+        assert load_tuned_threads(tmp_path / "threads.json") is None
+        assert "Tuned threads file is corrupt, ignoring it: " in caplog.text
+
+
+def test_autotune_cli(tmp_path: Path) -> None:
+    from click.testing import CliRunner
+
+    from h3a.autotune import AUTOTUNE_INITIAL_THREADS, load_tuned_threads
+    from h3a.cli import CliResult, main
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n"
+        "  - foo.txt\n"
+        "out_dir: archive\n"
+        "tag_time_source: now\n"
+        "on_conflict: overwrite\n"
+        "threads: auto\n"
+        "tuned_threads_file: threads.json\n"
+    )
+
+    # -- Tuned threads are saved --
+    cli_runner = CliRunner()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert isinstance(cli_result.return_value, CliResult)
+    assert cli_result.return_value.context.autotune
+    assert cli_result.return_value.context.threads == AUTOTUNE_INITIAL_THREADS
+    assert load_tuned_threads(tmp_path / "threads.json") == AUTOTUNE_INITIAL_THREADS
+
+    # -- Tuned threads are loaded --
+    (tmp_path / "threads.json").write_text('{"threads": 2}')
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y", "--verbose"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert isinstance(cli_result.return_value, CliResult)
+    assert cli_result.return_value.context.threads == 2
+    assert "Tuned threads: 2" in cli_result.output
+
+    # -- Fixed threads from the command line --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y", "-t", "3"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert isinstance(cli_result.return_value, CliResult)
+    assert not cli_result.return_value.context.autotune
+    assert cli_result.return_value.context.threads == 3
+
+    # -- Auto threads from the command line --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["-y", "-t", "auto"], standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    assert isinstance(cli_result.return_value, CliResult)
+    assert cli_result.return_value.context.autotune
+
+    # -- Invalid threads --
+    for threads in ["0", "foo"]:
+        with chdir(tmp_path):
+            cli_result = cli_runner.invoke(main, ["-y", "-t", threads])
+        assert cli_result.exit_code == 2
+        assert f"{threads!r} is not a positive integer or 'auto'." in (
+            cli_result.output
+        )
@@ -0,0 +1,243 @@
+import json
+from contextlib import chdir
+from pathlib import Path
+
+from click.testing import CliRunner
+from pytest import LogCaptureFixture, MonkeyPatch
+
+
+def test_catalog_index(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    import os
+
+    from h3a import catalog as catalog_module
+    from h3a.catalog import load_catalog
+    from h3a.config import load_config
+
+    # -- Initialize test files --
+    out_dir = tmp_path / "archive"
+    (out_dir / "baz").mkdir(parents=True)
+    (out_dir / "foo_v2.txt").write_text("foo 2")
+    (out_dir / "foo_v1.txt").write_text("foo 1")
+    # Tags that don't parse with the tag format are ordered by mtime.
+    os.utime(out_dir / "foo_v1.txt", (0, 0))
+    (out_dir / "foo.txt").write_text("untagged")
+    (out_dir / "baz/blah_v1.txt").write_text("blah")
+    (out_dir / "baz/link").symlink_to(out_dir, target_is_directory=True)
+    config = load_config(
+        "include:\n  - '*.txt'\nout_dir: archive\ntag_pattern: _v\\d\n"
+        "catalog: catalog.json\n"
+    )
+    catalog_path = tmp_path / "catalog.json"
+
+    # -- Versions are indexed by source path --
+    catalog = load_catalog(catalog_path, config=config, root_dir=tmp_path)
+    assert set(catalog.dirs.keys()) == {".", "baz"}
+    assert catalog.parse_name("foo_v1.txt") == ("foo.txt", "_v1")
+    assert catalog.parse_name("foo.txt") is None
+    assert catalog.get_versions("foo.txt") == ["_v1", "_v2"]
+    assert catalog.get_versions(os.path.join("baz", "blah.txt")) == ["_v1"]
+    assert catalog.get_versions(os.path.join("missing", "blah.txt")) == []
+    assert catalog.exists(out_dir / "foo_v1.txt")
+    assert not catalog.exists(out_dir / "foo_v3.txt")
+    assert not catalog.exists(out_dir / "foo.txt")
+    assert not catalog.exists(out_dir / "missing/foo_v1.txt")
+    assert catalog.find_latest(out_dir, tmp_path / "foo.txt") == out_dir / "foo_v2.txt"
+    assert catalog.find_latest(out_dir, tmp_path / "bar.txt") is None
+    assert catalog.find_latest(out_dir / "missing", tmp_path / "foo.txt") is None
+    assert catalog.index_dir("missing", 0).versions == {}
+
+    # -- Added versions are indexed without listing --
+    catalog.add(out_dir / "foo_v3.txt")
+    catalog.add(out_dir / "foo_v3.txt")
+    catalog.add(out_dir / "foo.txt")
+    catalog.add(out_dir / "new/deep/bar_v1.txt")
+    assert catalog.get_versions("foo.txt") == ["_v1", "_v2", "_v3"]
+    assert catalog.dirs["."].subdirs == {"baz", "new"}
+    assert catalog.dirs["new"].subdirs == {"deep"}
+    assert catalog.exists(out_dir / "new/deep/bar_v1.txt")
+
+    # -- Removed versions are dropped from the index --
+    catalog.add(out_dir / "new/qux_v1.txt")
+    catalog.remove(out_dir / "new/qux_v1.txt")
+    catalog.remove(out_dir / "new/qux_v1.txt")
+    catalog.remove(out_dir / "qux.txt")
+    catalog.remove(out_dir / "missing/qux_v1.txt")
+    assert catalog.dirs["new"].versions == {}
+    assert "missing" not in catalog.dirs
+
+    # -- Saved catalogs only relist changed directories --
+    (out_dir / "foo_v3.txt").write_text("foo 3")
+    (out_dir / "new/deep").mkdir(parents=True)
+    (out_dir / "new/deep/bar_v1.txt").write_text("bar")
+    catalog.save()
+    assert not catalog_path.with_name("catalog.json.tmp").exists()
+
+    listed_paths: list[Path] = []
+    original_scandir = os.scandir
+
+    def counting_scandir(path: Path) -> "os._ScandirIterator[str]":
+        listed_paths.append(path)
+        return original_scandir(path)
+
+    monkeypatch.setattr(catalog_module.os, "scandir", counting_scandir)
+    catalog = load_catalog(catalog_path, config=config, root_dir=tmp_path)
+    assert listed_paths == []
+    assert catalog.get_versions("foo.txt") == ["_v1", "_v2", "_v3"]
+
+    (out_dir / "baz/blah_v2.txt").write_text("blah 2")
+    catalog = load_catalog(catalog_path, config=config, root_dir=tmp_path)
+    assert listed_paths == [out_dir / "baz"]
+    assert catalog.get_versions(os.path.join("baz", "blah.txt")) == ["_v1", "_v2"]
+
+    # -- Removed directories are dropped --
+    (out_dir / "new/deep/bar_v1.txt").unlink()
+    (out_dir / "new/deep").rmdir()
+    catalog = load_catalog(catalog_path, config=config, root_dir=tmp_path)
+    assert "new/deep" not in catalog.dirs
+    catalog.add(out_dir / "gone/bar_v1.txt")
+    catalog.save()
+    catalog = load_catalog(catalog_path, config=config, root_dir=tmp_path)
+    assert "gone" not in catalog.dirs
+
+
+def test_catalog_fallback(tmp_path: Path, caplog: LogCaptureFixture) -> None:
+    from h3a.catalog import CATALOG_VERSION, get_catalog_fingerprint, load_catalog
+    from h3a.config import load_config
+
+    # -- Initialize test files --
+    (tmp_path / "archive").mkdir()
+    (tmp_path / "archive/foo_v1.txt").write_text("foo")
+    config = load_config(
+        "include:\n  - '*.txt'\nout_dir: archive\ntag_pattern: _v\\d\n"
+    )
+    catalog_path = tmp_path / "catalog.json"
+    fingerprint = get_catalog_fingerprint(config, tmp_path)
+    # A mismatched mtime makes a valid catalog relist the directory.
+    valid_dirs = {".": [0, [], {"bar.txt": ["_v1"]}]}
+
+    # -- Missing catalogs are indexed --
+    with caplog.at_level("INFO"):
+        catalog = load_catalog(catalog_path, config=config, root_dir=tmp_path)
+    assert f"Catalog not found, indexing the output directory: {catalog_path}" in (
+        caplog.text
+    )
+    assert catalog.get_versions("foo.txt") == ["_v1"]
+
+    # -- Invalid catalogs are ignored --
+    for catalog_text, message in [
+        ("{", "Catalog is corrupt"),
+        ("[]", "Catalog is corrupt"),
+        (
+            json.dumps(
+                {"version": CATALOG_VERSION, "fingerprint": fingerprint, "dirs": 0}
+            ),
+            "Catalog is corrupt",
+        ),
+        (
+            json.dumps(
+                {
+                    "version": CATALOG_VERSION + 1,
+                    "fingerprint": fingerprint,
+                    "dirs": valid_dirs,
+                }
+            ),
+            "Catalog version mismatch",
+        ),
+        (
+            json.dumps(
+                {
+                    "version": CATALOG_VERSION,
+                    "fingerprint": get_catalog_fingerprint(config, tmp_path / "other"),
+                    "dirs": valid_dirs,
+                }
+            ),
+            "Catalog is stale",
+        ),
+    ]:
+        catalog_path.write_text(catalog_text)
+        caplog.clear()
+        catalog = load_catalog(catalog_path, config=config, root_dir=tmp_path)
+        catalog.load()
+        assert catalog.dirs == {}
+        assert f"{message}, reindexing: {catalog_path}" in caplog.text
+
+    # -- Valid catalog is loaded --
+    catalog_path.write_text(
+        json.dumps(
+            {"version": CATALOG_VERSION, "fingerprint": fingerprint, "dirs": valid_dirs}
+        )
+    )
+    catalog = load_catalog(catalog_path, config=config, root_dir=tmp_path)
+    catalog.load()
+    assert catalog.get_versions("bar.txt") == ["_v1"]
+
+    # -- Missing output directories are empty --
+    catalog = load_catalog(
+        catalog_path,
+        config=load_config("include:\n  - '*.txt'\nout_dir: missing\n"),
+        root_dir=tmp_path,
+    )
+    assert catalog.dirs == {}
+
+
+def test_catalog_cli(tmp_path: Path) -> None:
+    from h3a.catalog import load_catalog
+    from h3a.cli import CliResult, main
+    from h3a.config import load_config
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "baz").mkdir()
+    (tmp_path / "baz/blah.txt").write_text("blah")
+    config_text = (
+        "include:\n"
+        "  - '**/*.txt'\n"
+        "out_dir: archive\n"
+        "tag_format: _v1\n"
+        "tag_pattern: _v\\d\n"
+        "skip_identical: true\n"
+        "manifest: manifest.json\n"
+        "catalog: catalog.json\n"
+    )
+    (tmp_path / "h3a.yaml").write_text(config_text)
+    config = load_config(config_text)
+
+    # -- Dry run doesn't write the catalog --
+    cli_runner = CliRunner()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["--dry-run"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert not (tmp_path / "catalog.json").exists()
+
+    # -- Executed items are added to the catalog --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    catalog = load_catalog(tmp_path / "catalog.json", config=config, root_dir=tmp_path)
+    assert catalog.exists(tmp_path / "archive/foo_v1.txt")
+    assert catalog.exists(tmp_path / "archive/baz/blah_v1.txt")
+
+    # -- Identical files are skipped using the catalog --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    cli_return_value: object = cli_result.return_value
+    assert isinstance(cli_return_value, CliResult)
+    assert len(cli_return_value.plan) == 0
+
+    # -- Conflicts are detected using the catalog --
+    (tmp_path / "foo.txt").write_text("foo foo")
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y"], standalone_mode=False)
+    assert isinstance(cli_result.exception, RuntimeError)
+    assert "Destination file exists" in str(cli_result.exception)
+
+    # -- Streamed items are added to the catalog --
+    (tmp_path / "h3a.yaml").write_text(
+        config_text.replace("tag_format: _v1", "tag_format: _v2")
+    )
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y", "--stream"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    catalog = load_catalog(tmp_path / "catalog.json", config=config, root_dir=tmp_path)
+    assert catalog.get_versions("foo.txt") == ["_v1", "_v2"]
@@ -17,16 +17,27 @@ def test_cli_help() -> None:
         "  A simple script for file archiving.\n"
         "\n"
         "Options:\n"
-        "  -c, --config FILE            Path to config file.  [default: h3a.yaml]\n"
-        "  -e, --encoding TEXT          Encoding of the config file.  [default: utf-8]\n"
-        "  --help-config                Show config schema and exit.\n"
-        "  -y, --skip-confirm           Skip confirmation prompt.\n"
-        "  -t, --threads INTEGER RANGE  Number of threads to use.  [x>=1]\n"
-        "  --dry-run                    Print plan and exit.\n"
-        "  --verbose                    Enable info-level logging.\n"
-        "  --debug                      Enable debug-level logging.\n"
-        "  --version                    Show the version and exit.\n"
-        "  --help                       Show this message and exit.\n"
+        "  -c, --config FILE           Path to config file.  [default: h3a.yaml]\n"
+        "  -e, --encoding TEXT         Encoding of the config file.  [default: utf-8]\n"
+        "  --help-config               Show config schema and exit.\n"
+        "  -y, --skip-confirm          Skip confirmation prompt.\n"
+        "  -t, --threads THREADS       Number of threads to use, or 'auto'.\n"
+        "  --dry-run                   Print plan and exit.\n"
+        "  --stream                    Execute plan items while planning (requires -y).\n"
+        "  --plan-out FILE             Write the generated plan to a file.\n"
+        "  --plan-in FILE              Execute a plan file instead of generating a\n"
+        "                              plan.\n"
+        "  --plan-format [text|jsonl]  Format of the printed plan.  [default: text]\n"
+        "  --plan-summary              Print counts and sizes per dest directory\n"
+        "                              instead of every plan item.\n"
+        "  --profile FILE              Write a JSON report of phase timings, item\n"
+        "                              latencies and counters.\n"
+        "  --metrics FILE              Write run metrics to a file in Prometheus\n"
+        "                              textfile format.\n"
+        "  --verbose                   Enable info-level logging.\n"
+        "  --debug                     Enable debug-level logging.\n"
+        "  --version                   Show the version and exit.\n"
+        "  --help                      Show this message and exit.\n"
     )
 
 
@@ -47,15 +58,60 @@ def test_cli_help_config() -> None:
         "    A regex pattern to match existing dest tags. (default: '_v\\\\d{8}-\\\\d{6}')\n"
         "on_conflict (typing.Literal['error', 'skip', 'overwrite'], optional):\n"
         "    The action of existing dest files. (default: 'error')\n"
-        "threads (int, optional):\n"
-        "    The number of maximum threads to use. (default: 8)\n"
+        "threads (typing.Union[int, typing.Literal['auto']], optional):\n"
+        "    The number of maximum threads to use, or 'auto' to tune it while executing. (default: 8)\n"
+        "tuned_threads_file (str, optional):\n"
+        "    The path of an optional file to keep the tuned threads in for later runs.\n"
+        "manifest (str, optional):\n"
+        "    The path of an optional scan manifest for incremental runs.\n"
+        "catalog (str, optional):\n"
+        "    The path of an optional catalog of the versions in the output directory.\n"
+        "keep_last (int, optional):\n"
+        "    The number of latest versions to keep per source file; older ones are deleted. (0 for unlimited; default: 0)\n"
+        "keep_within (str, optional):\n"
+        "    A duration like '30d' within which versions are kept by their mtime; older ones are deleted. (units: s, m, h, d, w; default: '' for unlimited)\n"
+        "skip_identical (bool, optional):\n"
+        "    Whether to skip files identical to their latest versions. (requires manifest, which keeps their digests) (default: False)\n"
+        "copy_mode (typing.Literal['copy', 'reflink', 'reflink-or-copy', 'hardlink'], optional):\n"
+        "    The way to create dest files. (default: 'copy')\n"
+        "copy_block_size (int, optional):\n"
+        "    The number of bytes to copy per system call. (default: 8388608)\n"
+        "chunk_threshold (int, optional):\n"
+        "    The size above which files are copied in parallel chunks. (0 to disable; default: 268435456)\n"
+        "chunk_size (int, optional):\n"
+        "    The number of bytes per chunk of a chunked copy. (default: 67108864)\n"
+        "max_in_flight (int, optional):\n"
+        "    The maximum number of plan items executed at once. (0 for 4 times the threads; default: 0)\n"
+        "max_in_flight_bytes (int, optional):\n"
+        "    The maximum total size of plan items executed at once. (0 for unlimited; default: 0)\n"
+        "execute_order (typing.Literal['plan', 'largest-first', 'locality', 'packed'], optional):\n"
+        "    The order to execute plan items in. (default: 'plan')\n"
+        "batch_threshold (int, optional):\n"
+        "    The size up to which files are executed in batches. (0 to disable; default: 65536)\n"
+        "batch_size (int, optional):\n"
+        "    The maximum number of files per batch. (default: 16)\n"
+        "device_threads (int, optional):\n"
+        "    The maximum number of tasks running at once per device. (0 for unlimited; default: 0)\n"
+        "device_threads_by_path (dict[str, int], optional):\n"
+        "    A mapping from paths to the device_threads of their devices. (default: {})\n"
     )
 
 
 def test_cli_simple(tmp_path: Path) -> None:
     from h3a.cli import CliResult, main
     from h3a.config import (
+        DEFAULT_BATCH_SIZE,
+        DEFAULT_BATCH_THRESHOLD,
+        DEFAULT_CHUNK_SIZE,
+        DEFAULT_CHUNK_THRESHOLD,
+        DEFAULT_COPY_BLOCK_SIZE,
+        DEFAULT_COPY_MODE,
+        DEFAULT_DEVICE_THREADS,
+        DEFAULT_EXECUTE_ORDER,
+        DEFAULT_MAX_IN_FLIGHT,
+        DEFAULT_MAX_IN_FLIGHT_BYTES,
         DEFAULT_ON_CONFLICT,
+        DEFAULT_SKIP_IDENTICAL,
         DEFAULT_TAG_FORMAT,
         DEFAULT_TAG_PATTERN,
         DEFAULT_TAG_TIME_SOURCE,
@@ -92,6 +148,23 @@ def test_cli_simple(tmp_path: Path) -> None:
         tag_pattern=DEFAULT_TAG_PATTERN,
         on_conflict=DEFAULT_ON_CONFLICT,
         threads=DEFAULT_THREADS,
+        tuned_threads_file="",
+        manifest="",
+        catalog="",
+        keep_last=0,
+        keep_within="",
+        skip_identical=DEFAULT_SKIP_IDENTICAL,
+        copy_mode=DEFAULT_COPY_MODE,
+        copy_block_size=DEFAULT_COPY_BLOCK_SIZE,
+        chunk_threshold=DEFAULT_CHUNK_THRESHOLD,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        max_in_flight_bytes=DEFAULT_MAX_IN_FLIGHT_BYTES,
+        execute_order=DEFAULT_EXECUTE_ORDER,
+        batch_threshold=DEFAULT_BATCH_THRESHOLD,
+        batch_size=DEFAULT_BATCH_SIZE,
+        device_threads=DEFAULT_DEVICE_THREADS,
+        device_threads_by_path={},
     )
 
     # -- Assert context --
@@ -132,6 +205,17 @@ def test_cli_simple(tmp_path: Path) -> None:
 def test_cli_empty(tmp_path: Path) -> None:
     from h3a.cli import CliResult, main
     from h3a.config import (
+        DEFAULT_BATCH_SIZE,
+        DEFAULT_BATCH_THRESHOLD,
+        DEFAULT_CHUNK_SIZE,
+        DEFAULT_CHUNK_THRESHOLD,
+        DEFAULT_COPY_BLOCK_SIZE,
+        DEFAULT_COPY_MODE,
+        DEFAULT_DEVICE_THREADS,
+        DEFAULT_EXECUTE_ORDER,
+        DEFAULT_MAX_IN_FLIGHT,
+        DEFAULT_MAX_IN_FLIGHT_BYTES,
+        DEFAULT_SKIP_IDENTICAL,
         DEFAULT_TAG_TIME_SOURCE,
         DEFAULT_THREADS,
         Config,
@@ -169,6 +253,23 @@ def test_cli_empty(tmp_path: Path) -> None:
         tag_pattern=r"\.backup",
         on_conflict="skip",
         threads=DEFAULT_THREADS,
+        tuned_threads_file="",
+        manifest="",
+        catalog="",
+        keep_last=0,
+        keep_within="",
+        skip_identical=DEFAULT_SKIP_IDENTICAL,
+        copy_mode=DEFAULT_COPY_MODE,
+        copy_block_size=DEFAULT_COPY_BLOCK_SIZE,
+        chunk_threshold=DEFAULT_CHUNK_THRESHOLD,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        max_in_flight_bytes=DEFAULT_MAX_IN_FLIGHT_BYTES,
+        execute_order=DEFAULT_EXECUTE_ORDER,
+        batch_threshold=DEFAULT_BATCH_THRESHOLD,
+        batch_size=DEFAULT_BATCH_SIZE,
+        device_threads=DEFAULT_DEVICE_THREADS,
+        device_threads_by_path={},
     )
 
     # -- Assert context --
@@ -245,6 +346,23 @@ def test_cli_complex(tmp_path: Path) -> None:
         tag_pattern=r"\.backup",
         on_conflict="overwrite",
         threads=1,
+        tuned_threads_file="",
+        manifest="",
+        catalog="",
+        keep_last=0,
+        keep_within="",
+        skip_identical=False,
+        copy_mode="copy",
+        copy_block_size=(8 * 1024 * 1024),
+        chunk_threshold=(256 * 1024 * 1024),
+        chunk_size=(64 * 1024 * 1024),
+        max_in_flight=0,
+        max_in_flight_bytes=0,
+        execute_order="plan",
+        batch_threshold=(64 * 1024),
+        batch_size=16,
+        device_threads=0,
+        device_threads_by_path={},
     )
 
     # -- Assert context --
@@ -282,25 +400,36 @@ def test_cli_complex(tmp_path: Path) -> None:
     ]
     n_expected_begin_lines = len(expected_begin_lines)
     actual_lines = cli_result.output.splitlines()
-    assert len(actual_lines) == n_expected_begin_lines + 3
+    assert len(actual_lines) == n_expected_begin_lines + 5
     assert actual_lines[:n_expected_begin_lines] == expected_begin_lines
     actions = (
         ("Overwrote", "Created") if plan[0].overwrite_flag else ("Created", "Overwrote")
     )
     assert re.fullmatch(
         TIMESTAMP_PATTERN
-        + re.escape(f" INFO (h3a.execute) {actions[0]}: {plan[0].dest} (50.00%)"),
+        + re.escape(f" INFO (h3a.execute) {actions[0]}: {plan[0].dest}"),
         actual_lines[n_expected_begin_lines],
     )
     assert re.fullmatch(
         TIMESTAMP_PATTERN
-        + re.escape(f" INFO (h3a.execute) {actions[1]}: {plan[1].dest} (100.00%)"),
+        + re.escape(f" INFO (h3a.execute) {actions[1]}: {plan[1].dest}"),
         actual_lines[n_expected_begin_lines + 1],
     )
     assert re.fullmatch(
-        TIMESTAMP_PATTERN + re.escape(" INFO (h3a.execute) All done."),
+        TIMESTAMP_PATTERN
+        + re.escape(" INFO (h3a.execute) Transfer strategies: copy=2"),
         actual_lines[n_expected_begin_lines + 2],
     )
+    assert re.fullmatch(
+        TIMESTAMP_PATTERN
+        + re.escape(" INFO (h3a.execute) Executed: 2/2 item(s), ")
+        + r"(\d+) B/\1 B, [\d.]+ [KMGTP]?i?B/s",
+        actual_lines[n_expected_begin_lines + 3],
+    )
+    assert re.fullmatch(
+        TIMESTAMP_PATTERN + re.escape(" INFO (h3a.execute) All done."),
+        actual_lines[n_expected_begin_lines + 4],
+    )
 
     # -- Assert execution --
     assert set(
@@ -321,7 +450,18 @@ def test_cli_complex(tmp_path: Path) -> None:
 def test_cli_dry_run(tmp_path: Path) -> None:
     from h3a.cli import CliResult, main
     from h3a.config import (
+        DEFAULT_BATCH_SIZE,
+        DEFAULT_BATCH_THRESHOLD,
+        DEFAULT_CHUNK_SIZE,
+        DEFAULT_CHUNK_THRESHOLD,
+        DEFAULT_COPY_BLOCK_SIZE,
+        DEFAULT_COPY_MODE,
+        DEFAULT_DEVICE_THREADS,
+        DEFAULT_EXECUTE_ORDER,
+        DEFAULT_MAX_IN_FLIGHT,
+        DEFAULT_MAX_IN_FLIGHT_BYTES,
         DEFAULT_ON_CONFLICT,
+        DEFAULT_SKIP_IDENTICAL,
         DEFAULT_TAG_FORMAT,
         DEFAULT_TAG_PATTERN,
         DEFAULT_TAG_TIME_SOURCE,
@@ -359,6 +499,23 @@ def test_cli_dry_run(tmp_path: Path) -> None:
         tag_pattern=DEFAULT_TAG_PATTERN,
         on_conflict=DEFAULT_ON_CONFLICT,
         threads=DEFAULT_THREADS,
+        tuned_threads_file="",
+        manifest="",
+        catalog="",
+        keep_last=0,
+        keep_within="",
+        skip_identical=DEFAULT_SKIP_IDENTICAL,
+        copy_mode=DEFAULT_COPY_MODE,
+        copy_block_size=DEFAULT_COPY_BLOCK_SIZE,
+        chunk_threshold=DEFAULT_CHUNK_THRESHOLD,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        max_in_flight_bytes=DEFAULT_MAX_IN_FLIGHT_BYTES,
+        execute_order=DEFAULT_EXECUTE_ORDER,
+        batch_threshold=DEFAULT_BATCH_THRESHOLD,
+        batch_size=DEFAULT_BATCH_SIZE,
+        device_threads=DEFAULT_DEVICE_THREADS,
+        device_threads_by_path={},
     )
 
     # -- Assert context --
@@ -389,6 +546,71 @@ def test_cli_dry_run(tmp_path: Path) -> None:
     }
 
 
+def test_cli_stream(tmp_path: Path) -> None:
+    from h3a.cli import CliResult, main
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "baz").mkdir()
+    (tmp_path / "baz/blah.txt").write_text("blah")
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n"
+        "  - '**/*.txt'\n"
+        "out_dir: archive\n"
+        "tag_format: _v1\n"
+        "tag_pattern: _v1\n"
+        "on_conflict: error\n"
+    )
+
+    # -- Stream requires skipping confirmation --
+    cli_runner = CliRunner()
+    for args in [["--stream"], ["--stream", "-y", "--dry-run"]]:
+        with chdir(tmp_path):
+            cli_result = cli_runner.invoke(main, args)
+        assert cli_result.exit_code == 2
+        assert "--stream requires --skip-confirm" in cli_result.output
+
+    # -- Plan items are executed while streamed --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["--stream", "-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert isinstance(cli_result.return_value, CliResult)
+    assert len(cli_result.return_value.plan) == 2
+    assert "Executed a streamed plan of 2 item(s)." in cli_result.output
+    assert (tmp_path / "archive/foo_v1.txt").read_text() == "foo"
+    assert (tmp_path / "archive/baz/blah_v1.txt").read_text() == "blah"
+
+    # -- Conflicts are still checked before execution --
+    (tmp_path / "archive/foo_v1.txt").write_text("old")
+    (tmp_path / "archive/baz/blah_v1.txt").unlink()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["--stream", "-y"], standalone_mode=False)
+    assert isinstance(cli_result.exception, RuntimeError)
+    assert "Destination file exists: " in str(cli_result.exception)
+    assert (tmp_path / "archive/foo_v1.txt").read_text() == "old"
+
+    # -- Streamed plans are executed in plan order --
+    (tmp_path / "archive/foo_v1.txt").unlink()
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n  - foo.txt\nout_dir: archive\ntag_format: _v1\n"
+        "tag_pattern: _v1\nexecute_order: largest-first\n"
+    )
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["--stream", "-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert "Ignoring execute_order 'largest-first' with --stream." in cli_result.output
+    assert (tmp_path / "archive/foo_v1.txt").read_text() == "foo"
+
+    # -- Empty streamed plans --
+    (tmp_path / "h3a.yaml").write_text("include:\n  - missing.txt\n")
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["--stream", "-y", "--verbose"], standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    assert "An empty plan was generated. Nothing to do." in cli_result.output
+
+
 def test_cli_subprocess(tmp_path_factory: TempPathFactory) -> None:
     # -- Initialize test files --
     file_dir = tmp_path_factory.mktemp("file_dir")
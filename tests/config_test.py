@@ -19,14 +19,59 @@ def test_config_help() -> None:
         "    A regex pattern to match existing dest tags. (default: '_v\\\\d{8}-\\\\d{6}')\n"
         "on_conflict (typing.Literal['error', 'skip', 'overwrite'], optional):\n"
         "    The action of existing dest files. (default: 'error')\n"
-        "threads (int, optional):\n"
-        "    The number of maximum threads to use. (default: 8)\n"
+        "threads (typing.Union[int, typing.Literal['auto']], optional):\n"
+        "    The number of maximum threads to use, or 'auto' to tune it while executing. (default: 8)\n"
+        "tuned_threads_file (str, optional):\n"
+        "    The path of an optional file to keep the tuned threads in for later runs.\n"
+        "manifest (str, optional):\n"
+        "    The path of an optional scan manifest for incremental runs.\n"
+        "catalog (str, optional):\n"
+        "    The path of an optional catalog of the versions in the output directory.\n"
+        "keep_last (int, optional):\n"
+        "    The number of latest versions to keep per source file; older ones are deleted. (0 for unlimited; default: 0)\n"
+        "keep_within (str, optional):\n"
+        "    A duration like '30d' within which versions are kept by their mtime; older ones are deleted. (units: s, m, h, d, w; default: '' for unlimited)\n"
+        "skip_identical (bool, optional):\n"
+        "    Whether to skip files identical to their latest versions. (requires manifest, which keeps their digests) (default: False)\n"
+        "copy_mode (typing.Literal['copy', 'reflink', 'reflink-or-copy', 'hardlink'], optional):\n"
+        "    The way to create dest files. (default: 'copy')\n"
+        "copy_block_size (int, optional):\n"
+        "    The number of bytes to copy per system call. (default: 8388608)\n"
+        "chunk_threshold (int, optional):\n"
+        "    The size above which files are copied in parallel chunks. (0 to disable; default: 268435456)\n"
+        "chunk_size (int, optional):\n"
+        "    The number of bytes per chunk of a chunked copy. (default: 67108864)\n"
+        "max_in_flight (int, optional):\n"
+        "    The maximum number of plan items executed at once. (0 for 4 times the threads; default: 0)\n"
+        "max_in_flight_bytes (int, optional):\n"
+        "    The maximum total size of plan items executed at once. (0 for unlimited; default: 0)\n"
+        "execute_order (typing.Literal['plan', 'largest-first', 'locality', 'packed'], optional):\n"
+        "    The order to execute plan items in. (default: 'plan')\n"
+        "batch_threshold (int, optional):\n"
+        "    The size up to which files are executed in batches. (0 to disable; default: 65536)\n"
+        "batch_size (int, optional):\n"
+        "    The maximum number of files per batch. (default: 16)\n"
+        "device_threads (int, optional):\n"
+        "    The maximum number of tasks running at once per device. (0 for unlimited; default: 0)\n"
+        "device_threads_by_path (dict[str, int], optional):\n"
+        "    A mapping from paths to the device_threads of their devices. (default: {})\n"
     )
 
 
 def test_config_simple(tmp_path: Path) -> None:
     from h3a.config import (
+        DEFAULT_BATCH_SIZE,
+        DEFAULT_BATCH_THRESHOLD,
+        DEFAULT_CHUNK_SIZE,
+        DEFAULT_CHUNK_THRESHOLD,
+        DEFAULT_COPY_BLOCK_SIZE,
+        DEFAULT_COPY_MODE,
+        DEFAULT_DEVICE_THREADS,
+        DEFAULT_EXECUTE_ORDER,
+        DEFAULT_MAX_IN_FLIGHT,
+        DEFAULT_MAX_IN_FLIGHT_BYTES,
         DEFAULT_ON_CONFLICT,
+        DEFAULT_SKIP_IDENTICAL,
         DEFAULT_TAG_FORMAT,
         DEFAULT_TAG_PATTERN,
         DEFAULT_TAG_TIME_SOURCE,
@@ -56,6 +101,23 @@ def test_config_simple(tmp_path: Path) -> None:
         tag_pattern=DEFAULT_TAG_PATTERN,
         on_conflict=DEFAULT_ON_CONFLICT,
         threads=DEFAULT_THREADS,
+        tuned_threads_file="",
+        manifest="",
+        catalog="",
+        keep_last=0,
+        keep_within="",
+        skip_identical=DEFAULT_SKIP_IDENTICAL,
+        copy_mode=DEFAULT_COPY_MODE,
+        copy_block_size=DEFAULT_COPY_BLOCK_SIZE,
+        chunk_threshold=DEFAULT_CHUNK_THRESHOLD,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        max_in_flight_bytes=DEFAULT_MAX_IN_FLIGHT_BYTES,
+        execute_order=DEFAULT_EXECUTE_ORDER,
+        batch_threshold=DEFAULT_BATCH_THRESHOLD,
+        batch_size=DEFAULT_BATCH_SIZE,
+        device_threads=DEFAULT_DEVICE_THREADS,
+        device_threads_by_path={},
     )
 
 
@@ -80,6 +142,25 @@ def test_config_complex(tmp_path: Path) -> None:
         "tag_pattern: '_\\d{8}'\n"
         "on_conflict: skip\n"
         "threads: 256\n"
+        "tuned_threads_file: h3a.threads.json\n"
+        "manifest: h3a.manifest.json\n"
+        "catalog: h3a.catalog.json\n"
+        "keep_last: 3\n"
+        "keep_within: 30d\n"
+        "skip_identical: true\n"
+        "copy_mode: hardlink\n"
+        "copy_block_size: 65536\n"
+        "chunk_threshold: 0\n"
+        "chunk_size: 1048576\n"
+        "max_in_flight: 1024\n"
+        "max_in_flight_bytes: 1073741824\n"
+        "execute_order: packed\n"
+        "batch_threshold: 4096\n"
+        "batch_size: 64\n"
+        "device_threads: 2\n"
+        "device_threads_by_path:\n"
+        "  /mnt/nvme: 16\n"
+        "  /mnt/usb: 1\n"
     )
 
     # -- Load config --
@@ -96,4 +177,99 @@ def test_config_complex(tmp_path: Path) -> None:
         tag_pattern=r"_\d{8}",
         on_conflict="skip",
         threads=256,
+        tuned_threads_file="h3a.threads.json",
+        manifest="h3a.manifest.json",
+        catalog="h3a.catalog.json",
+        keep_last=3,
+        keep_within="30d",
+        skip_identical=True,
+        copy_mode="hardlink",
+        copy_block_size=65536,
+        chunk_threshold=0,
+        chunk_size=(1024 * 1024),
+        max_in_flight=1024,
+        max_in_flight_bytes=(1024 * 1024 * 1024),
+        execute_order="packed",
+        batch_threshold=4096,
+        batch_size=64,
+        device_threads=2,
+        device_threads_by_path={"/mnt/nvme": 16, "/mnt/usb": 1},
     )
+
+    # -- Auto threads --
+    config = load_config("include:\n  - foo.txt\nthreads: auto\n")
+    assert config["threads"] == "auto"
+
+
+def test_config_duration() -> None:
+    from pytest import raises
+    from strictyaml import YAMLValidationError
+
+    from h3a.config import load_config, parse_duration
+
+    # -- Durations are parsed into seconds --
+    assert parse_duration("") is None
+    assert parse_duration("90s") == 90
+    assert parse_duration("30d") == 30 * 86400
+    assert parse_duration("2w") == 2 * 604800
+
+    # -- Invalid durations are rejected --
+    with raises(YAMLValidationError):
+        load_config("include:\n  - foo.txt\nkeep_within: 30 days\n")
+
+
+def test_config_sizes() -> None:
+    from pytest import raises
+    from strictyaml import YAMLValidationError
+
+    from h3a.config import load_config
+
+    # -- Sizes that could never make progress are rejected --
+    for key in ["copy_block_size", "chunk_size", "batch_size"]:
+        assert load_config(f"include:\n  - foo.txt\n{key}: 1\n")[key] == 1
+        for value in ["0", "-1"]:
+            with raises(YAMLValidationError, match="integer of at least 1"):
+                load_config(f"include:\n  - foo.txt\n{key}: {value}\n")
+
+    # -- Limits are 0 for automatic or unlimited, or positive --
+    for key in ["max_in_flight", "max_in_flight_bytes"]:
+        assert load_config(f"include:\n  - foo.txt\n{key}: 0\n")[key] == 0
+        with raises(YAMLValidationError, match="integer of at least 0"):
+            load_config(f"include:\n  - foo.txt\n{key}: -1\n")
+
+    # -- Thresholds are 0 to disable, or positive --
+    for key in ["chunk_threshold", "batch_threshold"]:
+        assert load_config(f"include:\n  - foo.txt\n{key}: 0\n")[key] == 0
+        with raises(YAMLValidationError, match="integer of at least 0"):
+            load_config(f"include:\n  - foo.txt\n{key}: -1\n")
+
+    # -- Retention counts are 0 for unlimited, or positive --
+    assert load_config("include:\n  - foo.txt\nkeep_last: 0\n")["keep_last"] == 0
+    with raises(YAMLValidationError, match="integer of at least 0"):
+        load_config("include:\n  - foo.txt\nkeep_last: -3\n")
+
+    # -- Device limits are 0 for unlimited, or positive --
+    config = load_config(
+        "include:\n  - foo.txt\ndevice_threads: 0\ndevice_threads_by_path:\n  foo: 2\n"
+    )
+    assert config["device_threads"] == 0
+    assert config["device_threads_by_path"] == {"foo": 2}
+    with raises(YAMLValidationError, match="integer of at least 0"):
+        load_config("include:\n  - foo.txt\ndevice_threads: -1\n")
+    # (The error of the last alternative, an empty mapping, is reported.)
+    with raises(YAMLValidationError):
+        load_config("include:\n  - foo.txt\ndevice_threads_by_path:\n  foo: -1\n")
+
+
+def test_config_skip_identical() -> None:
+    from pytest import raises
+
+    from h3a.config import load_config
+
+    # -- Digests are kept in the manifest --
+    config = load_config(
+        "include:\n  - foo.txt\nskip_identical: true\nmanifest: manifest.json\n"
+    )
+    assert config["skip_identical"]
+    with raises(RuntimeError, match="skip_identical requires a manifest"):
+        load_config("include:\n  - foo.txt\nskip_identical: true\n")
@@ -1,9 +1,14 @@
+from collections.abc import Callable
+from pathlib import Path
 from typing import TYPE_CHECKING
 
 from pytest import fixture
 
 if TYPE_CHECKING:
     from h3a.context import Context  # pragma: no cover
+    from h3a.plan import Plan  # pragma: no cover
+
+type CreatePlan = Callable[[Path, dict[str, int] | list[int]], "Plan"]
 
 
 @fixture
@@ -18,3 +23,30 @@ def test_context() -> "Context":
         debug=True,
         threads=1,
     )
+
+
+@fixture
+def create_plan() -> CreatePlan:
+    from h3a.plan import PlanItem
+
+    # Source files are created under `root_dir` with the given sizes, and
+    # named by their indexes if only sizes are given.
+    def create(root_dir: Path, files: dict[str, int] | list[int]) -> "Plan":
+        if isinstance(files, list):
+            files = {f"{i}.bin": size for i, size in enumerate(files)}
+        plan = []
+        for i, (name, size) in enumerate(files.items()):
+            src_path = root_dir / name
+            src_path.parent.mkdir(parents=True, exist_ok=True)
+            src_path.write_bytes(b"0" * size)
+            plan.append(
+                PlanItem(
+                    id=(i + 1),
+                    src=src_path,
+                    dest=(root_dir / f"archive/{name}"),
+                    overwrite_flag=False,
+                )
+            )
+        return plan
+
+    return create
@@ -0,0 +1,53 @@
+from pathlib import Path
+
+from pytest import MonkeyPatch
+
+
+def test_digest_cache(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    import os
+
+    from h3a import digest
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("foo")
+    (tmp_path / "baz.txt").write_text("baz")
+    (tmp_path / "blah.txt").write_text("blah")
+
+    # -- Count digest computations --
+    computed_paths: list[str] = []
+    original_compute_file_digest = digest.compute_file_digest
+
+    def counting_compute_file_digest(path: Path) -> str:
+        computed_paths.append(path.name)
+        return original_compute_file_digest(path)
+
+    monkeypatch.setattr(digest, "compute_file_digest", counting_compute_file_digest)
+
+    # -- Compare files --
+    digest_cache = digest.DigestCache()
+    foo_stat = os.stat(tmp_path / "foo.txt")
+    bar_stat = os.stat(tmp_path / "bar.txt")
+    baz_stat = os.stat(tmp_path / "baz.txt")
+    blah_stat = os.stat(tmp_path / "blah.txt")
+    assert digest_cache.is_identical(
+        tmp_path / "foo.txt", foo_stat, tmp_path / "bar.txt", bar_stat
+    )
+    assert not digest_cache.is_identical(
+        tmp_path / "foo.txt", foo_stat, tmp_path / "baz.txt", baz_stat
+    )
+    assert not digest_cache.is_identical(
+        tmp_path / "foo.txt", foo_stat, tmp_path / "blah.txt", blah_stat
+    )
+    assert computed_paths == ["foo.txt", "bar.txt", "baz.txt"]
+
+    # -- Cached digests are reused until the file changes --
+    digest_cache = digest.DigestCache(digest_cache.entries)
+    assert digest_cache.get_digest(tmp_path / "foo.txt", foo_stat) == (
+        original_compute_file_digest(tmp_path / "foo.txt")
+    )
+    assert computed_paths == ["foo.txt", "bar.txt", "baz.txt"]
+    (tmp_path / "foo.txt").write_text("foo foo")
+    digest_cache.get_digest(tmp_path / "foo.txt", os.stat(tmp_path / "foo.txt"))
+    assert computed_paths == ["foo.txt", "bar.txt", "baz.txt", "foo.txt"]
+    assert set(digest_cache.used_entries.keys()) == {str(tmp_path / "foo.txt")}
@@ -0,0 +1,368 @@
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from time import sleep
+from typing import TYPE_CHECKING, Any
+
+from pytest import MonkeyPatch, raises
+
+if TYPE_CHECKING:
+    from conftest import CreatePlan  # pragma: no cover
+
+    from h3a.context import Context  # pragma: no cover
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    lock: Lock
+    in_flight: int
+    max_in_flight: int
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.lock = Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        CountingExecutor.instance = self
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        future = super().submit(fn, *args, **kwargs)
+        future.add_done_callback(self.on_done)
+        return future
+
+    def on_done(self, future: Future) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+
+def test_execute_window(
+    tmp_path: Path,
+    create_plan: "CreatePlan",
+    test_context: "Context",
+    monkeypatch: MonkeyPatch,
+) -> None:
+    from h3a import execute
+
+    # -- Initialize test files --
+    plan = create_plan(tmp_path, [100] * 20)
+    monkeypatch.setattr(execute, "ThreadPoolExecutor", CountingExecutor)
+    test_context.threads = 4
+    test_context.batch_threshold = 0
+
+    # -- Items in flight are bounded --
+    test_context.max_in_flight = 3
+    stats = execute.execute_plan(plan, context=test_context)
+    assert stats.bytes_copied == 2000
+    assert 1 <= CountingExecutor.instance.max_in_flight <= 3
+    for plan_item in plan:
+        assert plan_item.dest.read_bytes() == plan_item.src.read_bytes()
+
+    # -- Bytes in flight are bounded --
+    test_context.max_in_flight = 0
+    test_context.max_in_flight_bytes = 250
+    execute.execute_plan(plan, context=test_context)
+    assert CountingExecutor.instance.max_in_flight <= 2
+
+    # -- Items larger than the byte limit still run --
+    test_context.max_in_flight_bytes = 50
+    execute.execute_plan(plan, context=test_context)
+    assert CountingExecutor.instance.max_in_flight == 1
+
+    # -- Chunks count against the window --
+    chunked_plan = create_plan(tmp_path / "chunked", [100_000])
+    test_context.max_in_flight_bytes = 0
+    test_context.max_in_flight = 2
+    test_context.chunk_threshold = 1000
+    test_context.chunk_size = 10_000
+    stats = execute.execute_plan(chunked_plan, context=test_context)
+    assert stats.bytes_copied == 100_000
+    assert CountingExecutor.instance.max_in_flight == 2
+    assert chunked_plan[0].dest.read_bytes() == chunked_plan[0].src.read_bytes()
+    test_context.max_in_flight = 0
+    test_context.max_in_flight_bytes = 20_000
+    execute.execute_plan(chunked_plan, context=test_context)
+    assert CountingExecutor.instance.max_in_flight == 2
+
+    # -- Tuned threads bound the tasks in flight --
+    test_context.max_in_flight_bytes = 0
+    test_context.chunk_threshold = 0
+    test_context.autotune = True
+    test_context.threads = 2
+    test_context._execute_delay_seconds = 0.01
+    stats = execute.execute_plan(plan, context=test_context)
+    assert stats.tuned_threads == 2
+    assert CountingExecutor.instance.max_in_flight == 2
+    test_context.autotune = False
+    test_context._execute_delay_seconds = None
+
+    # -- Missing sources count as empty --
+    plan[0].src.unlink()
+    with raises(FileNotFoundError):
+        execute.execute_plan(plan, context=test_context)
+
+
+def test_execute_interrupt(
+    tmp_path: Path,
+    create_plan: "CreatePlan",
+    test_context: "Context",
+    monkeypatch: MonkeyPatch,
+) -> None:
+    from h3a import execute, transfer
+
+    # -- Initialize test files --
+    plan = create_plan(tmp_path, [100] * 10)
+    test_context.max_in_flight = 10
+    test_context.batch_threshold = 0
+    test_context._execute_delay_seconds = 0.1
+    original_start_transfer = transfer.start_transfer
+
+    def interrupted_start_transfer(src: Path, dest: Path, **kwargs: Any) -> Any:
+        if src.name == "1.bin":
+            raise KeyboardInterrupt
+        return original_start_transfer(src, dest, **kwargs)
+
+    # -- Pending items are cancelled on interrupt --
+    monkeypatch.setattr(execute, "start_transfer", interrupted_start_transfer)
+    with raises(KeyboardInterrupt):
+        execute.execute_plan(plan, context=test_context)
+    assert len(list((tmp_path / "archive").iterdir())) < 5
+
+    # -- Unfinished chunked copies are discarded --
+    plan = create_plan(tmp_path / "chunked", [100_000, 100])
+    test_context.threads = 2
+    test_context.chunk_threshold = 1000
+    test_context.chunk_size = 10_000
+
+    def slowly_interrupted_start_transfer(src: Path, dest: Path, **kwargs: Any) -> Any:
+        if src.name == "1.bin":
+            raise KeyboardInterrupt
+        sleep(0.2)
+        return original_start_transfer(src, dest, **kwargs)
+
+    monkeypatch.setattr(execute, "start_transfer", slowly_interrupted_start_transfer)
+    with raises(KeyboardInterrupt):
+        execute.execute_plan(plan, context=test_context)
+    assert list((tmp_path / "chunked/archive").iterdir()) == []
+
+
+def test_execute_batches(
+    tmp_path: Path,
+    create_plan: "CreatePlan",
+    test_context: "Context",
+    monkeypatch: MonkeyPatch,
+) -> None:
+    from h3a import execute
+
+    # -- Initialize test files --
+    plan = create_plan(tmp_path, [100] * 10 + [10_000] * 2)
+    monkeypatch.setattr(execute, "ThreadPoolExecutor", CountingExecutor)
+    test_context.threads = 4
+    test_context.execute_order = "packed"
+    test_context.batch_threshold = 1000
+    test_context.batch_size = 4
+    test_context.chunk_threshold = 100
+
+    # -- Small files are executed in batches --
+    stats = execute.execute_plan(plan, context=test_context)
+    assert stats.bytes_copied == 21_000
+    assert stats.strategy_counts == {"copy": 12}
+    for plan_item in plan:
+        assert plan_item.dest.read_bytes() == plan_item.src.read_bytes()
+
+
+def test_execute_device_threads(
+    tmp_path: Path,
+    create_plan: "CreatePlan",
+    test_context: "Context",
+    monkeypatch: MonkeyPatch,
+) -> None:
+    import os
+
+    from h3a import execute, transfer
+
+    # -- Initialize test files --
+    plan = create_plan(tmp_path, [100] * 12 + [100_000])
+    device = os.stat(tmp_path).st_dev
+    test_context.threads = 4
+    test_context.batch_threshold = 0
+    test_context.chunk_threshold = 1000
+    test_context.chunk_size = 10_000
+    lock = Lock()
+    running = 0
+    max_running = 0
+
+    def counting(function: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            sleep(0.01)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with lock:
+                    running -= 1
+
+        return wrapper
+
+    monkeypatch.setattr(execute, "start_transfer", counting(transfer.start_transfer))
+    monkeypatch.setattr(
+        transfer.ChunkedCopy,
+        "copy_chunk",
+        counting(transfer.ChunkedCopy.copy_chunk),
+    )
+
+    # -- Tasks per device are limited --
+    test_context.device_threads = 1
+    stats = execute.execute_plan(plan, context=test_context)
+    assert stats.bytes_copied == 101_200
+    assert max_running == 1
+    for plan_item in plan:
+        assert plan_item.dest.read_bytes() == plan_item.src.read_bytes()
+
+    # -- Limits by device override the default --
+    max_running = 0
+    test_context.device_threads_by_device = {device: 2}
+    execute.execute_plan(plan, context=test_context)
+    assert max_running == 2
+
+
+def test_execute_sized_once(
+    tmp_path: Path,
+    create_plan: "CreatePlan",
+    test_context: "Context",
+    monkeypatch: MonkeyPatch,
+) -> None:
+    from collections import Counter
+
+    from h3a import execute
+
+    # -- Initialize test files --
+    plan = create_plan(tmp_path, [100] * 5)
+    src_paths = {plan_item.src for plan_item in plan}
+    stat_counts = Counter[Path]()
+    path_stat = Path.stat
+
+    def counting_stat(path: Path, **kwargs: Any) -> Any:
+        if path in src_paths:
+            stat_counts[path] += 1
+        return path_stat(path, **kwargs)
+
+    monkeypatch.setattr(Path, "stat", counting_stat)
+
+    # -- Sources without sizes are statted once, with or without inodes --
+    for order in ["plan", "locality"]:
+        test_context.execute_order = order
+        stat_counts.clear()
+        stats = execute.execute_plan(plan, context=test_context)
+        assert stats.finished_bytes == 500
+        assert stat_counts == {src_path: 1 for src_path in src_paths}
+
+
+def test_execute_dest_dirs(
+    tmp_path: Path, test_context: "Context", monkeypatch: MonkeyPatch
+) -> None:
+    from h3a import execute
+    from h3a.plan import PlanItem
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "archive").mkdir()
+    dest_paths = [
+        tmp_path / "archive/a/b/1.txt",
+        tmp_path / "archive/a/2.txt",
+        tmp_path / "archive/a/b/3.txt",
+        tmp_path / "archive/c/4.txt",
+        tmp_path / "archive/a/5.txt",
+    ]
+    plan = [
+        PlanItem(
+            id=(i + 1), src=(tmp_path / "foo.txt"), dest=dest_path, overwrite_flag=False
+        )
+        for i, dest_path in enumerate(dest_paths)
+    ]
+
+    # -- Unique dest directories in depth order --
+    assert execute.get_dest_dirs(plan) == [
+        tmp_path / "archive/a",
+        tmp_path / "archive/c",
+        tmp_path / "archive/a/b",
+    ]
+
+    # -- Each dest directory is created once --
+    created_dirs: list[Path] = []
+    original_mkdir = Path.mkdir
+
+    def counting_mkdir(self: Path, *args: Any, **kwargs: Any) -> None:
+        created_dirs.append(self)
+        original_mkdir(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "mkdir", counting_mkdir)
+    test_context.threads = 4
+    execute.execute_plan(plan, context=test_context)
+    assert created_dirs == execute.get_dest_dirs(plan)
+    for dest_path in dest_paths:
+        assert dest_path.read_text() == "foo"
+
+
+def test_execute_stream(
+    tmp_path: Path, create_plan: "CreatePlan", test_context: "Context"
+) -> None:
+    from collections.abc import Iterator
+
+    from h3a import execute
+    from h3a.plan import PlanItem
+
+    # -- Initialize test files --
+    plan = create_plan(tmp_path, [100] * 10)
+    test_context.threads = 2
+    test_context.batch_threshold = 0
+
+    # -- Planning and execution overlap --
+    def iter_overlapped_plan() -> Iterator[PlanItem]:
+        for plan_item in plan[:5]:
+            yield plan_item
+        for _ in range(500):
+            if plan[0].dest.exists():
+                break
+            sleep(0.01)
+        assert plan[0].dest.exists()
+        yield from plan[5:]
+
+    stats = execute.execute_plan_stream(
+        iter_overlapped_plan(), context=test_context, buffer_size=2
+    )
+    assert stats.bytes_copied == 1000
+    for plan_item in plan:
+        assert plan_item.dest.read_bytes() == plan_item.src.read_bytes()
+
+    # -- Planning errors are raised by the consumer --
+    def iter_failing_plan() -> Iterator[PlanItem]:
+        yield plan[0]
+        raise RuntimeError("Planning failed")
+
+    with raises(RuntimeError, match="Planning failed"):
+        execute.execute_plan_stream(iter_failing_plan(), context=test_context)
+
+    # -- Other orders would sort the whole plan --
+    test_context.execute_order = "largest-first"
+    with raises(RuntimeError, match="can't be executed in 'largest-first' order"):
+        execute.execute_plan_stream(iter(plan), context=test_context)
+    test_context.execute_order = "plan"
+
+    # -- The producer stops when the consumer is gone --
+    produced: list[PlanItem] = []
+
+    def iter_recorded_plan() -> Iterator[PlanItem]:
+        for plan_item in plan:
+            produced.append(plan_item)
+            yield plan_item
+
+    with execute.PlanStream(iter_recorded_plan(), buffer_size=1) as plan_stream:
+        assert next(iter(plan_stream)) == plan[0]
+        sleep(0.3)
+    assert len(produced) < len(plan)
@@ -0,0 +1,122 @@
+import logging
+from contextlib import chdir
+from io import StringIO
+from pathlib import Path
+from threading import Thread, current_thread
+
+
+def test_log_writer() -> None:
+    from h3a.log import start_log_writer
+
+    # -- Messages are formatted by the writer thread --
+    formatting_threads: list[str] = []
+
+    class Traced:
+        def __str__(self) -> str:
+            formatting_threads.append(current_thread().name)
+            return "traced"
+
+    stream = StringIO()
+    log_listener = start_log_writer(logging.INFO, stream=stream)
+    logger = logging.getLogger("h3a.test")
+
+    def log_items(worker_id: int) -> None:
+        for i in range(100):
+            logger.info("Item %d of worker %d", i, worker_id)
+
+    workers = [Thread(target=log_items, args=(i,)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    logger.info("Object: %s", Traced())
+    logger.debug("Disabled: %s", Traced())
+    log_listener.stop()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 401
+    assert lines[-1].endswith(" INFO (h3a.test) Object: traced")
+    assert " INFO (h3a.test) Item 99 of worker 3" in stream.getvalue()
+    assert len(formatting_threads) == 1
+    assert formatting_threads[0] != current_thread().name
+
+    # -- Previous handlers are restored on stop --
+    root_logger = logging.getLogger()
+    previous_stream = StringIO()
+    previous_handler = logging.StreamHandler(previous_stream)
+    root_logger.addHandler(previous_handler)
+    previous_handlers = root_logger.handlers[:]
+    previous_level = root_logger.level
+    try:
+        log_listener = start_log_writer(logging.DEBUG, stream=stream)
+        assert previous_handler not in root_logger.handlers
+        log_listener.stop()
+        assert root_logger.handlers == previous_handlers
+        assert root_logger.level == previous_level
+        logger.warning("After stop")
+        assert previous_stream.getvalue() == "After stop\n"
+    finally:
+        root_logger.removeHandler(previous_handler)
+
+
+def test_log_cli(tmp_path: Path) -> None:
+    import os
+
+    from click.testing import CliRunner
+
+    from h3a.cli import main
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("bar")
+    config_text = (
+        "include:\n"
+        "  - '*.txt'\n"
+        "out_dir: archive\n"
+        "tag_format: _v1\n"
+        "tag_pattern: _v1\n"
+        "skip_identical: true\n"
+        "manifest: manifest.json\n"
+        "chunk_threshold: 1\n"
+        "chunk_size: 1\n"
+        "batch_threshold: 0\n"
+    )
+    (tmp_path / "h3a.yaml").write_text(config_text)
+
+    # -- Per-item debug logs --
+    cli_runner = CliRunner()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y", "--debug"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert "DEBUG (h3a.execute) Executing plan item: PlanItem(" in cli_result.stderr
+    assert "DEBUG (h3a.execute) Copying in 3 chunks: " in cli_result.stderr
+
+    # -- Per-item info logs of planning --
+    os.utime(tmp_path / "foo.txt", (0, 0))
+    (tmp_path / "bar.txt").write_text("bar bar")
+    (tmp_path / "baz_v1.txt").write_text("baz")
+    (tmp_path / "h3a.yaml").write_text(config_text + "on_conflict: skip\n")
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y", "--verbose"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert (
+        f"INFO (h3a.plan) Skipping file identical to its latest version:"
+        f" {tmp_path / 'foo.txt'}"
+    ) in cli_result.stderr
+    assert (
+        f"INFO (h3a.plan) Skipping file with matched tag: {tmp_path / 'baz_v1.txt'}"
+    ) in cli_result.stderr
+    assert (
+        f"INFO (h3a.plan) Skipping existing destination file:"
+        f" {tmp_path / 'archive/bar_v1.txt'}"
+    ) in cli_result.stderr
+
+    (tmp_path / "h3a.yaml").write_text(config_text + "on_conflict: overwrite\n")
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y", "--debug"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert (
+        f"DEBUG (h3a.plan) Overwriting existing destination file:"
+        f" {tmp_path / 'archive/bar_v1.txt'}"
+    ) in cli_result.stderr
+    assert (tmp_path / "archive/bar_v1.txt").read_text() == "bar bar"
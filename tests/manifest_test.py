@@ -0,0 +1,234 @@
+import json
+from contextlib import chdir
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from click.testing import CliRunner
+from pytest import LogCaptureFixture, MonkeyPatch
+
+if TYPE_CHECKING:
+    from h3a.context import Context  # pragma: no cover
+
+
+def test_manifest_incremental(
+    tmp_path: Path, test_context: "Context", monkeypatch: MonkeyPatch
+) -> None:
+    import os
+
+    from h3a.config import load_config
+    from h3a.execute import execute_plan
+    from h3a.manifest import load_manifest
+    from h3a.plan import generate_plan
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("bar")
+    (tmp_path / "baz").mkdir()
+    (tmp_path / "baz/blah.txt").write_text("blah")
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n"
+        "  - '**/*.txt'\n"
+        "out_dir: archive\n"
+        "tag_time_source: now\n"
+        "on_conflict: overwrite\n"
+        "manifest: h3a.manifest.json\n"
+    )
+    config = load_config((tmp_path / "h3a.yaml").read_text())
+    manifest_path = tmp_path / "h3a.manifest.json"
+
+    # -- First run archives everything --
+    manifest = load_manifest(manifest_path, config=config, root_dir=tmp_path)
+    assert manifest.entries == {}
+    plan = generate_plan(
+        config=config, root_dir=tmp_path, context=test_context, manifest=manifest
+    )
+    assert {plan_item.src for plan_item in plan} == {
+        tmp_path / "foo.txt",
+        tmp_path / "bar.txt",
+        tmp_path / "baz/blah.txt",
+    }
+    execute_plan(plan, context=test_context)
+    manifest.save()
+    assert manifest_path.exists()
+    assert not manifest_path.with_name("h3a.manifest.json.tmp").exists()
+
+    # -- Second run skips unchanged files --
+    # (Dests are checked by directory listings instead of stats.)
+    (tmp_path / "bar.txt").write_text("bar bar")
+    os.remove(next((tmp_path / "archive/baz").iterdir()))
+    manifest = load_manifest(manifest_path, config=config, root_dir=tmp_path)
+    assert set(manifest.entries.keys()) == {
+        "foo.txt",
+        "bar.txt",
+        os.path.join("baz", "blah.txt"),
+    }
+    with monkeypatch.context() as patch:
+        patch.setattr(Path, "exists", None)
+        plan = generate_plan(
+            config=config, root_dir=tmp_path, context=test_context, manifest=manifest
+        )
+    assert {plan_item.src for plan_item in plan} == {
+        tmp_path / "bar.txt",
+        tmp_path / "baz/blah.txt",
+    }
+    assert manifest.next_entries["foo.txt"] == manifest.entries["foo.txt"]
+    assert manifest.next_entries["bar.txt"] != manifest.entries["bar.txt"]
+
+
+def test_manifest_fallback(
+    tmp_path: Path, test_context: "Context", caplog: LogCaptureFixture
+) -> None:
+    from h3a.config import load_config
+    from h3a.manifest import MANIFEST_VERSION, get_manifest_fingerprint, load_manifest
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    config = load_config("include:\n  - foo.txt\nmanifest: manifest.json\n")
+    manifest_path = tmp_path / "manifest.json"
+    fingerprint = get_manifest_fingerprint(config, tmp_path)
+    valid_entries = {"foo.txt": [3, 0, 0, "foo.txt"]}
+
+    # -- Invalid manifests are ignored --
+    for manifest_text, message in [
+        ("{", "Manifest is corrupt"),
+        ("[]", "Manifest is corrupt"),
+        (
+            json.dumps(
+                {"version": MANIFEST_VERSION, "fingerprint": fingerprint, "entries": 0}
+            ),
+            "Manifest is corrupt",
+        ),
+        (
+            json.dumps(
+                {
+                    "version": MANIFEST_VERSION + 1,
+                    "fingerprint": fingerprint,
+                    "entries": valid_entries,
+                }
+            ),
+            "Manifest version mismatch",
+        ),
+        (
+            json.dumps(
+                {
+                    "version": MANIFEST_VERSION,
+                    "fingerprint": get_manifest_fingerprint(config, tmp_path / "other"),
+                    "entries": valid_entries,
+                }
+            ),
+            "Manifest is stale",
+        ),
+    ]:
+        manifest_path.write_text(manifest_text)
+        caplog.clear()
+        manifest = load_manifest(manifest_path, config=config, root_dir=tmp_path)
+        assert manifest.entries == {}
+        assert f"{message}, doing a full scan: {manifest_path}" in caplog.text
+
+    # -- Valid manifest is loaded --
+    manifest_path.write_text(
+        json.dumps(
+            {
+                "version": MANIFEST_VERSION,
+                "fingerprint": fingerprint,
+                "entries": valid_entries,
+            }
+        )
+    )
+    manifest = load_manifest(manifest_path, config=config, root_dir=tmp_path)
+    assert list(manifest.entries.keys()) == ["foo.txt"]
+
+
+def test_manifest_cli(tmp_path: Path) -> None:
+    from h3a.cli import CliResult, main
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n  - foo.txt\nout_dir: archive\nmanifest: manifest.json\n"
+    )
+
+    # -- Dry run doesn't write the manifest --
+    cli_runner = CliRunner()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["--dry-run"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert not (tmp_path / "manifest.json").exists()
+
+    # -- Real run writes the manifest --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert (tmp_path / "manifest.json").exists()
+
+    # -- Unchanged files are skipped in the next run --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    cli_return_value: object = cli_result.return_value
+    assert isinstance(cli_return_value, CliResult)
+    assert len(cli_return_value.plan) == 0
+    assert cli_result.output == "An empty plan was generated. Nothing to do.\n"
+
+
+def test_manifest_digests(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    import os
+
+    from h3a import digest
+    from h3a.cli import CliResult, main
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n"
+        "  - foo.txt\n"
+        "out_dir: archive\n"
+        "tag_time_source: now\n"
+        "on_conflict: overwrite\n"
+        "skip_identical: true\n"
+        "manifest: manifest.json\n"
+    )
+
+    # -- Count digest computations --
+    computed_paths: list[Path] = []
+    original_compute_file_digest = digest.compute_file_digest
+
+    def counting_compute_file_digest(path: Path) -> str:
+        computed_paths.append(path)
+        return original_compute_file_digest(path)
+
+    monkeypatch.setattr(digest, "compute_file_digest", counting_compute_file_digest)
+
+    # -- First run archives the file without hashing --
+    cli_runner = CliRunner()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert computed_paths == []
+
+    # -- Touched file is compared with its latest version --
+    foo_stat = os.stat(tmp_path / "foo.txt")
+    os.utime(
+        tmp_path / "foo.txt",
+        ns=(foo_stat.st_atime_ns, foo_stat.st_mtime_ns + 1_000_000_000),
+    )
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    cli_return_value: object = cli_result.return_value
+    assert isinstance(cli_return_value, CliResult)
+    assert len(cli_return_value.plan) == 0
+    assert len(computed_paths) == 2
+    assert computed_paths[0] == tmp_path / "foo.txt"
+    assert computed_paths[1].parent == tmp_path / "archive"
+
+    # -- Resized file is archived without hashing --
+    (tmp_path / "foo.txt").write_text("foo foo")
+    computed_paths.clear()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    cli_return_value = cli_result.return_value
+    assert isinstance(cli_return_value, CliResult)
+    assert len(cli_return_value.plan) == 1
+    assert computed_paths == []
@@ -0,0 +1,242 @@
+from contextlib import chdir
+from pathlib import Path
+
+
+def test_metrics_format() -> None:
+    from h3a.execute import ExecuteStats
+    from h3a.metrics import RunStats, escape_label_value, format_metrics
+    from h3a.plan import PlanStats
+
+    # -- Label values are escaped --
+    assert escape_label_value('a\\b"c\nd') == 'a\\\\b\\"c\\nd'
+
+    # -- Every metric is a labeled gauge --
+    stats = RunStats(
+        plan_stats=PlanStats(planned_items=3),
+        execute_stats=ExecuteStats(
+            finished_items=3,
+            bytes_copied=100,
+            busy_seconds=3.0,
+            duration_seconds=2.0,
+            max_threads=2,
+        ),
+        finish_time=1000.0,
+    )
+    stats.plan_stats.skipped_counts["identical"] += 2
+    stats.add_phase_seconds("plan", 0.5)
+    stats.add_phase_seconds("plan", 0.25)
+    metrics_text = format_metrics(stats, labels={"config": 'C:\\"h3a".yaml'})
+    lines = metrics_text.splitlines()
+    assert lines[:3] == [
+        "# HELP h3a_last_success_timestamp_seconds"
+        " Time when the last run finished successfully.",
+        "# TYPE h3a_last_success_timestamp_seconds gauge",
+        'h3a_last_success_timestamp_seconds{config="C:\\\\\\"h3a\\".yaml"} 1000.0',
+    ]
+    assert 'h3a_last_run_success{config="C:\\\\\\"h3a\\".yaml"} 1' in lines
+    assert (
+        'h3a_phase_duration_seconds{config="C:\\\\\\"h3a\\".yaml",phase="plan"} 0.75'
+        in lines
+    )
+    assert (
+        'h3a_files_skipped{config="C:\\\\\\"h3a\\".yaml",reason="identical"} 2' in lines
+    )
+    assert 'h3a_files_skipped{config="C:\\\\\\"h3a\\".yaml",reason="tagged"} 0' in lines
+    assert 'h3a_worker_utilization_ratio{config="C:\\\\\\"h3a\\".yaml"} 0.75' in lines
+    assert sum(line.startswith("# TYPE ") for line in lines) == 13
+
+    # -- Failed runs have the success time of an earlier run, if any --
+    stats.succeeded = False
+    metrics_text = format_metrics(stats, labels={})
+    assert "h3a_last_run_success 0\n" in metrics_text
+    assert "h3a_last_run_timestamp_seconds 1000.0\n" in metrics_text
+    assert "h3a_last_success_timestamp_seconds" not in metrics_text
+    metrics_text = format_metrics(stats, labels={}, last_success_time=900.0)
+    assert "h3a_last_success_timestamp_seconds 900.0\n" in metrics_text
+
+    # -- Unlabeled metrics, and no utilization without execution --
+    metrics_text = format_metrics(RunStats(), labels={})
+    assert "h3a_files_planned 0\n" in metrics_text
+    assert "h3a_worker_utilization_ratio" not in metrics_text
+
+
+def test_metrics_last_success(tmp_path: Path) -> None:
+    from h3a.metrics import RunStats, read_last_success_time, write_metrics_file
+
+    metrics_path = tmp_path / "h3a.prom"
+    labels = {"config": "h3a.yaml"}
+
+    # -- No earlier file --
+    assert read_last_success_time(metrics_path, labels=labels) is None
+    write_metrics_file(
+        metrics_path, RunStats(finish_time=1000.0, succeeded=False), labels=labels
+    )
+    assert "h3a_last_success_timestamp_seconds" not in metrics_path.read_text()
+
+    # -- The time of the last success is carried over failures --
+    write_metrics_file(metrics_path, RunStats(finish_time=1000.0), labels=labels)
+    for finish_time in [2000.0, 3000.0]:
+        write_metrics_file(
+            metrics_path,
+            RunStats(finish_time=finish_time, succeeded=False),
+            labels=labels,
+        )
+        assert read_last_success_time(metrics_path, labels=labels) == 1000.0
+
+    # -- Other labels and corrupt values don't count --
+    assert read_last_success_time(metrics_path, labels={}) is None
+    metrics_path.write_text("h3a_last_success_timestamp_seconds foo\n")
+    assert read_last_success_time(metrics_path, labels={}) is None
+
+
+def test_metrics_cli(tmp_path: Path) -> None:
+    from click.testing import CliRunner
+
+    from h3a.cli import CliResult, main
+
+    # -- Initialize test files --
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.txt").write_text("b")
+    (tmp_path / "c_v0.txt").write_text("c")
+    (tmp_path / "archive").mkdir()
+    (tmp_path / "archive/a_v0.txt").write_text("a")
+    (tmp_path / "archive/b_v0.txt").write_text("b0")
+    (tmp_path / "archive/b_v1.txt").write_text("b1")
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n"
+        "  - '*.txt'\n"
+        "out_dir: archive\n"
+        "tag_format: _v1\n"
+        "tag_pattern: _v\\d\n"
+        "on_conflict: overwrite\n"
+        "skip_identical: true\n"
+        "manifest: manifest.json\n"
+        "keep_last: 1\n"
+    )
+    metrics_path = tmp_path / "h3a.prom"
+
+    # -- Dry runs don't write metrics --
+    cli_runner = CliRunner()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["--dry-run", "--metrics", "h3a.prom"], standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    assert not metrics_path.exists()
+
+    # -- Stats of a run are returned and written as metrics --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["-y", "--metrics", "h3a.prom"], standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    cli_return_value: object = cli_result.return_value
+    assert isinstance(cli_return_value, CliResult)
+    stats = cli_return_value.stats
+    assert stats.plan_stats.planned_items == 1
+    assert stats.plan_stats.overwrite_items == 1
+    assert dict(stats.plan_stats.skipped_counts) == {"tagged": 1, "identical": 1}
+    assert stats.execute_stats.finished_items == 1
+    assert stats.execute_stats.overwritten_items == 1
+    assert stats.execute_stats.bytes_copied == 1
+    assert stats.execute_stats.max_threads == cli_return_value.context.threads
+    assert stats.deleted_versions == 1
+    assert list(stats.phase_seconds) == [
+        "load_config",
+        "load_manifest",
+        "plan",
+        "prune_plan",
+        "print_plan",
+        "execute",
+        "prune",
+        "save",
+    ]
+    assert stats.duration_seconds >= sum(stats.phase_seconds.values())
+
+    config_label = f'config="{tmp_path / "h3a.yaml"}"'
+    metrics_lines = metrics_path.read_text().splitlines()
+    assert f"h3a_last_run_success{{{config_label}}} 1" in metrics_lines
+    last_success_lines = [
+        line
+        for line in metrics_lines
+        if line.startswith(f"h3a_last_success_timestamp_seconds{{{config_label}}} ")
+    ]
+    assert len(last_success_lines) == 1
+    assert f"h3a_files_planned{{{config_label}}} 1" in metrics_lines
+    assert f'h3a_files_skipped{{{config_label},reason="tagged"}} 1' in metrics_lines
+    assert f"h3a_files_copied{{{config_label}}} 1" in metrics_lines
+    assert f"h3a_files_overwritten{{{config_label}}} 1" in metrics_lines
+    assert f"h3a_versions_deleted{{{config_label}}} 1" in metrics_lines
+    assert any(
+        line.startswith(f"h3a_worker_utilization_ratio{{{config_label}}} ")
+        for line in metrics_lines
+    )
+    assert not (tmp_path / "h3a.prom.tmp").exists()
+
+    # -- Stats of loaded plans --
+    (tmp_path / "b.txt").write_text("bb")
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["--dry-run", "--plan-out", "plan.jsonl"], standalone_mode=False
+        )
+        assert cli_result.exception is None, cli_result.output
+        cli_result = cli_runner.invoke(
+            main,
+            ["-y", "--plan-in", "plan.jsonl", "--metrics", "h3a.prom"],
+            standalone_mode=False,
+        )
+    assert cli_result.exception is None, cli_result.output
+    cli_return_value = cli_result.return_value
+    assert isinstance(cli_return_value, CliResult)
+    assert cli_return_value.stats.plan_stats.planned_items == 1
+    assert cli_return_value.stats.plan_stats.overwrite_items == 1
+    assert cli_return_value.stats.execute_stats.overwritten_items == 1
+    assert (tmp_path / "archive/b_v1.txt").read_text() == "bb"
+
+    # -- Stats of streamed runs --
+    (tmp_path / "b.txt").write_text("bbb")
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["-y", "--stream", "--metrics", "h3a.prom"], standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    cli_return_value = cli_result.return_value
+    assert isinstance(cli_return_value, CliResult)
+    assert cli_return_value.stats.plan_stats.planned_items == 1
+    assert cli_return_value.stats.execute_stats.finished_items == 1
+    assert list(cli_return_value.stats.phase_seconds) == [
+        "load_config",
+        "load_manifest",
+        "stream",
+        "prune_plan",
+        "save",
+    ]
+
+    # -- Failed runs write metrics too, with the last success time --
+    last_success_line = next(
+        line
+        for line in metrics_path.read_text().splitlines()
+        if line.startswith("h3a_last_success_timestamp_seconds{")
+    )
+    (tmp_path / "archive/b_v1.txt").write_text("conflict")
+    (tmp_path / "b.txt").write_text("bbbb")
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n"
+        "  - '*.txt'\n"
+        "out_dir: archive\n"
+        "tag_format: _v1\n"
+        "tag_pattern: _v\\d\n"
+        "on_conflict: error\n"
+    )
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["-y", "--metrics", "h3a.prom"], standalone_mode=False
+        )
+    assert isinstance(cli_result.exception, RuntimeError)
+    metrics_lines = metrics_path.read_text().splitlines()
+    assert f"h3a_last_run_success{{{config_label}}} 0" in metrics_lines
+    assert last_success_line in metrics_lines
+    assert any(
+        line.startswith(f'h3a_phase_duration_seconds{{{config_label},phase="plan"}} ')
+        for line in metrics_lines
+    )
@@ -0,0 +1,114 @@
+import json
+from contextlib import chdir
+from io import StringIO
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pytest import MonkeyPatch
+
+if TYPE_CHECKING:
+    from conftest import CreatePlan  # pragma: no cover
+
+
+def test_output_plan(
+    tmp_path: Path, create_plan: "CreatePlan", monkeypatch: MonkeyPatch
+) -> None:
+    from h3a import output
+    from h3a.plan import format_plan_item
+
+    # -- Initialize test files --
+    plan = create_plan(tmp_path, {"foo.txt": 3, "baz/blah.txt": 4, "missing.txt": 0})
+    plan[1] = plan[1]._replace(overwrite_flag=True)
+    (tmp_path / "missing.txt").unlink()
+
+    # -- Lines are written in chunks --
+    class CountingFile(StringIO):
+        write_count = 0
+
+        def write(self, text: str) -> int:
+            self.write_count += 1
+            return super().write(text)
+
+    monkeypatch.setattr(output, "PLAN_OUTPUT_CHUNK_SIZE", 2)
+    file = CountingFile()
+    output.write_plan(plan, file, plan_format="text")
+    assert file.getvalue().splitlines() == [
+        format_plan_item(plan_item) for plan_item in plan
+    ]
+    assert file.write_count == 2
+
+    # -- JSON lines --
+    file = CountingFile()
+    output.write_plan(plan, file, plan_format="jsonl")
+    assert [json.loads(line) for line in file.getvalue().splitlines()] == [
+        {
+            "id": plan_item.id,
+            "src": str(plan_item.src),
+            "dest": str(plan_item.dest),
+            "overwrite": plan_item.overwrite_flag,
+        }
+        for plan_item in plan
+    ]
+
+    # -- Summary --
+    assert output.summarize_plan(plan) == [
+        output.PlanDirSummary(dest_dir=(tmp_path / "archive"), count=2, size=3),
+        output.PlanDirSummary(dest_dir=(tmp_path / "archive/baz"), count=1, size=4),
+    ]
+    file = CountingFile()
+    output.write_plan_summary(plan, file, item_count=1)
+    assert file.getvalue().splitlines() == [
+        "3 item(s) in 2 dest directories:",
+        f"  {tmp_path / 'archive'}: 2 item(s), 3 bytes",
+        f"  {tmp_path / 'archive/baz'}: 1 item(s), 4 bytes",
+        "Total: 7 bytes",
+        "First 1 item(s):",
+        format_plan_item(plan[0]),
+    ]
+
+    # -- Sizes from planning are summarized without statting --
+    sized_plan = [plan[0]._replace(src_size=10), *plan[1:]]
+    assert output.summarize_plan(sized_plan)[0].size == 10
+
+
+def test_output_cli(tmp_path: Path) -> None:
+    from click.testing import CliRunner
+
+    from h3a.cli import main
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("bar")
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n  - '*.txt'\nout_dir: archive\ntag_format: _v1\ntag_pattern: _v1\n"
+    )
+
+    # -- Summary --
+    cli_runner = CliRunner()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["--dry-run", "--plan-summary"])
+    assert cli_result.exit_code == 0, cli_result.output
+    assert f"  {tmp_path / 'archive'}: 2 item(s), 6 bytes\n" in cli_result.stdout
+
+    # -- JSON lines on stdout, messages on stderr --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["--plan-format", "jsonl"], input="y\n", standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    assert sorted(
+        json.loads(line)["dest"] for line in cli_result.stdout.splitlines()
+    ) == [str(tmp_path / "archive/bar_v1.txt"), str(tmp_path / "archive/foo_v1.txt")]
+    assert "Generated plan:" in cli_result.stderr
+    assert "Continue?" in cli_result.stderr
+    assert (tmp_path / "archive/foo_v1.txt").read_text() == "foo"
+
+    # -- Summaries are text only --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["--plan-summary", "--plan-format", "jsonl"]
+        )
+    assert cli_result.exit_code == 2
+    assert "--plan-summary can't be used with --plan-format jsonl." in (
+        cli_result.output
+    )
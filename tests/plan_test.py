@@ -1,8 +1,9 @@
+import os
 import re
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
-from pytest import raises
+from pytest import MonkeyPatch, raises
 
 if TYPE_CHECKING:
     from h3a.context import Context  # pragma: no cover
@@ -36,6 +37,37 @@ def test_plan_simple(tmp_path: Path, test_context: "Context") -> None:
     assert not plan[0].overwrite_flag
 
 
+def test_plan_iter(tmp_path: Path, test_context: "Context") -> None:
+    from threading import Event
+
+    from h3a.config import load_config
+    from h3a.plan import collect_source_files, iter_plan
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("bar")
+
+    # -- Sources matched by several patterns are planned once --
+    config = load_config(
+        f"include:\n  - foo.txt\n  - '{tmp_path / '*.txt'}'\nout_dir: archive\n"
+    )
+    assert collect_source_files(tmp_path, config) == {
+        tmp_path / "foo.txt",
+        tmp_path / "bar.txt",
+    }
+    plan = list(iter_plan(config=config, root_dir=tmp_path, context=test_context))
+    assert sorted(plan_item.src.name for plan_item in plan) == ["bar.txt", "foo.txt"]
+
+    # -- Planning stops once closed --
+    closed = Event()
+    plan_items = iter_plan(
+        config=config, root_dir=tmp_path, context=test_context, closed=closed
+    )
+    next(plan_items)
+    closed.set()
+    assert list(plan_items) == []
+
+
 def test_plan_tag_unmatch(tmp_path: Path, test_context: "Context") -> None:
     from h3a.config import load_config
     from h3a.plan import generate_plan
@@ -99,6 +131,36 @@ def test_plan_conflict_skip(tmp_path: Path, test_context: "Context") -> None:
     assert len(plan) == 0
 
 
+def test_plan_dest_index(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    from h3a.plan import DestIndex
+
+    # -- Initialize test files --
+    (tmp_path / "Foo_x.txt").write_text("foo")
+    checked_paths: list[Path] = []
+    path_exists = Path.exists
+
+    def recorded_exists(path: Path, **kwargs: Any) -> bool:
+        checked_paths.append(path)
+        return path_exists(path, **kwargs)
+
+    monkeypatch.setattr(Path, "exists", recorded_exists)
+
+    # -- Names are looked up in one listing per directory --
+    dest_index = DestIndex()
+    assert dest_index.exists(tmp_path / "Foo_x.txt")
+    assert not dest_index.exists(tmp_path / "bar_x.txt")
+    assert not dest_index.exists(tmp_path / "missing/foo_x.txt")
+    assert checked_paths == []
+
+    # -- Names differing in case are checked by the file system --
+    assert dest_index.exists(tmp_path / "foo_x.txt") == path_exists(
+        tmp_path / "foo_x.txt"
+    )
+    assert checked_paths == [tmp_path / "foo_x.txt"]
+    monkeypatch.setattr(Path, "exists", lambda path, **kwargs: True)
+    assert dest_index.exists(tmp_path / "FOO_X.txt")
+
+
 def test_plan_overwriting_src(tmp_path: Path, test_context: "Context") -> None:
     from h3a.config import load_config
     from h3a.plan import generate_plan
@@ -175,3 +237,195 @@ def test_plan_complex(tmp_path: Path, test_context: "Context") -> None:
         )
         assert plan_item.dest.name == expected_dest_name
         assert plan_item.overwrite_flag == plan_item.dest.exists()
+
+
+def test_plan_reused_stats(
+    tmp_path: Path, test_context: "Context", monkeypatch: MonkeyPatch
+) -> None:
+    from h3a.config import load_config
+    from h3a.plan import generate_plan
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("bar")
+    (tmp_path / "archive").mkdir()
+    (tmp_path / "archive/foo_v20021011-123456.txt").write_text("foo")
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n"
+        "  - '*.txt'\n"
+        "out_dir: archive\n"
+        "tag_time_source: mtime\n"
+        "tag_format: _v20021011-123456\n"
+        "on_conflict: overwrite\n"
+    )
+    config = load_config((tmp_path / "h3a.yaml").read_text())
+
+    # -- No source or dest path is stated again --
+    stated_paths: list[Path] = []
+    original_stat = Path.stat
+
+    def counting_stat(self: Path, **kwargs: Any) -> os.stat_result:
+        stated_paths.append(self)
+        return original_stat(self, **kwargs)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(Path, "stat", counting_stat)
+        plan = generate_plan(config=config, root_dir=tmp_path, context=test_context)
+    assert [path for path in stated_paths if path.suffix == ".txt"] == []
+
+    # -- Assert plan content --
+    assert {
+        (plan_item.src.name, plan_item.dest.name, plan_item.overwrite_flag)
+        for plan_item in plan
+    } == {
+        ("foo.txt", "foo_v20021011-123456.txt", True),
+        ("bar.txt", "bar_v20021011-123456.txt", False),
+    }
+
+
+def test_plan_skip_identical(tmp_path: Path, test_context: "Context") -> None:
+    from h3a.catalog import load_catalog
+    from h3a.config import load_config
+    from h3a.plan import generate_plan
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("bar")
+    (tmp_path / "baz.txt").write_text("baz")
+    (tmp_path / "blah.txt").write_text("blah")
+    (tmp_path / "archive").mkdir()
+    (tmp_path / "archive/foo_v20021011-123456.txt").write_text("foo")
+    (tmp_path / "archive/bar_v20021011-123456.txt").write_text("bar")
+    (tmp_path / "archive/bar_v20031011-123456.txt").write_text("old")
+    (tmp_path / "archive/baz_v20021011-123456.txt").write_text("old")
+    (tmp_path / "archive/baz_v20031011-123456.txt").write_text("baz")
+    (tmp_path / "archive/blah_v20021011-123456.md").write_text("blah")
+    (tmp_path / "archive/notes.md").write_text("notes")
+    (tmp_path / "new").mkdir()
+    (tmp_path / "new/qux.txt").write_text("qux")
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n"
+        "  - '**/*.txt'\n"
+        "out_dir: archive\n"
+        "tag_time_source: now\n"
+        "skip_identical: true\n"
+        "manifest: manifest.json\n"
+    )
+
+    # -- Generate plan --
+    config = load_config((tmp_path / "h3a.yaml").read_text())
+    plan = generate_plan(config=config, root_dir=tmp_path, context=test_context)
+
+    # -- Assert plan content --
+    assert {plan_item.src for plan_item in plan} == {
+        tmp_path / "bar.txt",
+        tmp_path / "blah.txt",
+        tmp_path / "new/qux.txt",
+    }
+
+    # -- Latest versions are found by tag time, not as text --
+    root_dir = tmp_path / "dated"
+    (root_dir / "archive").mkdir(parents=True)
+    (root_dir / "foo.txt").write_text("A")
+    (root_dir / "archive/foo_31122020.txt").write_text("A")
+    (root_dir / "archive/foo_01012021.txt").write_text("B")
+    config_text = (
+        "include:\n"
+        "  - '*.txt'\n"
+        "out_dir: archive\n"
+        "tag_format: _%d%m%Y\n"
+        "tag_pattern: _\\d{8}\n"
+        "skip_identical: true\n"
+        "manifest: manifest.json\n"
+    )
+    for extra_text in ["", "catalog: catalog.json\n"]:
+        config = load_config(config_text + extra_text)
+        catalog = None
+        if extra_text:
+            catalog = load_catalog(
+                root_dir / "catalog.json", config=config, root_dir=root_dir
+            )
+        plan = generate_plan(
+            config=config, root_dir=root_dir, context=test_context, catalog=catalog
+        )
+        assert [plan_item.src for plan_item in plan] == [root_dir / "foo.txt"]
+
+
+def test_plan_compact(tmp_path: Path, test_context: "Context") -> None:
+    from h3a.config import load_config
+    from h3a.plan import CompactPlan, PlanItem, format_plan_item, generate_plan
+
+    # -- Initialize plan items --
+    plan = [
+        PlanItem(
+            id=(i + 1),
+            src=(tmp_path / f"dir{i % 2}/{i}.txt"),
+            dest=(tmp_path / f"archive/dir{i % 2}/{i}_v1.txt"),
+            overwrite_flag=(i == 3),
+            src_size=(None if i == 4 else i * 10),
+            src_mtime_ns=(None if i == 4 else i * 1000),
+        )
+        for i in range(5)
+    ]
+    plan.append(
+        PlanItem(
+            id=6,
+            src=(tmp_path / "中文.txt"),
+            dest=(tmp_path / "archive/中文_v1.txt"),
+            overwrite_flag=False,
+        )
+    )
+
+    # -- Same items as a list --
+    compact_plan = CompactPlan(plan)
+    assert len(compact_plan) == len(plan)
+    assert list(compact_plan) == plan
+    assert [format_plan_item(plan_item) for plan_item in compact_plan] == [
+        format_plan_item(plan_item) for plan_item in plan
+    ]
+    assert len(compact_plan.dirs) == 6
+
+    # -- Indexing --
+    assert compact_plan[0] == plan[0]
+    assert compact_plan[-1] == plan[-1]
+    assert compact_plan[1:4] == plan[1:4]
+    assert compact_plan[::-2] == plan[::-2]
+    with raises(IndexError):
+        compact_plan[len(plan)]
+    with raises(IndexError):
+        compact_plan[-len(plan) - 1]
+
+    # -- Compact plans are generated --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("bar")
+    config = load_config("include:\n  - '*.txt'\nout_dir: archive\n")
+    compact_plan = generate_plan(
+        config=config, root_dir=tmp_path, context=test_context, compact=True
+    )
+    assert isinstance(compact_plan, CompactPlan)
+    assert {plan_item.src.name for plan_item in compact_plan} == {"foo.txt", "bar.txt"}
+
+
+def test_plan_tag_renderer(monkeypatch: MonkeyPatch) -> None:
+    from time import localtime, strftime
+
+    from h3a import plan
+
+    # -- Tags are rendered once per second --
+    tag_renderer = plan.TagRenderer("_%Y%m%d-%H%M%S", r"_\d{8}-\d{6}")
+    assert tag_renderer.render(1000.2) == strftime("_%Y%m%d-%H%M%S", localtime(1000))
+    assert tag_renderer.render(1000.9) == tag_renderer.render(1000.2)
+    assert list(tag_renderer.tags) == [1000]
+    assert tag_renderer.matches("_20021011-123456")
+    assert not tag_renderer.matches("_20021011-123456.txt")
+
+    # -- The memo is bounded --
+    monkeypatch.setattr(plan, "TAG_CACHE_SIZE", 2)
+    for seconds in range(5):
+        tag_renderer.render(seconds)
+    assert len(tag_renderer.tags) <= 2
+
+    # -- Incompatible tags --
+    tag_renderer = plan.TagRenderer("_%Y", "_backup")
+    with raises(RuntimeError, match="Generated tag '_1970' is incompatible"):
+        tag_renderer.render(43200)
@@ -0,0 +1,194 @@
+import os
+from contextlib import chdir
+from pathlib import Path
+
+from pytest import raises
+
+
+def test_planfile_roundtrip(tmp_path: Path) -> None:
+    from h3a.plan import PlanItem
+    from h3a.planfile import load_plan_file, write_plan_file
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("bar")
+    (tmp_path / "archive").mkdir()
+    (tmp_path / "archive/bar_v1.txt").write_text("old")
+    plan = [
+        PlanItem(
+            id=1,
+            src=(tmp_path / "foo.txt"),
+            dest=(tmp_path / "archive/foo_v1.txt"),
+            overwrite_flag=False,
+            src_size=3,
+            src_mtime_ns=(tmp_path / "foo.txt").stat().st_mtime_ns,
+        ),
+        PlanItem(
+            id=2,
+            src=(tmp_path / "bar.txt"),
+            dest=(tmp_path / "archive/bar_v1.txt"),
+            overwrite_flag=True,
+        ),
+    ]
+
+    # -- One line per plan item --
+    plan_path = tmp_path / "plan.h3ap"
+    assert write_plan_file(plan_path, plan, fingerprint="foo") == 2
+    assert len(plan_path.read_text().splitlines()) == 3
+    assert set(path.name for path in tmp_path.iterdir()) == {
+        "foo.txt",
+        "bar.txt",
+        "archive",
+        "plan.h3ap",
+    }
+
+    # -- Plans are loaded as written, with the sizes and mtimes of sources --
+    assert list(load_plan_file(plan_path, fingerprint="foo")) == [
+        plan[0],
+        plan[1]._replace(
+            src_size=3, src_mtime_ns=(tmp_path / "bar.txt").stat().st_mtime_ns
+        ),
+    ]
+
+    # -- Sizes and mtimes from planning are written as they are --
+    write_plan_file(plan_path, [plan[0]._replace(src_mtime_ns=0)], fingerprint="foo")
+    with raises(RuntimeError, match="Source file changed since planning: "):
+        load_plan_file(plan_path, fingerprint="foo")
+    write_plan_file(plan_path, plan, fingerprint="foo")
+
+    # -- Split and concatenated parts load with a header per part --
+    header_line, *item_lines = plan_path.read_text().splitlines(keepends=True)
+    split_paths = [tmp_path / "part1.h3ap", tmp_path / "part2.h3ap"]
+    for split_path, item_line in zip(split_paths, item_lines, strict=True):
+        split_path.write_text(header_line + item_line)
+    assert [
+        [plan_item.src for plan_item in load_plan_file(split_path, fingerprint="foo")]
+        for split_path in split_paths
+    ] == [[plan[0].src], [plan[1].src]]
+    joined_path = tmp_path / "joined.h3ap"
+    joined_path.write_text("".join(path.read_text() for path in split_paths))
+    assert len(load_plan_file(joined_path, fingerprint="foo")) == 2
+    joined_path.write_text(
+        split_paths[0].read_text()
+        + split_paths[1].read_text().replace('"foo"', '"bar"', 1)
+    )
+    with raises(RuntimeError, match="Plan file was generated with a different config"):
+        load_plan_file(joined_path, fingerprint="foo")
+    split_paths[1].write_text(item_lines[1])
+    with raises(RuntimeError, match="Plan file is corrupt: "):
+        load_plan_file(split_paths[1], fingerprint="foo")
+    for path in [*split_paths, joined_path]:
+        path.unlink()
+
+    # -- Dest files appeared since planning --
+    (tmp_path / "archive/foo_v1.txt").write_text("new")
+    with raises(RuntimeError, match="Destination file appeared since planning: "):
+        load_plan_file(plan_path, fingerprint="foo")
+    (tmp_path / "archive/foo_v1.txt").unlink()
+
+    # -- Sources changed since planning --
+    (tmp_path / "bar.txt").write_text("changed")
+    with raises(RuntimeError, match="Source file changed since planning: "):
+        load_plan_file(plan_path, fingerprint="foo")
+
+    # -- Sources disappeared since planning --
+    (tmp_path / "foo.txt").unlink()
+    with raises(RuntimeError, match="Source file disappeared since planning: "):
+        load_plan_file(plan_path, fingerprint="foo")
+
+
+def test_planfile_invalid(tmp_path: Path) -> None:
+    from h3a.planfile import load_plan_file, write_plan_file
+
+    # -- Different config --
+    plan_path = tmp_path / "plan.h3ap"
+    write_plan_file(plan_path, [], fingerprint="foo")
+    with raises(RuntimeError, match="Plan file was generated with a different config"):
+        load_plan_file(plan_path, fingerprint="bar")
+
+    # -- Different version --
+    plan_path.write_text('{"version":0,"fingerprint":"foo"}\n')
+    with raises(RuntimeError, match="Plan file version mismatch: "):
+        load_plan_file(plan_path, fingerprint="foo")
+
+    # -- Corrupt files --
+    for text in ["", "{\n", '{"version":1,"fingerprint":"foo"}\n[1,"a"]\n']:
+        plan_path.write_text(text)
+        with raises(RuntimeError, match="Plan file is corrupt: "):
+            load_plan_file(plan_path, fingerprint="foo")
+
+
+def test_planfile_cli(tmp_path: Path) -> None:
+    import json
+
+    from click.testing import CliRunner
+
+    from h3a.cli import CliResult, main
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("bar")
+    (tmp_path / "h3a.yaml").write_text(
+        "include:\n"
+        "  - '*.txt'\n"
+        "out_dir: archive\n"
+        "tag_format: _v1\n"
+        "tag_pattern: _v1\n"
+        "manifest: manifest.json\n"
+    )
+
+    # -- Plans are written by dry runs --
+    cli_runner = CliRunner()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["--dry-run", "--plan-out", "plan.h3ap"], standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    assert isinstance(cli_result.return_value, CliResult)
+    assert len(cli_result.return_value.plan) == 2
+    assert not (tmp_path / "archive").exists()
+
+    # -- Plan files are executed without a scan --
+    (tmp_path / "baz.txt").write_text("baz")
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["-y", "--plan-in", "plan.h3ap"], standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    assert "Loaded plan:" in cli_result.output
+    assert sorted(os.listdir(tmp_path / "archive")) == ["bar_v1.txt", "foo_v1.txt"]
+    manifest_data = json.loads((tmp_path / "manifest.json").read_text())
+    assert sorted(manifest_data["entries"]) == ["bar.txt", "foo.txt"]
+
+    # -- Plan files are checked before execution --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["-y", "--plan-in", "plan.h3ap"], standalone_mode=False
+        )
+    assert isinstance(cli_result.exception, RuntimeError)
+    assert "Destination file appeared since planning: " in str(cli_result.exception)
+
+    # -- Empty plan files --
+    (tmp_path / "empty.yaml").write_text("include:\n  - missing.txt\n")
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main,
+            ["-c", "empty.yaml", "--dry-run", "--plan-out", "empty.h3ap"],
+            standalone_mode=False,
+        )
+        cli_result = cli_runner.invoke(
+            main, ["-c", "empty.yaml", "--plan-in", "empty.h3ap"], standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    assert "An empty plan was loaded. Nothing to do." in cli_result.output
+
+    # -- Conflicting options --
+    for args in [
+        ["--plan-in", "plan.h3ap", "--plan-out", "other.h3ap"],
+        ["-y", "--stream", "--plan-in", "plan.h3ap"],
+        ["-y", "--stream", "--plan-out", "plan.h3ap"],
+    ]:
+        with chdir(tmp_path):
+            cli_result = cli_runner.invoke(main, args)
+        assert cli_result.exit_code == 2
+        assert "can't be used with --stream" in cli_result.output
@@ -0,0 +1,215 @@
+import json
+from contextlib import chdir
+from pathlib import Path
+from threading import Thread
+
+from pytest import MonkeyPatch, raises
+
+
+def test_profile_latencies() -> None:
+    from h3a.profile import LATENCY_BUCKET_SECONDS, get_percentile, summarize_latencies
+
+    # -- Nearest-rank percentiles --
+    samples = [float(i) for i in range(1, 101)]
+    assert get_percentile(samples, 50) == 50.0
+    assert get_percentile(samples, 95) == 95.0
+    assert get_percentile(samples, 99) == 99.0
+    assert get_percentile([3.0], 50) == 3.0
+    assert get_percentile([1.0, 2.0], 1) == 1.0
+
+    # -- Summaries --
+    report = summarize_latencies([0.003, 0.00005, 0.001, 20.0])
+    assert report["count"] == 4
+    assert report["max_seconds"] == 20.0
+    assert report["p50_seconds"] == 0.001
+    assert report["p99_seconds"] == 20.0
+    assert len(report["histogram"]) == len(LATENCY_BUCKET_SECONDS) + 1
+    bucket_counts = {
+        bucket["le"]: bucket["count"]
+        for bucket in report["histogram"]
+        if bucket["count"] > 0
+    }
+    assert bucket_counts == {0.0001: 1, 0.001: 1, 0.005: 1, None: 1}
+
+    with raises(RuntimeError, match="No latency samples"):
+        summarize_latencies([])
+
+
+def test_profile_profiler() -> None:
+    from h3a.profile import Profiler
+
+    profiler = Profiler()
+
+    # -- Phases add up by name --
+    with profiler.phase("foo"):
+        pass
+    with raises(ValueError):
+        with profiler.phase("foo"):
+            raise ValueError()
+    assert profiler.phases["foo"]["calls"] == 2
+
+    # -- Iterators are timed by item, even when closed early --
+    assert list(profiler.iter_timed("bar", range(3))) == [0, 1, 2]
+    timed_items = profiler.iter_timed("baz", range(3))
+    assert next(timed_items) == 0
+    timed_items.close()
+    assert profiler.phases["bar"]["calls"] == 1
+    assert profiler.phases["baz"]["calls"] == 1
+
+    # -- Counters and latencies are merged across threads --
+    def record() -> None:
+        for _ in range(100):
+            profiler.count("items")
+            profiler.add_latency("item", 0.001)
+
+    threads = [Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    profiler.count("dirs", 2)
+
+    report = profiler.get_report(threads=4)
+    assert report["threads"] == 4
+    assert report["counters"] == {"dirs": 2, "items": 400}
+    assert report["latencies"]["item"]["count"] == 400
+    assert report["latencies"]["item"]["p99_seconds"] == 0.001
+    assert list(report["phases"]) == ["foo", "bar", "baz"]
+    assert report["wall_seconds"] >= 0
+    assert report["host"]["python"]
+
+
+def test_profile_version(monkeypatch: MonkeyPatch) -> None:
+    from importlib.metadata import PackageNotFoundError
+
+    from h3a import profile
+
+    # -- Installed version --
+    monkeypatch.setattr(profile, "version", lambda name: "1.2.3")
+    assert profile.get_h3a_version() == "1.2.3"
+    assert profile.Profiler().get_report(threads=1)["h3a_version"] == "1.2.3"
+
+    # -- Not installed --
+    def raise_not_found(name: str) -> str:
+        raise PackageNotFoundError(name)
+
+    monkeypatch.setattr(profile, "version", raise_not_found)
+    assert profile.get_h3a_version() == "unknown"
+    assert profile.Profiler().get_report(threads=1)["h3a_version"] == "unknown"
+
+
+def test_profile_cli(tmp_path: Path) -> None:
+    from click.testing import CliRunner
+
+    from h3a.cli import main
+
+    # -- Initialize test files --
+    (tmp_path / "foo").mkdir()
+    (tmp_path / "foo/a.txt").write_text("a")
+    (tmp_path / "foo/b.txt").write_text("b" * 10)
+    (tmp_path / "c.txt").write_text("c" * 100)
+    (tmp_path / "archive").mkdir()
+    (tmp_path / "archive/c_v0.txt").write_text("c")
+    config_text = (
+        "include:\n"
+        "  - '*.txt'\n"
+        "  - 'foo/*.txt'\n"
+        "out_dir: archive\n"
+        "tag_format: _v1\n"
+        "tag_pattern: _v\\d\n"
+        "skip_identical: true\n"
+        "manifest: manifest.json\n"
+        "keep_last: 1\n"
+        "chunk_threshold: 50\n"
+        "chunk_size: 50\n"
+        "batch_threshold: 0\n"
+    )
+    (tmp_path / "h3a.yaml").write_text(config_text)
+
+    # -- Phases, counters and latencies of a run --
+    cli_runner = CliRunner()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["-y", "--profile", "profile.json"], standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    report = json.loads((tmp_path / "profile.json").read_text())
+    assert list(report["phases"]) == [
+        "load_config",
+        "load_manifest",
+        "plan.scan",
+        "plan",
+        "prune_plan",
+        "print_plan",
+        "execute",
+        "prune",
+        "save",
+    ]
+    assert report["counters"] == {
+        "execute.mkdirs": 2,
+        "execute.size_stats": 0,
+        "plan.dest_listings": 2,
+        "plan.latest_stats": 1,
+        "plan.src_stats": 3,
+        "plan.version_listings": 2,
+        "prune.unlinks": 1,
+        "scan.files": 3,
+        "scan.listings": 2,
+        "scan.stats": 0,
+    }
+    assert report["latencies"]["execute.item"]["count"] == 2
+    assert report["latencies"]["execute.chunk"]["count"] == 2
+    assert not (tmp_path / "archive/c_v0.txt").exists()
+
+    # -- Streamed runs --
+    (tmp_path / "foo/a.txt").write_text("aa")
+    (tmp_path / "h3a.yaml").write_text(
+        config_text.replace("_v1", "_v2", 1) + "catalog: catalog.json\n"
+    )
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main,
+            ["-y", "--stream", "--profile", "profile.json"],
+            standalone_mode=False,
+        )
+    assert cli_result.exception is None, cli_result.output
+    report = json.loads((tmp_path / "profile.json").read_text())
+    assert list(report["phases"]) == [
+        "load_config",
+        "load_manifest",
+        "load_catalog",
+        "plan.scan",
+        "stream",
+        "prune_plan",
+        "prune",
+        "save",
+    ]
+    assert report["counters"]["scan.files"] == 3
+    assert report["counters"]["execute.mkdirs"] == 1
+    assert report["latencies"]["execute.item"]["count"] == 1
+
+    # -- Loaded plans --
+    (tmp_path / "h3a.yaml").write_text(config_text.replace("_v1", "_v3", 1))
+    (tmp_path / "c.txt").write_text("c" * 101)
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["--dry-run", "--plan-out", "plan.jsonl"], standalone_mode=False
+        )
+        assert cli_result.exception is None, cli_result.output
+        cli_result = cli_runner.invoke(
+            main,
+            ["-y", "--plan-in", "plan.jsonl", "--profile", "profile.json"],
+            standalone_mode=False,
+        )
+    assert cli_result.exception is None, cli_result.output
+    report = json.loads((tmp_path / "profile.json").read_text())
+    assert list(report["phases"]) == [
+        "load_config",
+        "load_manifest",
+        "load_plan",
+        "prune_plan",
+        "print_plan",
+        "execute",
+        "prune",
+        "save",
+    ]
@@ -0,0 +1,145 @@
+from pathlib import Path
+from threading import Thread
+from typing import TYPE_CHECKING
+
+from pytest import CaptureFixture, LogCaptureFixture, MonkeyPatch
+
+if TYPE_CHECKING:
+    from h3a.context import Context  # pragma: no cover
+
+
+def test_progress_per_thread() -> None:
+    from h3a.progress import PerThread
+
+    # -- Each thread gets its own value --
+    counters = PerThread(lambda: [0])
+    counters.get()[0] += 1
+    counters.get()[0] += 1
+
+    def count() -> None:
+        for _ in range(1000):
+            counters.get()[0] += 1
+
+    threads = [Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(counters.get_all()) == 5
+    assert sorted(counter[0] for counter in counters.get_all()) == [2] + [1000] * 4
+
+
+def test_progress_meter() -> None:
+    from h3a.progress import (
+        PROGRESS_SMOOTHING,
+        ProgressMeter,
+        format_bytes,
+        format_duration,
+        format_progress,
+    )
+
+    # -- Formatting --
+    assert format_bytes(0) == "0 B"
+    assert format_bytes(1023) == "1023 B"
+    assert format_bytes(1536) == "1.5 KiB"
+    assert format_bytes(3 * 1024**3) == "3.0 GiB"
+    assert format_bytes(2048 * 1024**5) == "2048.0 PiB"
+    assert format_duration(5.4) == "0:05"
+    assert format_duration(3725) == "1:02:05"
+
+    # -- Throughput is smoothed and the ETA goes by bytes --
+    meter = ProgressMeter(10, 4000, start_time=100.0)
+    snapshot = meter.update(101.0, 1, 1000)
+    assert snapshot.bytes_per_second == 1000
+    assert snapshot.eta_seconds == 3.0
+    assert format_progress(snapshot) == (
+        "1/10 item(s), 1000 B/3.9 KiB, 1000 B/s, ETA 0:03"
+    )
+    snapshot = meter.update(102.0, 2, 3000)
+    assert snapshot.bytes_per_second == 1000 + PROGRESS_SMOOTHING * 1000
+    assert snapshot.elapsed_seconds == 2.0
+    assert meter.update(102.0, 2, 3000).bytes_per_second == snapshot.bytes_per_second
+
+    # -- The ETA goes by items without bytes --
+    meter = ProgressMeter(4, 0, start_time=0.0)
+    assert meter.update(1.0, 0, 0).eta_seconds is None
+    assert meter.update(2.0, 1, 0).eta_seconds == 6.0
+
+    # -- Unknown totals have no ETA --
+    meter = ProgressMeter(None, None, start_time=0.0)
+    snapshot = meter.update(1.0, 3, 2048)
+    assert snapshot.eta_seconds is None
+    assert format_progress(snapshot) == "3 item(s), 2.0 KiB, 2.0 KiB/s"
+
+    # -- The final throughput is the average --
+    meter = ProgressMeter(2, 100, start_time=0.0)
+    meter.update(1.0, 1, 90)
+    snapshot = meter.finish(4.0, 2, 100)
+    assert snapshot.bytes_per_second == 25
+    assert snapshot.eta_seconds is None
+    assert meter.finish(0.0, 0, 0).bytes_per_second == 0
+
+
+def test_progress_execute(
+    tmp_path: Path,
+    test_context: "Context",
+    monkeypatch: MonkeyPatch,
+    caplog: LogCaptureFixture,
+    capsys: CaptureFixture[str],
+) -> None:
+    from h3a import execute
+    from h3a.plan import PlanItem
+
+    # -- Initialize test files --
+    (tmp_path / "small.bin").write_bytes(b"0" * 100)
+    (tmp_path / "large.bin").write_bytes(b"1" * 10_000)
+    plan = [
+        PlanItem(
+            id=1,
+            src=(tmp_path / "small.bin"),
+            dest=(tmp_path / "archive/small.bin"),
+            overwrite_flag=False,
+        ),
+        PlanItem(
+            id=2,
+            src=(tmp_path / "large.bin"),
+            dest=(tmp_path / "archive/large.bin"),
+            overwrite_flag=False,
+        ),
+    ]
+    assert list(execute.get_plan_sizes(plan, with_inodes=False).sizes) == [100, 10_000]
+    test_context.chunk_threshold = 1000
+    test_context.chunk_size = 1000
+    test_context._execute_delay_seconds = 0.02
+    monkeypatch.setattr(execute, "PROGRESS_REFRESH_SECONDS", 0.005)
+    monkeypatch.setattr(execute, "PROGRESS_LOG_SECONDS", 0.005)
+
+    # -- Progress is logged at a fixed rate with bytes --
+    with caplog.at_level("INFO"):
+        stats = execute.execute_plan(plan, context=test_context)
+    assert stats.finished_items == 2
+    assert stats.finished_bytes == 10_100
+    assert "Progress: " in caplog.text
+    assert "Executed: 2/2 item(s), 9.9 KiB/9.9 KiB, " in caplog.text
+
+    # -- The progress bar moves by bytes --
+    for plan_item in plan:
+        plan_item.dest.unlink()
+    test_context.verbose = False
+    stats = execute.execute_plan(plan, context=test_context)
+    assert stats.finished_bytes == 10_100
+    assert "Executing" in capsys.readouterr().err
+
+    # -- Empty files are counted by items --
+    (tmp_path / "empty.bin").write_bytes(b"")
+    empty_plan = [
+        PlanItem(
+            id=1,
+            src=(tmp_path / "empty.bin"),
+            dest=(tmp_path / "archive/empty.bin"),
+            overwrite_flag=False,
+        )
+    ]
+    stats = execute.execute_plan(empty_plan, context=test_context)
+    assert stats.finished_items == 1
+    assert stats.finished_bytes == 0
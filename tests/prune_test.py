@@ -0,0 +1,288 @@
+import json
+from contextlib import chdir
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from click.testing import CliRunner
+from pytest import LogCaptureFixture, MonkeyPatch
+
+if TYPE_CHECKING:
+    from h3a.context import Context  # pragma: no cover
+
+
+def create_versions(out_dir: Path, name: str, mtimes: list[int]) -> list[Path]:
+    import os
+
+    stem, suffix = name.split(".")
+    version_paths: list[Path] = []
+    for i, mtime in enumerate(mtimes, start=1):
+        version_path = out_dir / f"{stem}_v{i}.{suffix}"
+        version_path.parent.mkdir(parents=True, exist_ok=True)
+        version_path.write_text(f"{stem} {i}")
+        os.utime(version_path, (mtime, mtime))
+        version_paths.append(version_path)
+    return version_paths
+
+
+def test_prune_plan(tmp_path: Path) -> None:
+    from h3a.catalog import load_catalog
+    from h3a.config import load_config
+    from h3a.plan import PlanItem
+    from h3a.prune import PruneItem, format_prune_item, generate_prune_plan
+
+    # -- Initialize test files --
+    now = 1_700_000_000
+    day = 86400
+    out_dir = tmp_path / "archive"
+    foo_paths = create_versions(
+        out_dir, "foo.txt", [now - 4 * day, now - 2 * day, now - 4 * day, now - 4 * day]
+    )
+    bar_paths = create_versions(out_dir / "baz", "bar.txt", [now - 9 * day] * 3)
+    (out_dir / "untagged.txt").write_text("untagged")
+    plan = [
+        PlanItem(
+            id=1,
+            src=(tmp_path / "foo.txt"),
+            dest=(out_dir / "foo_v5.txt"),
+            overwrite_flag=False,
+        )
+    ]
+
+    def prune(config_text: str) -> list[Path]:
+        config = load_config(
+            f"include:\n  - '*.txt'\n  - 'baz/*.txt'\nout_dir: archive\n{config_text}"
+        )
+        prune_plan = generate_prune_plan(
+            config=config, root_dir=tmp_path, plan=plan, first_id=2, now=now
+        )
+        assert [prune_item.id for prune_item in prune_plan] == list(
+            range(2, len(prune_plan) + 2)
+        )
+        return [prune_item.path for prune_item in prune_plan]
+
+    # -- Retention is disabled by default --
+    assert prune("") == []
+
+    # -- Planned versions count as the latest ones --
+    # (Tags that don't parse with the tag format are ordered by mtime.)
+    assert prune("keep_last: 2\ntag_pattern: _v\\d\n") == [
+        foo_paths[0],
+        foo_paths[2],
+        foo_paths[3],
+        bar_paths[0],
+    ]
+
+    # -- The latest version is kept however old it is --
+    assert prune("keep_within: 3d\ntag_pattern: _v\\d\n") == [
+        foo_paths[0],
+        foo_paths[2],
+        foo_paths[3],
+        bar_paths[0],
+        bar_paths[1],
+    ]
+
+    # -- Versions kept by either rule are kept --
+    assert prune("keep_last: 2\nkeep_within: 3d\ntag_pattern: _v\\d\n") == [
+        foo_paths[0],
+        foo_paths[2],
+        foo_paths[3],
+        bar_paths[0],
+    ]
+
+    # -- Catalog entries of deleted versions are skipped --
+    config = load_config(
+        "include:\n  - '**/*.txt'\nout_dir: archive\ntag_pattern: _v\\d\n"
+        "keep_within: 1d\ncatalog: catalog.json\n"
+    )
+    catalog = load_catalog(tmp_path / "catalog.json", config=config, root_dir=tmp_path)
+    bar_paths[0].unlink()
+    assert generate_prune_plan(
+        config=config, root_dir=tmp_path, plan=[], catalog=catalog, now=now
+    ) == [
+        PruneItem(id=1, path=foo_paths[0]),
+        PruneItem(id=2, path=foo_paths[2]),
+        PruneItem(id=3, path=foo_paths[3]),
+        PruneItem(id=4, path=bar_paths[1]),
+    ]
+    assert format_prune_item(PruneItem(id=1, path=foo_paths[0])) == (
+        f"(1) {foo_paths[0]} -> (deleted)"
+    )
+
+
+def test_prune_scope(tmp_path: Path) -> None:
+    from h3a.catalog import load_catalog
+    from h3a.config import load_config
+    from h3a.prune import generate_prune_plan
+
+    # -- Initialize test files --
+    for name in [
+        "foo_31122023.txt",
+        "foo_01012024.txt",
+        "photo_20200101.jpg",
+        "photo_20200102.jpg",
+        "node_modules/lib_20200101.js",
+        "node_modules/lib_20200102.js",
+    ]:
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text(name)
+
+    def prune(config_text: str) -> list[str]:
+        config = load_config(
+            f"tag_format: _%d%m%Y\ntag_pattern: _\\d{{8}}\nkeep_last: 1\n{config_text}"
+        )
+        return [
+            prune_item.path.relative_to(tmp_path).as_posix()
+            for prune_item in generate_prune_plan(
+                config=config, root_dir=tmp_path, plan=[]
+            )
+        ]
+
+    # -- Versions are ordered by the time of their tags --
+    assert prune("include:\n  - '*.txt'\n") == ["foo_31122023.txt"]
+
+    # -- Versions of sources outside include/exclude are kept --
+    assert prune("include:\n  - '**/*.js'\nexclude:\n  - 'node_modules/*'\n") == []
+    assert prune("include:\n  - '**/*.js'\n") == ["node_modules/lib_20200101.js"]
+
+    # -- Catalog entries of deleted versions are skipped --
+    config = load_config(
+        "include:\n  - '*.txt'\ntag_format: _%d%m%Y\ntag_pattern: _\\d{8}\n"
+        "keep_within: 1d\ncatalog: catalog.json\n"
+    )
+    catalog = load_catalog(tmp_path / "catalog.json", config=config, root_dir=tmp_path)
+    (tmp_path / "foo_31122023.txt").unlink()
+    assert (
+        generate_prune_plan(config=config, root_dir=tmp_path, plan=[], catalog=catalog)
+        == []
+    )
+
+
+def test_prune_execute(
+    tmp_path: Path,
+    test_context: "Context",
+    monkeypatch: MonkeyPatch,
+    caplog: LogCaptureFixture,
+) -> None:
+    from h3a import execute
+    from h3a.catalog import load_catalog
+    from h3a.config import load_config
+    from h3a.prune import PruneItem
+
+    # -- Initialize test files --
+    out_dir = tmp_path / "archive"
+    version_paths = create_versions(out_dir, "foo.txt", [1_700_000_000] * 5)
+    config = load_config(
+        "include:\n  - '*.txt'\nout_dir: archive\ntag_pattern: _v\\d\n"
+        "catalog: catalog.json\n"
+    )
+    catalog = load_catalog(tmp_path / "catalog.json", config=config, root_dir=tmp_path)
+    prune_plan = [
+        PruneItem(id=i, path=version_path)
+        for i, version_path in enumerate(version_paths[:4], start=1)
+    ]
+    version_paths[0].unlink()
+
+    # -- Versions are deleted in batches --
+    monkeypatch.setattr(execute, "PRUNE_BATCH_SIZE", 3)
+    with caplog.at_level("INFO"):
+        assert execute.execute_prune_plan(
+            prune_plan, context=test_context, catalog=catalog
+        ) == len(prune_plan)
+    assert sorted(out_dir.iterdir()) == [version_paths[4]]
+    assert catalog.get_versions("foo.txt") == ["_v5"]
+    assert f"Version already deleted: {version_paths[0]}" in caplog.text
+    assert "Deleted 4 old version(s)." in caplog.text
+
+    # -- Without a catalog or verbose logging --
+    test_context.verbose = False
+    assert (
+        execute.execute_prune_plan(
+            [PruneItem(id=1, path=version_paths[4])], context=test_context
+        )
+        == 1
+    )
+    assert list(out_dir.iterdir()) == []
+
+
+def test_prune_cli(tmp_path: Path) -> None:
+    from h3a.cli import CliResult, main
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    create_versions(tmp_path / "archive", "foo.txt", [1_700_000_000] * 2)
+    config_text = (
+        "include:\n"
+        "  - '*.txt'\n"
+        "out_dir: archive\n"
+        "tag_format: _v3\n"
+        "tag_pattern: _v\\d\n"
+        "keep_last: 2\n"
+    )
+    (tmp_path / "h3a.yaml").write_text(config_text)
+
+    # -- Deletes are shown after the copies --
+    cli_runner = CliRunner()
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["--dry-run"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert cli_result.output.splitlines() == [
+        "Generated plan:",
+        f"(1) {tmp_path / 'foo.txt'} -> {tmp_path / 'archive/foo_v3.txt'}",
+        f"(2) {tmp_path / 'archive/foo_v1.txt'} -> (deleted)",
+    ]
+
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["--dry-run", "--plan-format", "jsonl"], standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    assert json.loads(cli_result.stdout.splitlines()[-1]) == {
+        "id": 2,
+        "delete": str(tmp_path / "archive/foo_v1.txt"),
+    }
+
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(
+            main, ["--dry-run", "--plan-summary"], standalone_mode=False
+        )
+    assert cli_result.exception is None, cli_result.output
+    assert "1 old version(s) to delete.\n" in cli_result.output
+
+    # -- Deletes are executed after the copies --
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert sorted(path.name for path in (tmp_path / "archive").iterdir()) == [
+        "foo_v2.txt",
+        "foo_v3.txt",
+    ]
+
+    # -- A plan of deletes only isn't empty --
+    (tmp_path / "h3a.yaml").write_text(
+        config_text.replace("keep_last: 2", "keep_last: 1\non_conflict: skip")
+    )
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    cli_return_value: object = cli_result.return_value
+    assert isinstance(cli_return_value, CliResult)
+    assert len(cli_return_value.plan) == 0
+    assert len(cli_return_value.prune_plan) == 1
+    assert sorted(path.name for path in (tmp_path / "archive").iterdir()) == [
+        "foo_v3.txt"
+    ]
+
+    # -- Streamed plans are pruned at last --
+    (tmp_path / "h3a.yaml").write_text(
+        config_text.replace("_v3", "_v4").replace("keep_last: 2", "keep_last: 1")
+    )
+    with chdir(tmp_path):
+        cli_result = cli_runner.invoke(main, ["-y", "--stream"], standalone_mode=False)
+    assert cli_result.exception is None, cli_result.output
+    assert cli_result.stdout.splitlines()[-2:] == [
+        "Executed a streamed plan of 1 item(s).",
+        "Deleted 1 old version(s).",
+    ]
+    assert sorted(path.name for path in (tmp_path / "archive").iterdir()) == [
+        "foo_v4.txt"
+    ]
@@ -0,0 +1,286 @@
+import os
+from glob import glob
+from pathlib import Path
+from typing import Never
+
+from pytest import MonkeyPatch, mark
+
+PATTERNS = [
+    "*.txt",
+    "**/*.txt",
+    "**",
+    "foo/**",
+    "foo/bar/**/*.txt",
+    "a.txt",
+    "foo/bar/baz/d.txt",
+    ".hidden/**",
+    ".hidden/*/*.txt",
+    "*/*.txt",
+    "**/.*.txt",
+    "foo/*/baz/*",
+    "**/baz",
+    "missing/a.txt",
+    "foo/",
+    "?.txt",
+    "[d-g]*/*.txt",
+    "**/**/*.md",
+]
+
+
+def init_test_files(root_dir: Path) -> None:
+    (root_dir / "a.txt").write_text("a")
+    (root_dir / ".b.txt").write_text("b")
+    (root_dir / "foo/bar/baz").mkdir(parents=True)
+    (root_dir / "foo/c.txt").write_text("c")
+    (root_dir / "foo/bar/c.md").write_text("c")
+    (root_dir / "foo/bar/baz/d.txt").write_text("d")
+    (root_dir / "foo/bar/baz/e").write_text("e")
+    (root_dir / ".hidden/foo").mkdir(parents=True)
+    (root_dir / ".hidden/f.txt").write_text("f")
+    (root_dir / ".hidden/foo/g.txt").write_text("g")
+    (root_dir / "gee").mkdir()
+    (root_dir / "gee/.h.txt").write_text("h")
+    (root_dir / "gee/i.TXT").write_text("i")
+
+
+@mark.parametrize("pattern", PATTERNS)
+def test_scan_glob_compatible(tmp_path: Path, pattern: str) -> None:
+    from h3a.scan import Scanner
+
+    # -- Initialize test files --
+    init_test_files(tmp_path)
+
+    # -- Compare with glob --
+    expected_paths = set(
+        path
+        for path in glob(pattern, root_dir=tmp_path, recursive=True)
+        if (tmp_path / path).is_file()
+    )
+    assert set(Scanner([pattern]).scan(tmp_path)) == expected_paths
+
+
+def test_scan_multiple_patterns(tmp_path: Path) -> None:
+    from h3a.scan import Scanner
+
+    # -- Initialize test files --
+    init_test_files(tmp_path)
+
+    # -- Scan once with all patterns --
+    scanned_paths = list(Scanner(PATTERNS).scan(tmp_path))
+    assert len(scanned_paths) == len(set(scanned_paths))
+    assert set(scanned_paths) == set(
+        path
+        for pattern in PATTERNS
+        for path in glob(pattern, root_dir=tmp_path, recursive=True)
+        if (tmp_path / path).is_file()
+    )
+
+
+def test_scan_dot_components(tmp_path: Path) -> None:
+    from h3a.scan import Scanner
+
+    # -- Initialize test files --
+    init_test_files(tmp_path)
+
+    # -- `.` and `..` are followed like `glob` does --
+    for patterns in [
+        ["./a.txt", ".*.txt"],
+        ["foo/../a.txt", "*.md"],
+        ["foo/./bar/*.md", "foo/*.txt"],
+        ["./foo/../foo/*.txt", "*.txt"],
+        ["foo/.", "foo/..", "*.txt"],
+    ]:
+        scanned_paths = [
+            os.path.normpath(path) for path in Scanner(patterns).scan(tmp_path)
+        ]
+        assert len(scanned_paths) == len(set(scanned_paths))
+        assert set(scanned_paths) == set(
+            os.path.normpath(path)
+            for pattern in patterns
+            for path in glob(pattern, root_dir=tmp_path, recursive=True)
+            if (tmp_path / path).is_file()
+        )
+
+    # -- Files found under several anchors are scanned once --
+    scanned_paths = list(Scanner(["a.txt", str(tmp_path / "*.txt")]).scan(tmp_path))
+    assert scanned_paths == ["a.txt"]
+
+
+def test_scan_single_pass(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    from h3a import scan
+
+    # -- Initialize test files --
+    init_test_files(tmp_path)
+
+    # -- Count directory listings --
+    listed_dirs: list[str] = []
+    original_scandir = os.scandir
+
+    def counting_scandir(path: str) -> "os._ScandirIterator[str]":
+        listed_dirs.append(os.path.relpath(path, tmp_path))
+        return original_scandir(path)
+
+    monkeypatch.setattr(scan.os, "scandir", counting_scandir)
+    scanned_paths = set(scan.Scanner(["**/*.txt", "**/*.md", "**/e"]).scan(tmp_path))
+
+    # -- Assert scan result --
+    assert scanned_paths == {
+        "a.txt",
+        os.path.join("foo", "c.txt"),
+        os.path.join("foo", "bar", "c.md"),
+        os.path.join("foo", "bar", "baz", "d.txt"),
+        os.path.join("foo", "bar", "baz", "e"),
+    }
+    assert sorted(listed_dirs) == [
+        ".",
+        "foo",
+        os.path.join("foo", "bar"),
+        os.path.join("foo", "bar", "baz"),
+        "gee",
+    ]
+
+
+def test_scan_literal(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    from h3a import scan
+
+    # -- Initialize test files --
+    init_test_files(tmp_path)
+
+    # -- Literal patterns need no directory listing --
+    def failing_scandir(path: str) -> Never:
+        raise AssertionError(f"Unexpected directory listing: {path}")
+
+    monkeypatch.setattr(scan.os, "scandir", failing_scandir)
+    scanned_paths = set(
+        scan.Scanner(["a.txt", "foo/bar/c.md", "foo/bar/baz", "missing"]).scan(tmp_path)
+    )
+    assert scanned_paths == {"a.txt", os.path.join("foo", "bar", "c.md")}
+
+
+def test_scan_files(tmp_path: Path) -> None:
+    from h3a import scan
+
+    # -- Initialize test files --
+    init_test_files(tmp_path)
+
+    # -- Stat results are carried with listed and probed files --
+    scanned_files = list(scan.Scanner(["*/*.txt", "foo/bar/c.md"]).scan_files(tmp_path))
+    assert {scanned_file.path for scanned_file in scanned_files} == {
+        os.path.join("foo", "c.txt"),
+        os.path.join("foo", "bar", "c.md"),
+    }
+    assert any(
+        isinstance(scanned_file.stat_source, os.stat_result)
+        for scanned_file in scanned_files
+    )
+    assert any(
+        not isinstance(scanned_file.stat_source, os.stat_result)
+        for scanned_file in scanned_files
+    )
+    for scanned_file in scanned_files:
+        assert scanned_file.stat() == os.stat(tmp_path / scanned_file.path)
+
+
+def test_scan_unreadable_dir(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    from h3a import scan
+
+    # -- Initialize test files --
+    init_test_files(tmp_path)
+
+    # -- Unreadable directories are ignored like in glob --
+    original_scandir = os.scandir
+
+    def partial_scandir(path: str) -> "os._ScandirIterator[str]":
+        if os.path.basename(path) == "bar":
+            raise PermissionError(path)
+        return original_scandir(path)
+
+    monkeypatch.setattr(scan.os, "scandir", partial_scandir)
+    scanned_paths = set(scan.Scanner(["**/*.txt"]).scan(tmp_path))
+    assert scanned_paths == {"a.txt", os.path.join("foo", "c.txt")}
+
+
+@mark.parametrize(
+    "exclude",
+    [
+        [],
+        ["a.txt"],
+        ["*.md"],
+        ["foo/*"],
+        ["foo/bar/**", "*.txt"],
+        ["*/c.*", "gee/?.TXT"],
+    ],
+)
+def test_scan_exclude_fnmatch_compatible(tmp_path: Path, exclude: list[str]) -> None:
+    from fnmatch import fnmatch
+
+    from h3a.scan import Scanner
+
+    # -- Initialize test files --
+    init_test_files(tmp_path)
+
+    # -- Compare with fnmatch --
+    all_paths = set(Scanner(["**", ".hidden/**"]).scan(tmp_path))
+    scanned_paths = set(Scanner(["**", ".hidden/**"], exclude).scan(tmp_path))
+    assert scanned_paths == set(
+        path
+        for path in all_paths
+        if not any(fnmatch(path, exclude_pattern) for exclude_pattern in exclude)
+    )
+
+
+def test_scan_exclude_pruning(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    from h3a import scan
+
+    # -- Initialize test files --
+    init_test_files(tmp_path)
+
+    # -- Count directory listings --
+    listed_dirs: list[str] = []
+    original_scandir = os.scandir
+
+    def counting_scandir(path: str) -> "os._ScandirIterator[str]":
+        listed_dirs.append(os.path.relpath(path, tmp_path))
+        return original_scandir(path)
+
+    monkeypatch.setattr(scan.os, "scandir", counting_scandir)
+    scanner = scan.Scanner(["**/*.txt", "foo/bar/c.md"], ["foo/bar/**", "gee*"])
+    scanned_paths = set(scanner.scan(tmp_path))
+
+    # -- Assert scan result --
+    assert scanned_paths == {"a.txt", os.path.join("foo", "c.txt")}
+    assert sorted(listed_dirs) == [".", "foo"]
+
+    # -- Assert exclude matcher --
+    assert scanner.exclude.matches(os.path.join("foo", "bar", "c.md"))
+    assert not scanner.exclude.matches(os.path.join("foo", "c.md"))
+    assert scanner.exclude.covers_dir(os.path.join("foo", "bar"))
+    assert scanner.exclude.covers_dir("geez")
+    assert not scanner.exclude.covers_dir("foo")
+    assert not scan.ExcludeMatcher(["foo/bar/*.txt"]).covers_dir("foo")
+    assert not scan.ExcludeMatcher([]).covers_dir("foo")
+
+
+def test_scan_matches(tmp_path: Path) -> None:
+    from h3a.scan import Scanner
+
+    # -- Initialize test files --
+    init_test_files(tmp_path)
+    all_paths = [
+        os.path.relpath(os.path.join(dir_path, name), tmp_path)
+        for dir_path, _, names in os.walk(tmp_path)
+        for name in names
+    ]
+
+    # -- Matches agree with scans --
+    for include, exclude in [
+        (PATTERNS, []),
+        (["**/*.txt", "foo/bar/c.md"], ["foo/bar/**", "gee*"]),
+        ([str(tmp_path / "foo/*.txt")], []),
+    ]:
+        scanner = Scanner(include, exclude)
+        scanned_paths = set(scanner.scan(tmp_path))
+        for path in all_paths:
+            if os.path.isabs(include[0]):
+                path = os.path.join(tmp_path, path)
+            assert scanner.matches(path) == (path in scanned_paths), path
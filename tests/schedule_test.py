@@ -0,0 +1,157 @@
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pytest import MonkeyPatch, raises
+
+if TYPE_CHECKING:
+    from conftest import CreatePlan  # pragma: no cover
+
+
+def test_schedule_order(tmp_path: Path, create_plan: "CreatePlan") -> None:
+    from h3a.schedule import iter_execute_units
+
+    # -- Initialize test files --
+    plan = create_plan(
+        tmp_path,
+        {
+            "b/small.txt": 10,
+            "a/large.txt": 1000,
+            "b/medium.txt": 100,
+            "a/small.txt": 10,
+        },
+    )
+
+    def get_order(**kwargs: object) -> list[str]:
+        return [
+            "+".join(
+                str(plan_item.src.relative_to(tmp_path))
+                for plan_item in unit.plan_items
+            )
+            for unit in iter_execute_units(plan, batch_threshold=0, **kwargs)
+        ]
+
+    def get_inode_order(*names: str) -> list[str]:
+        return sorted(names, key=lambda name: os.stat(tmp_path / name).st_ino)
+
+    # -- Plan order --
+    assert get_order() == [
+        "b/small.txt",
+        "a/large.txt",
+        "b/medium.txt",
+        "a/small.txt",
+    ]
+
+    # -- Largest first --
+    assert get_order(order="largest-first") == [
+        "a/large.txt",
+        "b/medium.txt",
+        "b/small.txt",
+        "a/small.txt",
+    ]
+
+    # -- Locality --
+    assert get_order(order="locality") == [
+        *get_inode_order("a/large.txt", "a/small.txt"),
+        *get_inode_order("b/small.txt", "b/medium.txt"),
+    ]
+
+    # -- Packed (large files first, then small files by locality) --
+    assert [
+        unit.plan_items
+        for unit in iter_execute_units(
+            plan, order="packed", batch_threshold=50, batch_size=2
+        )
+    ] == [[plan[1]], [plan[2]], [plan[3], plan[0]]]
+
+
+def test_schedule_batches(tmp_path: Path, create_plan: "CreatePlan") -> None:
+    from h3a.schedule import ExecuteUnit, iter_execute_units
+
+    # -- Initialize test files --
+    plan = create_plan(
+        tmp_path,
+        {
+            "foo.txt": 10,
+            "bar.txt": 20,
+            "baz.txt": 30,
+            "large.txt": 1000,
+            "blah.txt": 40,
+        },
+    )
+    (tmp_path / "blah.txt").unlink()
+
+    # -- Consecutive small files are batched --
+    assert list(iter_execute_units(plan, batch_threshold=100, batch_size=2)) == [
+        ExecuteUnit(plan_items=plan[0:2], size=30),
+        ExecuteUnit(plan_items=[plan[3]], size=1000),
+        ExecuteUnit(plan_items=[plan[2], plan[4]], size=30),
+    ]
+
+    # -- Sources are only stat'ed when needed --
+    assert list(iter_execute_units(plan, batch_threshold=0)) == [
+        ExecuteUnit(plan_items=[plan_item], size=0) for plan_item in plan
+    ]
+    assert list(iter_execute_units(plan, batch_threshold=0, stat_sources=True)) == [
+        ExecuteUnit(plan_items=[plan_item], size=size)
+        for plan_item, size in zip(plan, [10, 20, 30, 1000, 0])
+    ]
+
+    # -- Sizes from the scan are reused unless inodes are needed --
+    sized_plan = [plan_item._replace(src_size=5) for plan_item in plan]
+    assert list(
+        iter_execute_units(sized_plan, batch_threshold=0, stat_sources=True)
+    ) == [ExecuteUnit(plan_items=[plan_item], size=5) for plan_item in sized_plan]
+    assert sorted(
+        execute_unit.size
+        for execute_unit in iter_execute_units(
+            sized_plan, order="locality", batch_threshold=0
+        )
+    ) == [0, 10, 20, 30, 1000]
+
+
+def test_schedule_devices(
+    tmp_path: Path, create_plan: "CreatePlan", monkeypatch: MonkeyPatch
+) -> None:
+    from h3a import schedule
+    from h3a.schedule import (
+        ExecuteUnit,
+        get_existing_device,
+        iter_execute_units,
+        resolve_device_threads,
+    )
+
+    # -- Initialize test files --
+    plan = create_plan(tmp_path, {"foo.txt": 10, "bar.txt": 20, "baz.txt": 30})
+    device = os.stat(tmp_path).st_dev
+
+    # -- Devices of dest files --
+    device_cache: dict[Path, int] = {}
+    assert get_existing_device(tmp_path / "foo/bar/baz.txt", device_cache) == device
+    assert device_cache[tmp_path / "foo/bar"] == device
+    assert device_cache[tmp_path / "foo"] == device
+    assert get_existing_device(tmp_path / "foo/baz.txt", device_cache) == device
+    assert list(iter_execute_units(plan, batch_threshold=0, with_devices=True)) == [
+        ExecuteUnit(plan_items=[plan_item], size=size, devices=(device,))
+        for plan_item, size in zip(plan, [10, 20, 30])
+    ]
+
+    # -- Batches don't span devices --
+    def fake_get_existing_device(path: Path, device_cache: dict[Path, int]) -> int:
+        return device if path.name != "bar.txt" else device + 1
+
+    monkeypatch.setattr(schedule, "get_existing_device", fake_get_existing_device)
+    assert list(
+        iter_execute_units(plan, batch_threshold=100, batch_size=4, with_devices=True)
+    ) == [
+        ExecuteUnit(plan_items=[plan[0]], size=10, devices=(device,)),
+        ExecuteUnit(plan_items=[plan[1]], size=20, devices=(device, device + 1)),
+        ExecuteUnit(plan_items=[plan[2]], size=30, devices=(device,)),
+    ]
+
+    # -- Device threads by path --
+    assert resolve_device_threads({"foo.txt": 2, ".": 3}, root_dir=tmp_path) == {
+        device: 3
+    }
+    with raises(RuntimeError, match="Failed to find the device of: missing"):
+        resolve_device_threads({"missing": 1}, root_dir=tmp_path)
@@ -0,0 +1,373 @@
+import errno
+import os
+from pathlib import Path
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Never
+
+from pytest import LogCaptureFixture, MonkeyPatch, mark, raises
+
+if TYPE_CHECKING:
+    from h3a.context import Context  # pragma: no cover
+
+
+def unsupported_ioctl(fd: int, request: int, arg: int) -> Never:
+    raise OSError(errno.EOPNOTSUPP, os.strerror(errno.EOPNOTSUPP))
+
+
+def copying_ioctl(fd: int, request: int, arg: int) -> int:
+    from h3a.transfer import FICLONE
+
+    assert request == FICLONE
+    os.lseek(arg, 0, os.SEEK_SET)
+    os.write(fd, os.read(arg, os.fstat(arg).st_size))
+    return 0
+
+
+def test_transfer_copy(tmp_path: Path) -> None:
+    from h3a.transfer import transfer_file
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    os.utime(tmp_path / "foo.txt", (0, 0))
+
+    # -- Copy file --
+    transfer_result = transfer_file(
+        tmp_path / "foo.txt", tmp_path / "bar.txt", copy_mode="copy"
+    )
+    assert transfer_result.strategy == "copy"
+    assert transfer_result.bytes_copied == 3
+    assert (tmp_path / "bar.txt").read_text() == "foo"
+    assert os.stat(tmp_path / "bar.txt").st_mtime == 0
+
+
+def test_transfer_hardlink(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    from h3a import transfer
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("bar")
+
+    # -- Hardlink over an existing file --
+    transfer_result = transfer.transfer_file(
+        tmp_path / "foo.txt", tmp_path / "bar.txt", copy_mode="hardlink"
+    )
+    assert transfer_result == ("hardlink", 0)
+    assert os.path.samefile(tmp_path / "foo.txt", tmp_path / "bar.txt")
+    assert set(path.name for path in tmp_path.iterdir()) == {"foo.txt", "bar.txt"}
+
+    # -- Hardlink over a link to the same file --
+    for _ in range(2):
+        transfer_result = transfer.transfer_file(
+            tmp_path / "foo.txt", tmp_path / "bar.txt", copy_mode="hardlink"
+        )
+        assert transfer_result == ("hardlink", 0)
+    assert set(path.name for path in tmp_path.iterdir()) == {"foo.txt", "bar.txt"}
+
+    # -- Stale temp links are replaced --
+    (tmp_path / ".qux.txt.h3a-tmp").write_text("stale")
+    transfer.transfer_file(
+        tmp_path / "foo.txt", tmp_path / "qux.txt", copy_mode="hardlink"
+    )
+    assert os.path.samefile(tmp_path / "foo.txt", tmp_path / "qux.txt")
+    (tmp_path / "qux.txt").unlink()
+    assert set(path.name for path in tmp_path.iterdir()) == {"foo.txt", "bar.txt"}
+
+    # -- Missing sources are reported as-is --
+    with raises(FileNotFoundError):
+        transfer.transfer_file(
+            tmp_path / "missing.txt", tmp_path / "baz.txt", copy_mode="hardlink"
+        )
+
+    # -- Unsupported hardlinks fail cleanly --
+    def cross_device_link(src: Path, dest: Path) -> Never:
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setattr(transfer.os, "link", cross_device_link)
+    with raises(RuntimeError, match="Failed to hardlink: "):
+        transfer.transfer_file(
+            tmp_path / "foo.txt", tmp_path / "baz.txt", copy_mode="hardlink"
+        )
+    assert set(path.name for path in tmp_path.iterdir()) == {"foo.txt", "bar.txt"}
+
+
+def test_transfer_reflink(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    from h3a import transfer
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    os.utime(tmp_path / "foo.txt", (0, 0))
+    (tmp_path / "bar.txt").write_text("bar")
+
+    # -- Unsupported reflinks leave dest files untouched --
+    monkeypatch.setattr(transfer, "fcntl", SimpleNamespace(ioctl=unsupported_ioctl))
+    with raises(RuntimeError, match="Failed to reflink: "):
+        transfer.transfer_file(
+            tmp_path / "foo.txt", tmp_path / "bar.txt", copy_mode="reflink"
+        )
+    assert (tmp_path / "bar.txt").read_text() == "bar"
+    assert set(path.name for path in tmp_path.iterdir()) == {"foo.txt", "bar.txt"}
+
+    # -- Unsupported reflinks fall back to copies --
+    transfer_result = transfer.transfer_file(
+        tmp_path / "foo.txt", tmp_path / "bar.txt", copy_mode="reflink-or-copy"
+    )
+    assert transfer_result == ("copy", 3)
+    assert (tmp_path / "bar.txt").read_text() == "foo"
+
+    # -- Supported reflinks --
+    monkeypatch.setattr(transfer, "fcntl", SimpleNamespace(ioctl=copying_ioctl))
+    for copy_mode in ("reflink", "reflink-or-copy"):
+        (tmp_path / "baz.txt").unlink(missing_ok=True)
+        transfer_result = transfer.transfer_file(
+            tmp_path / "foo.txt", tmp_path / "baz.txt", copy_mode=copy_mode
+        )
+        assert transfer_result == ("reflink", 0)
+        assert (tmp_path / "baz.txt").read_text() == "foo"
+        assert os.stat(tmp_path / "baz.txt").st_mtime == 0
+    assert set(path.name for path in tmp_path.iterdir()) == {
+        "foo.txt",
+        "bar.txt",
+        "baz.txt",
+    }
+
+
+def test_transfer_stats(
+    tmp_path: Path, test_context: "Context", monkeypatch: MonkeyPatch
+) -> None:
+    from h3a import transfer
+    from h3a.execute import execute_plan
+    from h3a.plan import PlanItem
+
+    # -- Initialize test files --
+    (tmp_path / "foo.txt").write_text("foo")
+    (tmp_path / "bar.txt").write_text("bar")
+    (tmp_path / "baz.txt").write_text("baz")
+    plan = [
+        PlanItem(
+            id=(i + 1),
+            src=(tmp_path / name),
+            dest=(tmp_path / f"archive/{name}"),
+            overwrite_flag=False,
+        )
+        for i, name in enumerate(["foo.txt", "bar.txt", "baz.txt"])
+    ]
+
+    # -- Count strategies --
+    def partially_copying_ioctl(fd: int, request: int, arg: int) -> int:
+        if os.fstat(arg).st_size != 3 or os.read(arg, 3) == b"bar":
+            unsupported_ioctl(fd, request, arg)
+        return copying_ioctl(fd, request, arg)
+
+    monkeypatch.setattr(
+        transfer, "fcntl", SimpleNamespace(ioctl=partially_copying_ioctl)
+    )
+    test_context.copy_mode = "reflink-or-copy"
+    stats = execute_plan(plan, context=test_context)
+    assert stats.strategy_counts == {"reflink": 2, "copy": 1}
+    assert stats.bytes_copied == 3
+    for plan_item in plan:
+        assert plan_item.src.read_text() == plan_item.dest.read_text()
+
+
+@mark.parametrize("engine", ["copy_file_range", "sendfile", "buffered"])
+def test_transfer_copy_engines(tmp_path: Path, engine: str) -> None:
+    from h3a.transfer import copy_data, copy_file
+
+    # -- Initialize test files --
+    data = os.urandom(100_000)
+    (tmp_path / "foo.bin").write_bytes(data)
+
+    # -- Copy whole files --
+    bytes_copied = copy_file(
+        tmp_path / "foo.bin", tmp_path / "bar.bin", block_size=4096, engines=[engine]
+    )
+    assert bytes_copied == len(data)
+    assert (tmp_path / "bar.bin").read_bytes() == data
+
+    # -- Copy ranges --
+    with (
+        open(tmp_path / "foo.bin", "rb") as src_file,
+        open(tmp_path / "baz.bin", "wb") as dest_file,
+    ):
+        dest_file.truncate(len(data))
+        for offset in range(0, len(data), 30_000):
+            bytes_copied = copy_data(
+                src_file.fileno(),
+                dest_file.fileno(),
+                offset=offset,
+                length=30_000,
+                block_size=4096,
+                engines=[engine],
+            )
+            assert bytes_copied == min(30_000, len(data) - offset)
+    assert (tmp_path / "baz.bin").read_bytes() == data
+
+
+def test_transfer_copy_engine_fallback(
+    tmp_path: Path, monkeypatch: MonkeyPatch, caplog: LogCaptureFixture
+) -> None:
+    from h3a.transfer import copy_data, copy_file
+
+    # -- Initialize test files --
+    data = os.urandom(10_000)
+    (tmp_path / "foo.bin").write_bytes(data)
+
+    # -- Unsupported engines are skipped --
+    def unsupported_copy_file_range(*args: int) -> Never:
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    def unsupported_sendfile(*args: int) -> Never:
+        raise OSError(errno.ENOTSOCK, os.strerror(errno.ENOTSOCK))
+
+    monkeypatch.setattr(os, "copy_file_range", unsupported_copy_file_range)
+    monkeypatch.setattr(os, "sendfile", unsupported_sendfile)
+    caplog.set_level("DEBUG")
+    assert copy_file(tmp_path / "foo.bin", tmp_path / "bar.bin") == len(data)
+    assert (tmp_path / "bar.bin").read_bytes() == data
+    assert "Copy engine unavailable, trying the next one: copy_file_range" in (
+        caplog.text
+    )
+    assert "Copy engine unavailable, trying the next one: sendfile" in caplog.text
+
+    # -- Engines silently copying nothing are skipped --
+    monkeypatch.undo()
+    monkeypatch.setattr(os, "copy_file_range", lambda *args: 0)
+    assert copy_file(tmp_path / "foo.bin", tmp_path / "baz.bin") == len(data)
+    assert (tmp_path / "baz.bin").read_bytes() == data
+
+    # -- No engine available --
+    with (
+        open(tmp_path / "foo.bin", "rb") as src_file,
+        open(tmp_path / "blah.bin", "wb") as dest_file,
+    ):
+        with raises(RuntimeError, match="No copy engine available."):
+            copy_data(src_file.fileno(), dest_file.fileno(), engines=[])
+
+    # -- Temporary files are removed on failure --
+    with raises(RuntimeError, match="No copy engine available."):
+        copy_file(tmp_path / "foo.bin", tmp_path / "blah.bin", engines=[])
+    assert set(path.name for path in tmp_path.iterdir()) == {
+        "foo.bin",
+        "bar.bin",
+        "baz.bin",
+        "blah.bin",
+    }
+
+
+def test_transfer_chunked(
+    tmp_path: Path, test_context: "Context", monkeypatch: MonkeyPatch
+) -> None:
+    from h3a import transfer
+    from h3a.execute import execute_plan
+    from h3a.plan import PlanItem
+    from h3a.transfer import ChunkedCopy, start_transfer
+
+    # -- Initialize test files --
+    data = os.urandom(100_000)
+    (tmp_path / "foo.bin").write_bytes(data)
+    os.utime(tmp_path / "foo.bin", (0, 0))
+    (tmp_path / "bar.bin").write_bytes(data[:1000])
+    plan = [
+        PlanItem(
+            id=(i + 1),
+            src=(tmp_path / name),
+            dest=(tmp_path / f"archive/{name}"),
+            overwrite_flag=False,
+        )
+        for i, name in enumerate(["foo.bin", "bar.bin"])
+    ]
+
+    # -- Only large files are split --
+    transfer_result = start_transfer(
+        tmp_path / "foo.bin",
+        tmp_path / "baz.bin",
+        copy_mode="copy",
+        chunk_threshold=10_000,
+        chunk_size=30_000,
+    )
+    assert isinstance(transfer_result, ChunkedCopy)
+    assert transfer_result.chunks == [
+        (0, 30_000),
+        (30_000, 30_000),
+        (60_000, 30_000),
+        (90_000, 10_000),
+    ]
+    assert start_transfer(
+        tmp_path / "bar.bin",
+        tmp_path / "qux.bin",
+        copy_mode="reflink-or-copy",
+        chunk_threshold=10_000,
+        chunk_size=30_000,
+    ) == ("copy", 1000)
+
+    # -- Chunks are finalized by the last one --
+    for offset, length in reversed(transfer_result.chunks[1:]):
+        assert transfer_result.copy_chunk(offset, length) is None
+    assert not (tmp_path / "baz.bin").exists()
+    assert transfer_result.copy_chunk(*transfer_result.chunks[0]) == ("copy", 100_000)
+    assert (tmp_path / "baz.bin").read_bytes() == data
+    assert os.stat(tmp_path / "baz.bin").st_mtime == 0
+
+    # -- Execute chunked plans --
+    test_context.chunk_threshold = 10_000
+    test_context.chunk_size = 4096
+    stats = execute_plan(plan, context=test_context)
+    assert stats.strategy_counts == {"copy": 2}
+    assert stats.bytes_copied == 101_000
+    for plan_item in plan:
+        assert plan_item.src.read_bytes() == plan_item.dest.read_bytes()
+
+    # -- Reflinks are preferred over chunks --
+    monkeypatch.setattr(transfer, "fcntl", SimpleNamespace(ioctl=copying_ioctl))
+    assert start_transfer(
+        tmp_path / "foo.bin",
+        tmp_path / "baz.bin",
+        copy_mode="reflink-or-copy",
+        chunk_threshold=10_000,
+    ) == ("reflink", 0)
+    assert start_transfer(
+        tmp_path / "foo.bin",
+        tmp_path / "baz.bin",
+        copy_mode="reflink",
+        chunk_threshold=10_000,
+    ) == ("reflink", 0)
+    assert (tmp_path / "baz.bin").read_bytes() == data
+
+
+def test_transfer_chunked_failure(tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+    from h3a import transfer
+    from h3a.transfer import ChunkedCopy
+
+    # -- Initialize test files --
+    data = os.urandom(100_000)
+    (tmp_path / "foo.bin").write_bytes(data)
+    (tmp_path / "bar.bin").write_bytes(b"bar")
+
+    # -- Failed chunks discard the file --
+    chunked_copy = ChunkedCopy(
+        tmp_path / "foo.bin", tmp_path / "bar.bin", size=len(data), chunk_size=40_000
+    )
+    assert chunked_copy.copy_chunk(*chunked_copy.chunks[0]) is None
+
+    def failing_copy_data(*args: object, **kwargs: object) -> Never:
+        raise OSError(errno.EIO, os.strerror(errno.EIO))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(transfer, "copy_data", failing_copy_data)
+        with raises(OSError):
+            chunked_copy.copy_chunk(*chunked_copy.chunks[1])
+    assert chunked_copy.copy_chunk(*chunked_copy.chunks[2]) is None
+    assert (tmp_path / "bar.bin").read_bytes() == b"bar"
+    assert set(path.name for path in tmp_path.iterdir()) == {"foo.bin", "bar.bin"}
+
+    # -- Sources changed while copying --
+    chunked_copy = ChunkedCopy(
+        tmp_path / "foo.bin", tmp_path / "bar.bin", size=len(data), chunk_size=40_000
+    )
+    (tmp_path / "foo.bin").write_bytes(data[:50_000])
+    assert chunked_copy.copy_chunk(*chunked_copy.chunks[0]) is None
+    with raises(RuntimeError, match="Source file changed while copying: "):
+        chunked_copy.copy_chunk(*chunked_copy.chunks[1])
+    assert chunked_copy.copy_chunk(*chunked_copy.chunks[2]) is None
+    assert (tmp_path / "bar.bin").read_bytes() == b"bar"
+    assert set(path.name for path in tmp_path.iterdir()) == {"foo.bin", "bar.bin"}